@@ -0,0 +1,86 @@
+"""
+Text Extraction Benchmark for the Pedagogical Sheets
+
+Parses every sheet in FICHES PEDAGOGIQUES with each extraction setup and
+compares throughput and detected fields against the default setup
+(pdfplumber, 3 pages, no early stop).
+
+Usage (from the repository root):
+    python Demo/benchmark_extraction.py [--sheets "FICHES PEDAGOGIQUES"] [--repeat 1]
+"""
+
+import sys
+import os
+import time
+import argparse
+from pathlib import Path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from pdf_parser import PedagogicalSheetParser
+from text_extractors import available_extractors
+
+
+# Fields of a lesson that depend on the extracted text
+COMPARED_FIELDS = ['axes', 'tools', 'virtues', 'duration']
+
+
+def setups():
+    """(label, parser options) of each configuration, the reference first"""
+    configs = [("pdfplumber, 3 pages", dict(extractor='pdfplumber', max_pages=3))]
+    for name in available_extractors():
+        if name != 'pdfplumber':
+            configs.append((f"{name}, 3 pages", dict(extractor=name, max_pages=3)))
+    for name in available_extractors():
+        configs.append((f"{name}, early stop", dict(extractor=name, max_pages=3, early_stop=True)))
+    return configs
+
+
+def run(pdf_files, options, repeat):
+    """Parse the files without cache; return (seconds per pass, lessons)"""
+    parser = PedagogicalSheetParser(**options)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        lessons = [parser.parse_pdf(str(pdf_file)) for pdf_file in pdf_files]
+    return (time.perf_counter() - start) / repeat, lessons
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark PDF text extraction backends")
+    arg_parser.add_argument('--sheets', default="FICHES PEDAGOGIQUES", help="directory of PDF sheets")
+    arg_parser.add_argument('--repeat', type=int, default=1, help="passes per setup")
+    args = arg_parser.parse_args()
+
+    pdf_files = sorted(Path(args.sheets).rglob('*.pdf'))
+    print(f"Benchmarking {len(pdf_files)} sheets from {args.sheets}\n")
+
+    results = []
+    for label, options in setups():
+        seconds, lessons = run(pdf_files, options, args.repeat)
+        results.append((label, seconds, lessons))
+
+    reference = results[0][2]
+    reference_time = results[0][1]
+
+    print(f"{'Setup':<24} {'Time':>8} {'Sheets/s':>9} {'Speedup':>8}   Changed fields")
+    print("-" * 80)
+    for label, seconds, lessons in results:
+        changed = {field: sum(1 for a, b in zip(reference, lessons) if a[field] != b[field])
+                   for field in COMPARED_FIELDS}
+        changes = ", ".join(f"{field} {count}" for field, count in changed.items() if count) or "none"
+        print(f"{label:<24} {seconds:>7.2f}s {len(pdf_files) / seconds:>9.1f} "
+              f"{reference_time / seconds:>7.2f}x   {changes}")
+
+    # Sheet-level detail of every difference
+    for label, seconds, lessons in results[1:]:
+        differences = []
+        for pdf_file, a, b in zip(pdf_files, reference, lessons):
+            for field in COMPARED_FIELDS:
+                if a[field] != b[field]:
+                    differences.append(f"  {pdf_file.name[:50]:<50} {field}: {a[field]} -> {b[field]}")
+        if differences:
+            print(f"\n{label}: {len(differences)} field change(s)")
+            print("\n".join(differences))
+
+
+if __name__ == "__main__":
+    main()
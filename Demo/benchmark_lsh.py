@@ -0,0 +1,91 @@
+"""
+Recall Benchmark for Approximate Retrieval
+
+Compares MinHash LSH retrieval (lsh_index.py) with the exact find_similar
+for several band/row settings: recall@k is the share of the exact top-k
+that the approximate search returns, candidates the share of the corpus
+it reranks. --scale grows the corpus with synthetic variants of the
+ontology's lessons to see how the settings behave on a large collection.
+
+Usage (from the repository root):
+    python Demo/benchmark_lsh.py [--ontology ontology/peace_pedagogy.owl] [--scale 100000]
+                                 [--settings 32x4 24x6 16x8] [--queries 200] [--top-k 5]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lesson_features import LessonFeatures
+from lesson_matrix import SET_DIMENSIONS
+from lsh_index import LSHIndex, recall_at_k
+
+
+def synthetic_lessons(lessons, count: int, seed: int = 0):
+    """Variants of existing lessons: each set value is dropped or swapped for another with probability 1/4"""
+    rng = random.Random(seed)
+    values = {prop: sorted({v for lesson in lessons for v in getattr(lesson, prop)}, key=lambda v: v.name)
+              for dim, prop in SET_DIMENSIONS}
+
+    def vary(prop, current):
+        varied = set()
+        for value in current:
+            roll = rng.random()
+            if roll < 0.75:
+                varied.add(value)
+            elif roll < 0.875 and values[prop]:
+                varied.add(rng.choice(values[prop]))
+        return varied
+
+    for i in range(count):
+        base = rng.choice(lessons)
+        yield LessonFeatures(
+            title=f"synthetic_{i}",
+            duration=base.duration[0] if base.duration else None,
+            target_age_min=base.targetAgeMin[0] if base.targetAgeMin else None,
+            target_age_max=base.targetAgeMax[0] if base.targetAgeMax else None,
+            axes=vary('hasAxis', base.hasAxis),
+            tools=vary('usesTool', base.usesTool),
+            virtues=vary('developsVirtue', base.developsVirtue),
+            strategies=vary('employsStrategy', base.employsStrategy),
+            domains=base.belongsToDomain)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Recall@k of LSH retrieval against exact search")
+    arg_parser.add_argument('--ontology', default="ontology/peace_pedagogy.owl")
+    arg_parser.add_argument('--scale', type=int, default=0, help="synthetic lessons to add to the corpus")
+    arg_parser.add_argument('--settings', nargs='+', default=["32x4", "32x6", "24x6", "16x8"],
+                            help="band/row settings as BANDSxROWS")
+    arg_parser.add_argument('--queries', type=int, default=200, help="indexed lessons used as queries")
+    arg_parser.add_argument('--top-k', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    from owlready2 import get_ontology
+    from similarity_engine import SimilarityEngine
+
+    engine = SimilarityEngine(get_ontology(args.ontology).load())
+    if args.scale:
+        engine.add_lessons(list(synthetic_lessons(engine.matrix.lessons, args.scale)))
+
+    lessons = engine.matrix.lessons
+    targets = random.Random(1).sample(lessons, min(args.queries, len(lessons)))
+    print(f"{len(lessons)} lessons, {len(targets)} queries, top {args.top_k}\n")
+
+    print(f"{'Setting':<10}{'build':>10}{'recall':>10}{'candidates':>12}{'exact':>12}{'approximate':>14}")
+    for setting in args.settings:
+        bands, rows = (int(n) for n in setting.lower().split('x'))
+        start = time.perf_counter()
+        lsh = LSHIndex(engine.matrix, bands, rows)
+        build = time.perf_counter() - start
+
+        report = recall_at_k(engine, lsh, targets, args.top_k)
+        print(f"{setting:<10}{build:>9.2f}s{report['recall']:>10.3f}{report['candidates']:>11.1%}"
+              f"{report['exact_ms']:>10.2f}ms{report['approximate_ms']:>12.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
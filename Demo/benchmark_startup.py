@@ -0,0 +1,68 @@
+"""
+Startup Benchmark for the Query Path
+
+Times a cold query in a fresh interpreter, the way a CLI invocation or a
+short-lived worker runs it: import query_engine, open the corpus, answer
+one query. Compares the compiled index with the RDF/XML ontology, and
+reports whether owlready2 was imported.
+
+Usage (from the repository root):
+    python Demo/benchmark_startup.py [--ontology ontology/peace_pedagogy.owl] [--repeat 5]
+"""
+
+import sys
+import os
+import json
+import argparse
+import tempfile
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Runs in the child interpreter; prints its timings as JSON
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+from query_engine import search_similar_lessons
+imported = time.perf_counter()
+search_similar_lessons(title="Probe", axes=["peace_with_others"], virtues=["empathy"],
+                       target_age_min=8, target_age_max=12, top_k=3, ontology_path={path!r})
+done = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'query': done - imported,
+                   'owlready2': 'owlready2' in sys.modules}}))
+"""
+
+
+def probe(path: str) -> dict:
+    """Run one cold query in a new interpreter"""
+    output = subprocess.run([sys.executable, "-c", PROBE.format(src=os.path.abspath(SRC_DIR), path=path)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time a cold query from an index and from the ontology")
+    arg_parser.add_argument('--ontology', default="ontology/peace_pedagogy.owl")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="cold runs per setup, the best one is kept")
+    args = arg_parser.parse_args()
+
+    from owlready2 import get_ontology
+    from index_artifact import build_index
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = os.path.join(tmp_dir, "lesson_index")
+        manifest = build_index(get_ontology(args.ontology).load(), index_dir)
+        print(f"{manifest['lessons']} lessons, best of {args.repeat} cold runs\n")
+
+        print(f"{'Setup':<18}{'import':>10}{'query':>10}{'total':>10}  owlready2")
+        for label, path in [("compiled index", index_dir), ("RDF/XML ontology", args.ontology)]:
+            runs = [probe(path) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r['import'] + r['query'])
+            print(f"{label:<18}{best['import']:>9.3f}s{best['query']:>9.3f}s"
+                  f"{best['import'] + best['query']:>9.3f}s  {'loaded' if best['owlready2'] else 'not loaded'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,14 @@ OUTPUT: Most similar existing pedagogical sheets
 
 Usage:
     python find_similar_lessons.py
+
+Pass ontology_path="data/lesson_index" (built by src/index_artifact.py) to
+answer queries from a compiled index, without loading owlready2.
 """
 
 import sys
 import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
 from query_engine import search_similar_lessons
 import json
@@ -26,7 +29,8 @@ def find_similar(
     target_age_min: int = None,
     target_age_max: int = None,
     duration: float = None,
-    top_k: int = 5
+    top_k: int = 5,
+    ontology_path: str = "ontology/peace_pedagogy.owl"
 ):
     """
     Find similar pedagogical sheets based on your lesson metadata
@@ -56,6 +60,7 @@ def find_similar(
         target_age_max: Maximum age (e.g., 14)
         duration: Lesson duration in hours (e.g., 2.5)
         top_k: Number of similar lessons to return
+        ontology_path: Ontology file, SQLite store or compiled index directory
     
     Returns:
         List of similar pedagogical sheets with similarity scores
@@ -71,7 +76,8 @@ def find_similar(
         target_age_min=target_age_min,
         target_age_max=target_age_max,
         duration=duration,
-        top_k=top_k
+        top_k=top_k,
+        ontology_path=ontology_path
     )
     
     return results
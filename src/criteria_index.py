@@ -0,0 +1,83 @@
+"""
+Criteria Index for Peace Pedagogy Lessons
+Filters the lesson corpus with bitmaps and counts facets of the result
+"""
+
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+from lesson_matrix import LessonMatrix
+
+
+class CriteriaIndex:
+    """
+    Per-value bitmaps and sorted age arrays over a LessonMatrix
+
+    Every axis/tool/virtue/strategy/domain value gets a boolean row bitmap,
+    so a criteria search is an OR of bitmaps within a dimension and an AND
+    across dimensions. Age bounds are resolved with a binary search in the
+    sorted age arrays. Facet counts of the filtered set come from the same
+    mask in one matrix product per dimension.
+    """
+
+    def __init__(self, matrix: LessonMatrix):
+        self.matrix = matrix
+        n = len(matrix)
+
+        # dimension -> (V, N) bool array, one bitmap row per vocabulary column
+        self.bitmaps = {dim: np.ascontiguousarray(np.asarray(features).T != 0)
+                        for dim, features in matrix.features.items()}
+
+        # Rows sorted by lesson age bounds, for range filters
+        self.age_min_order = np.argsort(matrix.age_min, kind='stable')
+        self.age_min_sorted = np.asarray(matrix.age_min)[self.age_min_order]
+        self.age_max_order = np.argsort(matrix.age_max, kind='stable')
+        self.age_max_sorted = np.asarray(matrix.age_max)[self.age_max_order]
+        self.everything = np.ones(n, dtype=bool)
+
+    def mask(self, criteria: Dict[str, Iterable], age_min: Optional[float] = None,
+             age_max: Optional[float] = None) -> np.ndarray:
+        """
+        Rows matching every criterion
+        criteria maps a dimension to entities, any of which must be present;
+        with age bounds, the lesson's age range must overlap [age_min, age_max]
+        (lessons without an age never match an age bound)
+        """
+        n = len(self.matrix)
+        mask = self.everything.copy()
+
+        for dim, entities in criteria.items():
+            entities = list(entities)
+            if not entities:
+                continue
+            any_of = np.zeros(n, dtype=bool)
+            for entity in entities:
+                column = self.matrix.vocab[dim].get(entity)
+                if column is not None:
+                    any_of |= self.bitmaps[dim][column]
+            mask &= any_of
+
+        if age_min is not None:
+            # Lessons ending at or after age_min (lessons with no age end at 0)
+            start = np.searchsorted(self.age_max_sorted, age_min, side='left')
+            keep = np.zeros(n, dtype=bool)
+            keep[self.age_max_order[start:]] = True
+            mask &= keep
+        if age_max is not None:
+            # Lessons starting at or before age_max, skipping those with no age (0)
+            start = np.searchsorted(self.age_min_sorted, 0, side='right')
+            end = np.searchsorted(self.age_min_sorted, age_max, side='right')
+            keep = np.zeros(n, dtype=bool)
+            keep[self.age_min_order[start:end]] = True
+            mask &= keep
+
+        return mask
+
+    def facets(self, mask: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """Number of matching lessons carrying each value, per dimension"""
+        facets = {}
+        for dim, bitmaps in self.bitmaps.items():
+            counts = bitmaps @ mask.astype(np.intp)
+            facets[dim] = {entity.name: int(counts[column])
+                           for entity, column in self.matrix.vocab[dim].items() if counts[column]}
+        return facets
@@ -4,37 +4,165 @@ Loads lesson data and populates the ontology
 """
 
 import json
+import hashlib
+from typing import Dict, Iterable
 from owlready2 import *
 
+from vocabulary import Vocabulary, normalize_term
+from lesson_io import iter_lessons
+from ontology_store import open_store, export_rdfxml
+
+
+# Lessons written to a SQLite store between two commits
+COMMIT_EVERY = 100
+
+# Record fields stored on a lesson; a change to any of them is an update
+RECORD_FIELDS = ['id', 'title', 'description', 'discipline', 'domain', 'axes', 'tools', 'strategies',
+                 'virtues', 'duration', 'target_age_min', 'target_age_max', 'group_size_min', 'group_size_max']
+
+
+def lesson_name(lesson_id: str) -> str:
+    """Ontology name of the Lesson individual created for a record id"""
+    return lesson_id.lower().replace(" ", "_").replace("'", "").replace("é", "e").replace("è", "e")
+
+
+def record_hash(lesson_data: Dict) -> str:
+    """Content hash of the fields of a lesson record that end up in the ontology"""
+    fields = {field: lesson_data.get(field) for field in RECORD_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def empty_report() -> Dict:
+    """Changes applied by an upsert: lesson ids per kind of change"""
+    return {'inserted': [], 'updated': [], 'deleted': [], 'unchanged': 0}
+
+
+def format_report(report: Dict) -> str:
+    """One-line summary of an upsert report"""
+    return (f"{len(report['inserted'])} inserted, {len(report['updated'])} updated, "
+            f"{len(report['deleted'])} deleted, {report['unchanged']} unchanged")
+
 
 class LessonLoader:
     """
     Loads lessons from JSON into the ontology
+    
+    Each lesson stores the content hash of the record it came from, so
+    upsert() can tell new, changed and unchanged records apart and only
+    write the difference.
     """
     
-    def __init__(self, ontology):
+    def __init__(self, ontology, vocabulary=None):
         self.onto = ontology
+        self.vocabulary = vocabulary or Vocabulary(ontology)
+        self._lessons = None  # lesson name -> individual, built by the first upsert
+        
+        # Ontologies built before content hashes existed lack the property
+        if self.onto.contentHash is None:
+            with self.onto:
+                class contentHash(DataProperty):
+                    domain = [self.onto.Lesson]
+                    range = [str]
     
     def normalize_name(self, name):
         """Convert string to valid ontology name"""
-        return name.lower().replace(" ", "_").replace("'", "").replace("é", "e").replace("è", "e")
+        return lesson_name(name)
     
-    def load_from_json(self, json_file):
+    def load_from_json(self, json_file, commit_every=None):
         """
         Load lessons from JSON file into ontology
+        Records are streamed one at a time from JSON or JSON Lines files.
+        With commit_every, the world is saved every that many lessons, which
+        commits them incrementally when it is backed by a SQLite store
         """
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         lessons_created = []
         
         with self.onto:
-            for lesson_data in data['lessons']:
+            for lesson_data in iter_lessons(json_file):
                 lesson = self.create_lesson(lesson_data)
                 lessons_created.append(lesson)
+                
+                if commit_every and len(lessons_created) % commit_every == 0:
+                    self.onto.world.save()
         
         return lessons_created
     
+    def upsert_from_json(self, json_file, delete_missing=False, commit_every=None) -> Dict:
+        """
+        Apply a JSON (or JSON Lines) file of lessons as inserts, updates and
+        (optionally) deletes, streaming its records
+        Returns the report of upsert()
+        """
+        return self.upsert(iter_lessons(json_file), delete_missing=delete_missing, commit_every=commit_every)
+    
+    def upsert(self, records: Iterable[Dict], delete_missing=False, commit_every=None) -> Dict:
+        """
+        Diff records against the stored lessons by id and content hash
+        
+        New ids are inserted, records whose hash changed overwrite their
+        lesson, and identical records are skipped without touching the
+        ontology. With delete_missing, stored lessons absent from records are
+        destroyed. With commit_every, the world is saved every that many
+        writes. Returns {'inserted': [ids], 'updated': [ids], 'deleted': [ids],
+        'unchanged': count}.
+        """
+        report = empty_report()
+        seen = set()
+        writes = 0
+        
+        with self.onto:
+            for lesson_data in records:
+                change, lesson = self.upsert_lesson(lesson_data)
+                seen.add(lesson.name)
+                if change == 'unchanged':
+                    report['unchanged'] += 1
+                    continue
+                
+                report[change].append(lesson.name)
+                writes += 1
+                if commit_every and writes % commit_every == 0:
+                    self.onto.world.save()
+            
+            if delete_missing:
+                report['deleted'] = self.delete_lessons(name for name in list(self.stored_lessons()) if name not in seen)
+        
+        return report
+    
+    def upsert_lesson(self, lesson_data):
+        """
+        Insert or update one lesson record
+        Returns (change, lesson) with change 'inserted', 'updated' or 'unchanged'
+        """
+        lessons = self.stored_lessons()
+        lesson = lessons.get(self.normalize_name(lesson_data['id']))
+        
+        if lesson is None:
+            lesson = self.create_lesson(lesson_data)
+            return 'inserted', lesson
+        
+        if lesson.contentHash == [record_hash(lesson_data)]:
+            return 'unchanged', lesson
+        
+        self.set_properties(lesson, lesson_data)
+        return 'updated', lesson
+    
+    def delete_lessons(self, names):
+        """Destroy the lessons with the given names; returns the names deleted"""
+        lessons = self.stored_lessons()
+        deleted = []
+        for name in names:
+            lesson = lessons.pop(name, None)
+            if lesson is not None:
+                destroy_entity(lesson)
+                deleted.append(name)
+        return deleted
+    
+    def stored_lessons(self) -> Dict[str, object]:
+        """Lesson name -> individual, read from the ontology once and kept up to date"""
+        if self._lessons is None:
+            self._lessons = {lesson.name: lesson for lesson in self.onto.Lesson.instances()}
+        return self._lessons
+    
     def create_lesson(self, lesson_data):
         """
         Create a lesson instance from data dictionary
@@ -45,7 +173,17 @@ class LessonLoader:
         # Create lesson instance
         lesson_id = self.normalize_name(lesson_data['id'])
         lesson = Lesson(lesson_id)
+        self.set_properties(lesson, lesson_data)
         
+        if self._lessons is not None:
+            self._lessons[lesson.name] = lesson
+        
+        return lesson
+    
+    def set_properties(self, lesson, lesson_data):
+        """
+        Overwrite every property of a lesson from a data dictionary
+        """
         # Set data properties
         lesson.title = [lesson_data['title']]
         lesson.description = [lesson_data.get('description', '')]
@@ -55,84 +193,172 @@ class LessonLoader:
         lesson.targetAgeMax = [lesson_data.get('target_age_max', 0)]
         lesson.groupSizeMin = [lesson_data.get('group_size_min', 0)]
         lesson.groupSizeMax = [lesson_data.get('group_size_max', 0)]
+        lesson.contentHash = [record_hash(lesson_data)]
         
         # Link to axes
+        lesson.hasAxis = []
         for axis_name in lesson_data.get('axes', []):
-            axis = self.onto.search_one(iri=f"*{axis_name}")
+            axis = self.vocabulary.lookup(axis_name)
             if axis:
                 lesson.hasAxis.append(axis)
         
         # Link to tools
+        lesson.usesTool = []
         for tool_name in lesson_data.get('tools', []):
-            tool = self.onto.search_one(iri=f"*{tool_name}")
+            tool = self.vocabulary.lookup(tool_name)
             if tool:
                 lesson.usesTool.append(tool)
         
         # Link to strategies
+        lesson.employsStrategy = []
         for strategy_name in lesson_data.get('strategies', []):
             # Try to find or create strategy
-            strategy_class_name = ''.join(word.capitalize() for word in strategy_name.split('_'))
-            strategy_class = getattr(self.onto, strategy_class_name, None)
-            if strategy_class:
-                strategy = strategy_class(strategy_name)
+            strategy = self.vocabulary.lookup(strategy_name)
+            if strategy is None:
+                strategy_class_name = ''.join(word.capitalize() for word in strategy_name.split('_'))
+                strategy_class = getattr(self.onto, strategy_class_name, None)
+                if strategy_class:
+                    strategy = strategy_class(strategy_name)
+                    self.vocabulary.add(strategy)
+            if strategy:
                 lesson.employsStrategy.append(strategy)
         
         # Link to virtues
+        lesson.developsVirtue = []
         for virtue_name in lesson_data.get('virtues', []):
-            virtue = self.onto.search_one(iri=f"*{virtue_name}")
+            virtue = self.vocabulary.lookup(virtue_name)
             if virtue:
                 lesson.developsVirtue.append(virtue)
         
-        # Link to domain
+        # Link to domain: domains are classes (Sciences, Arts), each with one individual
         domain_name = lesson_data.get('domain', '')
-        domain = self.onto.search_one(iri=f"*{domain_name.lower()}")
-        if domain:
-            lesson.belongsToDomain = [domain]
-        
-        return lesson
+        domain = self.vocabulary.lookup(domain_name)
+        if domain is None:
+            domain_class = self.vocabulary.domain_class(domain_name)
+            if domain_class is not None:
+                domain = domain_class(normalize_term(domain_class.name))
+                self.vocabulary.add(domain)
+        lesson.belongsToDomain = [domain] if domain else []
 
 
-def load_lessons(ontology_path, data_path):
+def load_lessons(ontology_path, data_path, store_path=None, export_path=None):
     """
     Load ontology and populate with lesson data
+    
+    Without store_path, the RDF/XML file is parsed and rewritten as before.
+    With store_path, lessons go into a SQLite quadstore (created from
+    ontology_path on first use) and are committed incrementally; export_path
+    optionally writes an RDF/XML copy for Protégé users.
     """
-    # Load ontology
-    onto = get_ontology(ontology_path).load()
+    if store_path:
+        # Open the persistent store, parsing RDF/XML only when it is new
+        world, onto = open_store(store_path, ontology_path)
+    else:
+        # Load ontology
+        onto = get_ontology(ontology_path).load()
     
     # Create loader
     loader = LessonLoader(onto)
     
     # Load lessons
-    lessons = loader.load_from_json(data_path)
+    lessons = loader.load_from_json(data_path, commit_every=COMMIT_EVERY if store_path else None)
     
     print(f"Loaded {len(lessons)} lessons into ontology")
     
-    # Save updated ontology
-    onto.save(file=ontology_path, format="rdfxml")
+    if store_path:
+        # Commit the remaining lessons
+        world.save()
+        print(f"Committed lessons to {store_path}")
+    else:
+        # Save updated ontology
+        onto.save(file=ontology_path, format="rdfxml")
+    
+    if export_path:
+        export_rdfxml(onto, export_path)
     
     return onto, lessons
 
 
+def upsert_lessons(ontology_path, data_path, store_path=None, export_path=None, delete_missing=False):
+    """
+    Bring the stored lessons in line with a JSON file, writing only the delta
+    
+    Records are matched to stored lessons by id and content hash: new ones
+    are inserted, changed ones overwritten, unchanged ones skipped, and with
+    delete_missing lessons absent from the file are removed. Nothing is
+    written when the file matches the store.
+    
+    Returns (onto, report) where report lists the ids of each kind of change
+    """
+    if store_path:
+        world, onto = open_store(store_path, ontology_path)
+    else:
+        onto = get_ontology(ontology_path).load()
+    
+    loader = LessonLoader(onto)
+    report = loader.upsert_from_json(data_path, delete_missing=delete_missing,
+                                     commit_every=COMMIT_EVERY if store_path else None)
+    
+    print(f"Upserted lessons: {format_report(report)}")
+    
+    changed = report['inserted'] or report['updated'] or report['deleted']
+    if store_path:
+        world.save()
+    elif changed:
+        onto.save(file=ontology_path, format="rdfxml")
+    
+    if export_path:
+        export_rdfxml(onto, export_path)
+    
+    return onto, report
+
+
 if __name__ == "__main__":
     import sys
+    import os
     
     ontology_path = "ontology/peace_pedagogy.owl"
+    data_path = None
+    store_path = None
+    export_path = None
+    mode = 'insert'
     
-    # Check for command line argument
-    if len(sys.argv) > 2 and sys.argv[1] == '--data-file':
-        data_path = sys.argv[2]
-    else:
+    # Check for command line arguments:
+    #   --data-file <json>   lessons to load (.json or .jsonl)
+    #   --store <sqlite3>    load into a SQLite quadstore instead of the OWL file
+    #   --export <owl>       also write an RDF/XML copy
+    #   --mode <mode>        insert (default): create every record
+    #                        upsert: insert new and update changed records only
+    #                        sync: upsert, and delete lessons missing from the file
+    args = sys.argv[1:]
+    for flag, value in zip(args[::2], args[1::2]):
+        if flag == '--data-file':
+            data_path = value
+        elif flag == '--store':
+            store_path = value
+        elif flag == '--export':
+            export_path = value
+        elif flag == '--mode':
+            mode = value
+    
+    if data_path is None:
         # Default to pedagogical sheets if available, else sample data
-        import os
         if os.path.exists("data/pedagogical_sheets.json"):
             data_path = "data/pedagogical_sheets.json"
         else:
             data_path = "data/sample_data.json"
     
     print(f"Loading data from: {data_path}")
-    onto, lessons = load_lessons(ontology_path, data_path)
     
-    print("\nCreated lessons:")
-    for lesson in lessons:
-        print(f"  - {lesson.title[0]}")
-
+    if mode in ('upsert', 'sync'):
+        onto, report = upsert_lessons(ontology_path, data_path, store_path=store_path, export_path=export_path,
+                                      delete_missing=(mode == 'sync'))
+        for change in ('inserted', 'updated', 'deleted'):
+            for lesson_id in report[change]:
+                print(f"  {change}: {lesson_id}")
+    else:
+        onto, lessons = load_lessons(ontology_path, data_path, store_path=store_path, export_path=export_path)
+        
+        print("\nCreated lessons:")
+        for lesson in lessons:
+            print(f"  - {lesson.title[0]}")
@@ -0,0 +1,81 @@
+"""
+Engine Registry for Peace Pedagogy Lessons
+Keeps one warm query engine per ontology file for the life of the process
+"""
+
+import os
+import hashlib
+import threading
+from typing import Callable, Dict
+
+from index_artifact import MANIFEST, is_index_dir, open_index
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class EngineRegistry:
+    """
+    Caches a ready-to-query engine per ontology path
+
+    An entry is reused while the file's mtime and size are unchanged. When
+    they change, the content hash decides: a touched but identical file keeps
+    its engine, a modified file is parsed again into a fresh owlready2 World
+    (so the old individuals never leak into the new engine). Paths ending in
+    .sqlite3/.sqlite/.db are opened as SQLite quadstores instead of parsed,
+    and compiled index directories are memory-mapped; a directory is
+    tracked through its manifest, which every rebuild rewrites. Serving
+    only compiled indexes never imports owlready2.
+    """
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, ontology_path: str):
+        """Return the engine for an ontology file, loading it only if the file changed"""
+        path = os.path.abspath(ontology_path)
+        compiled = is_index_dir(path)
+        stat = os.stat(os.path.join(path, MANIFEST) if compiled else path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['signature'] == signature:
+                return entry['engine']
+
+            digest = file_digest(os.path.join(path, MANIFEST) if compiled else path)
+            if entry is not None and entry['digest'] == digest:
+                entry['signature'] = signature
+                return entry['engine']
+
+            if compiled:
+                # Compiled index: arrays are memory-mapped, no ontology is loaded
+                engine = self.factory(None, compiled=open_index(path))
+            else:
+                # Only ontology paths need owlready2, so it is imported here
+                from owlready2 import World
+                from ontology_store import is_store_path, open_store
+                
+                if is_store_path(path):
+                    # SQLite quadstore: opened without parsing, shared with writers
+                    world, onto = open_store(path, exclusive=False)
+                else:
+                    onto = World().get_ontology(path).load()
+                engine = self.factory(onto)
+            self._entries[path] = {'signature': signature, 'digest': digest, 'engine': engine}
+            self.loads += 1
+            return engine
+
+    def clear(self):
+        """Drop every cached engine"""
+        with self._lock:
+            self._entries.clear()
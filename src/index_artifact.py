@@ -0,0 +1,291 @@
+"""
+Compiled Index Artifact for Peace Pedagogy Lessons
+Writes the encoded lesson corpus to .npy files and maps it back without owlready2
+"""
+
+import os
+import glob
+import json
+import mmap
+import shutil
+import hashlib
+import numpy as np
+from typing import Dict, List
+
+from lesson_matrix import LessonMatrix, FEATURE_DIMENSIONS
+from inverted_index import InvertedIndex
+from lesson_features import LessonFeatures
+from vocabulary import Vocabulary
+
+
+# Bump when the layout of the artifact directory changes
+FORMAT_VERSION = 1
+
+MANIFEST = 'manifest.json'
+
+# Scalar properties of a lesson kept in the payload store, as stored lists
+PAYLOAD_PROPERTIES = ['title', 'description', 'discipline', 'duration',
+                      'targetAgeMin', 'targetAgeMax', 'groupSizeMin', 'groupSizeMax']
+
+
+def is_index_dir(path: str) -> bool:
+    """True if a path is a compiled index directory"""
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+class IndexedEntity:
+    """
+    Stand-in for an axis/tool/virtue/strategy/domain individual
+    Has the same name and str() as the individual it was compiled from
+    """
+
+    __slots__ = ('name', 'label')
+
+    def __init__(self, name: str, label: str):
+        self.name = name
+        self.label = label
+
+    def __str__(self):
+        return self.label
+
+    def __repr__(self):
+        return self.label
+
+    def __eq__(self, other):
+        return isinstance(other, IndexedEntity) and other.label == self.label
+
+    def __hash__(self):
+        return hash(self.label)
+
+
+def build_index(ontology, index_dir: str) -> Dict:
+    """
+    Compile the lessons of an ontology into an index directory
+
+    Layout:
+        manifest.json                       format, lesson count, vocabulary sizes, digest
+        vocab.json                          every vocabulary entity as [name, label], and
+                                            dimension -> entity ids in column order
+        features_<dim>.npy, sizes_<dim>.npy one-hot matrix and set sizes per dimension
+        postings_<dim>.indptr.npy/.rows.npy inverted index, CSR layout
+        age_min.npy, age_max.npy, duration.npy
+        payloads.bin, payload_offsets.npy   one JSON payload per lesson, by byte offset
+
+    Each build is written to a versioned directory next to index_dir
+    (<index_dir>.v<digest>), and index_dir is a symlink to the current one,
+    swapped with os.replace: a reader opening index_dir always finds a
+    complete index. The previous version is kept for readers opening it
+    during the swap; older ones are removed. Returns the manifest
+    """
+    matrix = LessonMatrix(ontology.Lesson.instances())
+    index = InvertedIndex(matrix)
+
+    tmp_dir = f"{index_dir.rstrip(os.sep)}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    def save(name, array):
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+    # Every vocabulary entity, so that query terms unused by lessons still count
+    vocabulary = Vocabulary(ontology)
+    for dim, prop in FEATURE_DIMENSIONS:
+        for entity in matrix.vocab[dim]:
+            vocabulary.add(entity)
+    vocab = {'entities': [[entity.name, str(entity)] for entity in vocabulary.entities], 'columns': {}}
+
+    for dim, prop in FEATURE_DIMENSIONS:
+        entities = sorted(matrix.vocab[dim], key=matrix.vocab[dim].get)
+        vocab['columns'][dim] = [vocabulary.ids[entity] for entity in entities]
+        save(f"features_{dim}", matrix.features[dim])
+        save(f"sizes_{dim}", matrix.sizes[dim])
+
+        postings = index.postings[dim]
+        indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(rows) for rows in postings])
+        rows = np.concatenate(postings) if postings else np.empty(0)
+        save(f"postings_{dim}.indptr", indptr)
+        save(f"postings_{dim}.rows", rows.astype(np.int64))
+
+    save("age_min", matrix.age_min)
+    save("age_max", matrix.age_max)
+    save("duration", matrix.duration)
+
+    # Payloads: stored property lists, and entities as vocabulary columns
+    digest = hashlib.sha256()
+    offsets = [0]
+    with open(os.path.join(tmp_dir, 'payloads.bin'), 'wb') as f:
+        for lesson in matrix.lessons:
+            payload = {prop: list(getattr(lesson, prop) or []) for prop in PAYLOAD_PROPERTIES}
+            for dim, prop in FEATURE_DIMENSIONS:
+                payload[prop] = [matrix.vocab[dim][entity] for entity in getattr(lesson, prop) or []]
+            data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            digest.update(data)
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    save("payload_offsets", np.array(offsets, dtype=np.int64))
+
+    with open(os.path.join(tmp_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    digest.update(json.dumps(vocab, sort_keys=True).encode('utf-8'))
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'lessons': len(matrix),
+        'dimensions': {dim: len(columns) for dim, columns in vocab['columns'].items()},
+        'digest': digest.hexdigest()
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    publish_index(tmp_dir, index_dir, manifest['digest'])
+    return manifest
+
+
+def publish_index(build_dir: str, index_dir: str, digest: str):
+    """Move a finished build to its versioned directory and point index_dir at it"""
+    base = index_dir.rstrip(os.sep)
+    version_dir = f"{base}.v{digest[:16]}"
+    previous = os.path.realpath(base) if os.path.islink(base) else None
+    if previous == os.path.realpath(version_dir):
+        # Same content as the current version
+        shutil.rmtree(build_dir)
+        return
+    if os.path.exists(version_dir):
+        shutil.rmtree(version_dir)
+    os.rename(build_dir, version_dir)
+
+    link = f"{base}.{os.getpid()}.link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version_dir), link)
+    if os.path.isdir(base) and not os.path.islink(base):
+        # Index directory of an earlier layout: moved aside once, then replaced by the link
+        aside = f"{base}.{os.getpid()}.old"
+        os.rename(base, aside)
+        os.replace(link, base)
+        shutil.rmtree(aside)
+    else:
+        os.replace(link, base)
+
+    keep = {os.path.realpath(version_dir), previous}
+    for old in glob.glob(f"{glob.escape(base)}.v*"):
+        if os.path.realpath(old) not in keep and is_index_dir(old):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class PayloadStore:
+    """
+    Lessons of a compiled index, decoded from the payload file on access
+    Behaves like the list LessonMatrix.lessons; decoded lessons are kept,
+    and their row is recorded in `rows` so they can be excluded as targets.
+    """
+
+    def __init__(self, path: str, offsets: np.ndarray, entities: Dict[str, List[IndexedEntity]]):
+        self.offsets = offsets
+        self.entities = entities
+        self.rows = {}
+        self._lessons = {}
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if len(offsets) > 1 else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        lesson = self._lessons.get(i)
+        if lesson is None:
+            payload = json.loads(self._data[self.offsets[i]:self.offsets[i + 1]])
+            lesson = LessonFeatures()
+            for prop in PAYLOAD_PROPERTIES:
+                setattr(lesson, prop, payload[prop])
+            for dim, prop in FEATURE_DIMENSIONS:
+                setattr(lesson, prop, [self.entities[dim][column] for column in payload[prop]])
+            lesson = self._lessons.setdefault(i, lesson)
+            self.rows[lesson] = i
+        return lesson
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class CompiledIndex:
+    """
+    A compiled index directory opened with memory-mapped arrays
+
+    Provides the vocabulary, lesson matrix and inverted index a
+    SimilarityEngine needs. Arrays are mapped read-only, so several
+    processes opening the same directory share one page-cached copy.
+    """
+
+    def __init__(self, index_dir: str):
+        self.path = index_dir
+        with open(os.path.join(index_dir, MANIFEST), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest['format'] != FORMAT_VERSION:
+            raise ValueError(f"{index_dir} has index format {self.manifest['format']}, "
+                             f"expected {FORMAT_VERSION}: rebuild it")
+
+        with open(os.path.join(index_dir, 'vocab.json'), 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode='r')
+
+        all_entities = [IndexedEntity(name, label) for name, label in vocab['entities']]
+        entities = {dim: [all_entities[i] for i in ids] for dim, ids in vocab['columns'].items()}
+
+        # Lesson matrix over the mapped arrays
+        matrix = LessonMatrix.__new__(LessonMatrix)
+        matrix.lessons = PayloadStore(os.path.join(index_dir, 'payloads.bin'), load('payload_offsets'), entities)
+        matrix.rows = matrix.lessons.rows
+        matrix.vocab = {dim: {entity: column for column, entity in enumerate(entities[dim])} for dim in entities}
+        matrix.features = {dim: load(f"features_{dim}") for dim in entities}
+        matrix.sizes = {dim: load(f"sizes_{dim}") for dim in entities}
+        matrix.age_min = load('age_min')
+        matrix.age_max = load('age_max')
+        matrix.duration = load('duration')
+        self.matrix = matrix
+
+        # Inverted index: each posting list is a view into the mapped rows array
+        index = InvertedIndex.__new__(InvertedIndex)
+        index.matrix = matrix
+        index.postings = {}
+        for dim in entities:
+            indptr, rows = load(f"postings_{dim}.indptr"), load(f"postings_{dim}.rows")
+            index.postings[dim] = [rows[indptr[c]:indptr[c + 1]] for c in range(len(indptr) - 1)]
+        self.index = index
+
+        self.vocabulary = Vocabulary.from_entities(all_entities)
+
+
+def open_index(index_dir: str) -> CompiledIndex:
+    """Open a compiled index directory"""
+    return CompiledIndex(index_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from owlready2 import World
+    from ontology_store import is_store_path, open_store
+
+    arg_parser = argparse.ArgumentParser(description="Compile the lesson corpus into a memory-mappable index")
+    arg_parser.add_argument('--ontology', default="ontology/peace_pedagogy.owl",
+                            help="RDF/XML ontology or SQLite store (.sqlite3) holding the lessons")
+    arg_parser.add_argument('--output', default="data/lesson_index", help="index directory to write")
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    if is_store_path(args.ontology):
+        world, onto = open_store(args.ontology, exclusive=False)
+    else:
+        onto = World().get_ontology(args.ontology).load()
+
+    manifest = build_index(onto, args.output)
+    print(f"Compiled {manifest['lessons']} lessons into {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"Query it with ontology_path=\"{args.output}\"")
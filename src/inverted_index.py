@@ -0,0 +1,186 @@
+"""
+Inverted Index for Peace Pedagogy Lessons
+Prunes similarity queries to the lessons that can still make the top-k
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+
+from lesson_matrix import LessonMatrix, SET_DIMENSIONS, FEATURE_DIMENSIONS, DIMENSIONS, first_value, top_k_rows
+
+
+# Minimum number of candidates scored per branch-and-bound step
+BLOCK_SIZE = 1024
+
+
+class InvertedIndex:
+    """
+    Maps every axis/tool/virtue/strategy/domain entity to the rows of the
+    lessons carrying it
+
+    A query only scores the lessons sharing at least one entity with it,
+    in decreasing order of a cheap score upper bound, and stops as soon as
+    the remaining bounds cannot reach min_similarity or beat the current
+    k-th score. Lessons sharing nothing can only score on age and duration,
+    so they are scored only when those two weights could still matter.
+    """
+
+    def __init__(self, matrix: LessonMatrix):
+        self.matrix = matrix
+
+        # dimension -> list of row arrays, one per vocabulary column
+        self.postings = {}
+        for dim, features in matrix.features.items():
+            self.postings[dim] = [np.flatnonzero(features[:, column]) for column in range(features.shape[1])]
+
+    def extended(self, matrix: LessonMatrix) -> 'InvertedIndex':
+        """
+        Return the index of a matrix made by self.matrix.extended(...)
+        Only the appended rows are scanned; this index is left untouched
+        """
+        n = len(self.matrix)
+        index = InvertedIndex.__new__(InvertedIndex)
+        index.matrix = matrix
+        index.postings = {}
+        for dim, features in matrix.features.items():
+            old = self.postings[dim]
+            postings = []
+            for column in range(features.shape[1]):
+                added = np.flatnonzero(features[n:, column]) + n
+                postings.append(np.concatenate([old[column], added]) if column < len(old) else added)
+            index.postings[dim] = postings
+        return index
+
+    def updated(self, matrix: LessonMatrix, rows) -> 'InvertedIndex':
+        """
+        Return the index of a matrix made by self.matrix.updated(...)
+        Only the given rows are moved between posting lists
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        index = InvertedIndex.__new__(InvertedIndex)
+        index.matrix = matrix
+        index.postings = {}
+        for dim, features in matrix.features.items():
+            old = self.postings[dim]
+            present = features[rows] > 0
+            postings = []
+            for column in range(features.shape[1]):
+                kept = old[column] if column < len(old) else rows[:0]
+                changed = np.isin(kept, rows)
+                if changed.any() or present[:, column].any():
+                    kept = np.union1d(kept[~changed], rows[present[:, column]])
+                postings.append(kept)
+            index.postings[dim] = postings
+        return index
+
+    def candidates(self, lesson) -> np.ndarray:
+        """Sorted rows of the lessons sharing at least one entity with the query"""
+        lists = []
+        for dim, prop in FEATURE_DIMENSIONS:
+            for value in set(getattr(lesson, prop) or []):
+                column = self.matrix.vocab[dim].get(value)
+                if column is not None:
+                    lists.append(self.postings[dim][column])
+
+        if not lists:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate(lists))
+
+    def upper_bounds(self, lesson, rows: np.ndarray, weights: Dict[str, float]) -> np.ndarray:
+        """
+        Upper bound of the overall similarity of each row, from set sizes only:
+        a Jaccard index never exceeds min(|A|, |B|) / max(|A|, |B|)
+        """
+        terms = {}
+        for dim, prop in SET_DIMENSIONS:
+            size = len(set(getattr(lesson, prop) or []))
+            sizes = self.matrix.sizes[dim][rows]
+            terms[dim] = np.zeros(len(rows), dtype=np.float64)
+            if size:
+                np.divide(np.minimum(sizes, size), np.maximum(sizes, size), out=terms[dim], where=sizes > 0)
+
+        has_age = first_value(lesson.targetAgeMin) != 0
+        has_duration = first_value(lesson.duration) != 0
+        has_domain = bool(lesson.belongsToDomain)
+        terms['age'] = ((self.matrix.age_min[rows] != 0) & has_age).astype(np.float64)
+        terms['duration'] = ((self.matrix.duration[rows] != 0) & has_duration).astype(np.float64)
+        terms['domain'] = ((self.matrix.sizes['domain'][rows] > 0) & has_domain).astype(np.float64)
+
+        # Same accumulation order as the exact score, so bound >= score holds in floating point
+        bounds = np.zeros(len(rows), dtype=np.float64)
+        for dim in DIMENSIONS:
+            bounds += weights[dim] * terms[dim]
+        return bounds
+
+    def rest_bound(self, lesson, weights: Dict[str, float]) -> float:
+        """Upper bound for lessons sharing no entity: only age and duration can score"""
+        terms = {dim: 0.0 for dim in DIMENSIONS}
+        terms['age'] = 1.0 if first_value(lesson.targetAgeMin) != 0 else 0.0
+        terms['duration'] = 1.0 if first_value(lesson.duration) != 0 else 0.0
+
+        bound = 0.0
+        for dim in DIMENSIONS:
+            bound += weights[dim] * terms[dim]
+        return bound
+
+    def search(self, lesson, weights: Dict[str, float], top_k: int, min_similarity: float = 0.0,
+               exclude=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the k best rows scoring at least min_similarity
+        Returns (rows, dimension_scores, scores) with rows best first and ties
+        in corpus order, exactly as a full scan would rank them
+        """
+        matrix = self.matrix
+        n = len(matrix)
+        allowed = np.ones(n, dtype=bool)
+        if exclude is not None:
+            allowed[exclude] = False
+
+        # Bounds only hold for non-negative weights: fall back to a full scan
+        if top_k <= 0 or any(w < 0 for w in weights.values()):
+            dimension_scores = matrix.dimension_scores(lesson)
+            scores = matrix.weighted_scores(dimension_scores, weights)
+            best = top_k_rows(scores, np.flatnonzero(allowed & (scores >= min_similarity)), top_k)
+            return best, dimension_scores[:, best], scores[best]
+
+        scores = np.full(n, -np.inf)
+        dimension_scores = np.zeros((len(DIMENSIONS), n), dtype=np.float64)
+        kept = np.empty(0, dtype=np.intp)
+
+        def threshold():
+            if len(kept) < top_k:
+                return min_similarity
+            return max(min_similarity, scores[kept].min())
+
+        def score_rows(rows):
+            nonlocal kept
+            dimension_scores[:, rows] = matrix.dimension_scores(lesson, rows)
+            scores[rows] = matrix.weighted_scores(dimension_scores[:, rows], weights)
+            passed = rows[scores[rows] >= min_similarity]
+            kept = np.sort(top_k_rows(scores, np.union1d(kept, passed), top_k))
+
+        # Candidates sharing an entity, best bound first
+        candidates = self.candidates(lesson)
+        candidates = candidates[allowed[candidates]]
+        bounds = self.upper_bounds(lesson, candidates, weights)
+        order = np.argsort(-bounds, kind='stable')
+        block = max(4 * top_k, BLOCK_SIZE)
+
+        for start in range(0, len(order), block):
+            chunk = order[start:start + block]
+            # A bound equal to the k-th score may still win the tie on corpus order
+            chunk = chunk[bounds[chunk] >= threshold()]
+            if len(chunk) == 0:
+                break
+            score_rows(np.sort(candidates[chunk]))
+
+        # Lessons sharing nothing with the query
+        if self.rest_bound(lesson, weights) >= threshold():
+            rest = allowed.copy()
+            rest[candidates] = False
+            rest = np.flatnonzero(rest)
+            if len(rest):
+                score_rows(rest)
+
+        best = top_k_rows(scores, kept, top_k)
+        return best, dimension_scores[:, best], scores[best]
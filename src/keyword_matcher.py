@@ -0,0 +1,74 @@
+"""
+Keyword Matcher for Pedagogical Sheet Text
+Finds every virtue/tool/axis keyword of a document in a single pass
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Set
+
+
+# Combining diacritical marks left over by NFD decomposition
+COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+
+# A word of folded text
+WORD = re.compile(r'\w+')
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip accents: 'Éveil' -> 'eveil'"""
+    return COMBINING_MARKS.sub('', unicodedata.normalize('NFD', text.lower()))
+
+
+class KeywordMatcher:
+    """
+    Compiles keyword tables for single-pass detection
+
+    tables maps a kind ('virtues', 'tools', 'axes') to a {label: [keywords]}
+    dict. Matching is accent-folded and anchored at word starts, so a keyword
+    matches whole words and their inflections ('collabor' -> 'collaboration')
+    but not the inside of another word ('art' does not match 'partage').
+
+    The text is read once, by a compiled word pattern collecting its distinct
+    words. Each keyword is then a prefix lookup (bisect) in the sorted word
+    list, so the cost grows with log(words) per keyword instead of a full
+    scan of the text per keyword. Multi-word keywords ('pleine conscience')
+    are confirmed with a precompiled pattern only when their first word occurs.
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        # folded keyword -> set of (kind, label)
+        self.targets: Dict[str, Set[tuple]] = {}
+        for kind, table in tables.items():
+            for label, keywords in table.items():
+                for keyword in keywords:
+                    self.targets.setdefault(fold_accents(keyword), set()).add((kind, label))
+
+        self.words = sorted(keyword for keyword in self.targets if WORD.fullmatch(keyword))
+        self.phrases = {
+            keyword: (WORD.match(keyword).group(),
+                      re.compile(r'(?<!\w)' + r'\s+'.join(map(re.escape, keyword.split()))))
+            for keyword in self.targets if not WORD.fullmatch(keyword) and WORD.match(keyword)
+        }
+        self.kinds = list(tables)
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """Return the labels found in a text, grouped by kind"""
+        hits = {kind: set() for kind in self.kinds}
+
+        text = fold_accents(text)
+        words = sorted(set(WORD.findall(text)))
+
+        def starts_a_word(prefix):
+            i = bisect_left(words, prefix)
+            return i < len(words) and words[i].startswith(prefix)
+
+        found = [keyword for keyword in self.words if starts_a_word(keyword)]
+        found += [phrase for phrase, (first_word, pattern) in self.phrases.items()
+                  if starts_a_word(first_word) and pattern.search(text)]
+
+        for keyword in found:
+            for kind, label in self.targets[keyword]:
+                hits[kind].add(label)
+        return hits
@@ -0,0 +1,54 @@
+"""
+Lesson Features for Peace Pedagogy Queries
+Lightweight in-memory stand-in for a Lesson individual
+"""
+
+from typing import Iterable
+
+
+class LessonFeatures:
+    """
+    Describes a lesson with the same list-valued properties as an ontology
+    Lesson (hasAxis, usesTool, targetAgeMin, ...), so the similarity engine
+    can score it directly without writing an individual into the ontology.
+    Instances are never shared with the ontology, which keeps the query path
+    free of side effects and safe to use from several threads.
+    """
+
+    __slots__ = ('title', 'description', 'discipline', 'duration',
+                 'targetAgeMin', 'targetAgeMax', 'groupSizeMin', 'groupSizeMax',
+                 'hasAxis', 'usesTool', 'developsVirtue', 'employsStrategy', 'belongsToDomain')
+
+    def __init__(self,
+                 title: str = None,
+                 description: str = None,
+                 discipline: str = None,
+                 duration: float = None,
+                 target_age_min: int = None,
+                 target_age_max: int = None,
+                 group_size_min: int = None,
+                 group_size_max: int = None,
+                 axes: Iterable = (),
+                 tools: Iterable = (),
+                 virtues: Iterable = (),
+                 strategies: Iterable = (),
+                 domains: Iterable = ()):
+        # Unset values become empty lists, like unset properties of an individual
+        self.title = [title] if title else []
+        self.description = [description] if description else []
+        self.discipline = [discipline] if discipline else []
+        self.duration = [float(duration)] if duration else []
+        self.targetAgeMin = [int(target_age_min)] if target_age_min else []
+        self.targetAgeMax = [int(target_age_max)] if target_age_max else []
+        self.groupSizeMin = [int(group_size_min)] if group_size_min else []
+        self.groupSizeMax = [int(group_size_max)] if group_size_max else []
+
+        self.hasAxis = list(axes)
+        self.usesTool = list(tools)
+        self.developsVirtue = list(virtues)
+        self.employsStrategy = list(strategies)
+        self.belongsToDomain = list(domains)
+
+    def __repr__(self):
+        title = self.title[0] if self.title else "Untitled"
+        return f"LessonFeatures({title!r})"
@@ -0,0 +1,161 @@
+"""
+Streaming Lesson Files for Peace Pedagogy Lessons
+Reads and writes lesson records one at a time, in JSON Lines or JSON array form
+"""
+
+import os
+import re
+import json
+from typing import Dict, Iterable, Iterator
+
+
+# Bytes read at a time by the incremental JSON reader
+CHUNK_SIZE = 1 << 16
+
+# Start of the lesson array in {"lessons": [...]} files
+LESSONS_ARRAY = re.compile(r'"lessons"\s*:\s*\[')
+
+
+def is_jsonl_path(path: str) -> bool:
+    """True if a path names a JSON Lines file"""
+    return path.lower().endswith(('.jsonl', '.ndjson'))
+
+
+def iter_lessons(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Yield the lesson records of a file one at a time
+
+    .jsonl/.ndjson files hold one record per line. Other files are JSON
+    documents such as data/pedagogical_sheets.json ({"lessons": [...]}, or a
+    bare array); their array is decoded element by element, so memory holds
+    one record and one chunk of text however large the file is.
+    """
+    if is_jsonl_path(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from _iter_json_array(f, chunk_size)
+
+
+def _iter_json_array(f, chunk_size: int) -> Iterator[Dict]:
+    """Decode the elements of the lesson array of a JSON document incrementally"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+    # Find the opening bracket of the array
+    while True:
+        fill()
+        match = LESSONS_ARRAY.search(buffer)
+        if match:
+            pos = match.end()
+            break
+        stripped = buffer.lstrip()
+        if stripped.startswith('['):
+            pos = len(buffer) - len(stripped) + 1
+            break
+        if eof:
+            raise ValueError("No lesson array found")
+        if not stripped.startswith('{'):
+            buffer = buffer[-64:]  # Keep enough to match a key split across chunks
+
+    while True:
+        # Skip separators, loading more text as needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = "", 0
+            fill()
+
+        if pos >= len(buffer):
+            raise ValueError("Unterminated lesson array")
+        if buffer[pos] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer, pos = buffer[pos:], 0
+            fill()
+            continue
+
+        yield record
+        pos = end
+
+
+class LessonWriter:
+    """
+    Writes lesson records to a file as they are produced
+
+    .jsonl/.ndjson paths get one compact record per line; other paths get
+    the {"lessons": [...]} document of data/pedagogical_sheets.json, written
+    element by element with the same layout json.dump(indent=2) produces.
+    Records go to a temporary file next to the target, which replaces the
+    target only when the writer is closed cleanly: an existing file is left
+    untouched if writing fails or is interrupted. Use as a context manager.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jsonl = is_jsonl_path(path)
+        self.count = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        if not self.jsonl:
+            self._file.write('{\n  "lessons": [')
+
+    def write(self, lesson: Dict):
+        """Append one lesson record"""
+        if self.jsonl:
+            self._file.write(json.dumps(lesson, ensure_ascii=False) + '\n')
+        else:
+            text = json.dumps(lesson, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+            self._file.write((',\n    ' if self.count else '\n    ') + text)
+        self.count += 1
+
+    def close(self):
+        """Finish the file and move it over the target"""
+        if self._file.closed:
+            return
+        if not self.jsonl:
+            self._file.write('\n  ]\n}' if self.count else ']\n}')
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        """Drop what was written, leaving the target as it was"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_lessons(path: str, lessons: Iterable[Dict]) -> int:
+    """Stream lesson records into a file; returns how many were written"""
+    with LessonWriter(path) as writer:
+        for lesson in lessons:
+            writer.write(lesson)
+    return writer.count
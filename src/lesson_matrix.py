@@ -0,0 +1,288 @@
+"""
+Lesson Matrix for Peace Pedagogy Lessons
+Encodes the lesson corpus once into NumPy arrays for vectorized similarity scoring
+"""
+
+import numpy as np
+from typing import Dict, List
+
+
+# Set-valued dimensions and the ontology property holding each of them
+SET_DIMENSIONS = [
+    ('axes', 'hasAxis'),
+    ('tools', 'usesTool'),
+    ('virtues', 'developsVirtue'),
+    ('strategies', 'employsStrategy'),
+]
+
+# Every entity-valued dimension: the set dimensions plus the domain
+FEATURE_DIMENSIONS = SET_DIMENSIONS + [('domain', 'belongsToDomain')]
+
+# Dimensions in the order compute_similarity accumulates them
+DIMENSIONS = ['axes', 'tools', 'virtues', 'strategies', 'age', 'duration', 'domain']
+
+# Optional dimension scored outside the matrix (see text_index.py), accumulated last
+TEXT_DIMENSION = 'text'
+
+
+def first_value(values, default=0):
+    """Return the first value of a functional property, or a default"""
+    return values[0] if values else default
+
+
+class LessonMatrix:
+    """
+    Column-oriented encoding of every lesson in the corpus
+
+    Each set dimension (axes, tools, virtues, strategies, domain) becomes an
+    N x V one-hot matrix, and ages/durations become flat arrays, so that one
+    query can be scored against the whole corpus in a few array operations.
+    """
+
+    def __init__(self, lessons):
+        self.lessons = list(lessons)
+        self.rows = {lesson: i for i, lesson in enumerate(self.lessons)}
+
+        # dimension -> {entity: column}, one-hot matrix and set sizes
+        self.vocab = {}
+        self.features = {}
+        self.sizes = {}
+
+        for dim, prop in FEATURE_DIMENSIONS:
+            self._encode_sets(dim, [set(getattr(lesson, prop) or []) for lesson in self.lessons])
+
+        self.age_min = np.array([first_value(l.targetAgeMin) for l in self.lessons], dtype=np.float64)
+        self.age_max = np.array([first_value(l.targetAgeMax) for l in self.lessons], dtype=np.float64)
+        self.duration = np.array([first_value(l.duration) for l in self.lessons], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.lessons)
+
+    def _encode_sets(self, dim: str, sets: List[set]):
+        """Build the vocabulary and one-hot matrix of a set dimension"""
+        vocab = {}
+        for values in sets:
+            for value in values:
+                vocab.setdefault(value, len(vocab))
+
+        matrix = np.zeros((len(sets), len(vocab)), dtype=np.float64)
+        for i, values in enumerate(sets):
+            for value in values:
+                matrix[i, vocab[value]] = 1.0
+
+        self.vocab[dim] = vocab
+        self.features[dim] = matrix
+        self.sizes[dim] = matrix.sum(axis=1)
+
+    def extended(self, lessons) -> 'LessonMatrix':
+        """
+        Return a new matrix with lessons appended after the current rows
+        This matrix is left untouched, so queries already running against it
+        keep scoring a consistent snapshot of the corpus.
+        """
+        lessons = list(lessons)
+        n = len(self.lessons)
+
+        matrix = LessonMatrix.__new__(LessonMatrix)
+        matrix.lessons = self.lessons + lessons
+        matrix.rows = dict(self.rows)
+        matrix.rows.update((lesson, n + i) for i, lesson in enumerate(lessons))
+        matrix.vocab, matrix.features, matrix.sizes = {}, {}, {}
+
+        for dim, prop in FEATURE_DIMENSIONS:
+            sets = [set(getattr(lesson, prop) or []) for lesson in lessons]
+            vocab = dict(self.vocab[dim])
+            for values in sets:
+                for value in values:
+                    vocab.setdefault(value, len(vocab))
+
+            features = np.zeros((len(matrix.lessons), len(vocab)), dtype=np.float64)
+            features[:n, :len(self.vocab[dim])] = self.features[dim]
+            for i, values in enumerate(sets):
+                for value in values:
+                    features[n + i, vocab[value]] = 1.0
+
+            matrix.vocab[dim] = vocab
+            matrix.features[dim] = features
+            matrix.sizes[dim] = np.concatenate([self.sizes[dim], features[n:].sum(axis=1)])
+
+        matrix.age_min = np.concatenate([self.age_min, [first_value(l.targetAgeMin) for l in lessons]])
+        matrix.age_max = np.concatenate([self.age_max, [first_value(l.targetAgeMax) for l in lessons]])
+        matrix.duration = np.concatenate([self.duration, [first_value(l.duration) for l in lessons]])
+        return matrix
+
+    def updated(self, lessons) -> 'LessonMatrix':
+        """
+        Return a new matrix where the rows of already indexed lessons are
+        re-encoded from their current properties (e.g. after an update)
+        Rows keep their position; this matrix is left untouched.
+        """
+        lessons = list(lessons)
+        rows = [self.rows[lesson] for lesson in lessons]
+
+        matrix = LessonMatrix.__new__(LessonMatrix)
+        matrix.lessons = list(self.lessons)
+        matrix.rows = dict(self.rows)
+        matrix.vocab, matrix.features, matrix.sizes = {}, {}, {}
+
+        for dim, prop in FEATURE_DIMENSIONS:
+            sets = [set(getattr(lesson, prop) or []) for lesson in lessons]
+            vocab = dict(self.vocab[dim])
+            for values in sets:
+                for value in values:
+                    vocab.setdefault(value, len(vocab))
+
+            features = np.zeros((len(matrix.lessons), len(vocab)), dtype=np.float64)
+            features[:, :len(self.vocab[dim])] = self.features[dim]
+            features[rows] = 0.0
+            for row, values in zip(rows, sets):
+                for value in values:
+                    features[row, vocab[value]] = 1.0
+
+            sizes = np.array(self.sizes[dim], dtype=np.float64)
+            sizes[rows] = features[rows].sum(axis=1)
+            matrix.vocab[dim] = vocab
+            matrix.features[dim] = features
+            matrix.sizes[dim] = sizes
+
+        matrix.age_min, matrix.age_max, matrix.duration = (
+            np.array(self.age_min, dtype=np.float64),
+            np.array(self.age_max, dtype=np.float64),
+            np.array(self.duration, dtype=np.float64))
+        for row, lesson in zip(rows, lessons):
+            matrix.age_min[row] = first_value(lesson.targetAgeMin)
+            matrix.age_max[row] = first_value(lesson.targetAgeMax)
+            matrix.duration[row] = first_value(lesson.duration)
+        return matrix
+
+    def _query_matrix(self, dim: str, value_sets: List[set]) -> np.ndarray:
+        """One-hot encode query sets; values unknown to the corpus are dropped"""
+        matrix = np.zeros((len(value_sets), len(self.vocab[dim])), dtype=np.float64)
+        for q, values in enumerate(value_sets):
+            for value in values:
+                column = self.vocab[dim].get(value)
+                if column is not None:
+                    matrix[q, column] = 1.0
+        return matrix
+
+    def dimension_scores(self, lesson, rows=None) -> np.ndarray:
+        """
+        Compute the unweighted score of every dimension between a lesson and
+        the corpus (or only the given rows of it). Returns a
+        (len(DIMENSIONS), N) array whose entries match the scalar methods of
+        SimilarityEngine exactly.
+        """
+        return self.batch_dimension_scores([lesson], rows)[:, 0]
+
+    def batch_dimension_scores(self, lessons, rows=None) -> np.ndarray:
+        """
+        Score Q query lessons against the corpus (or the given rows of it)
+        in one pass. Returns a (len(DIMENSIONS), Q, N) array.
+        """
+        def take(array):
+            return array if rows is None else array[rows]
+
+        n = len(self.lessons) if rows is None else len(rows)
+        scores = np.zeros((len(DIMENSIONS), len(lessons), n), dtype=np.float64)
+
+        # 1-4. Jaccard over set dimensions: |A n B| / (|A| + |B| - |A n B|)
+        for d, (dim, prop) in enumerate(SET_DIMENSIONS):
+            value_sets = [set(getattr(lesson, prop) or []) for lesson in lessons]
+            query_sizes = np.array([len(values) for values in value_sets], dtype=np.float64)[:, None]
+            sizes = take(self.sizes[dim])[None, :]
+            inter = self._query_matrix(dim, value_sets) @ take(self.features[dim]).T
+            union = query_sizes + sizes - inter
+            np.divide(inter, union, out=scores[d], where=(query_sizes > 0) & (sizes > 0))
+
+        # 5. Age range overlap relative to the longest range
+        age_min = np.array([first_value(l.targetAgeMin) for l in lessons], dtype=np.float64)[:, None]
+        age_max = np.array([first_value(l.targetAgeMax) for l in lessons], dtype=np.float64)[:, None]
+        lesson_min, lesson_max = take(self.age_min)[None, :], take(self.age_max)[None, :]
+        start = np.maximum(lesson_min, age_min)
+        end = np.minimum(lesson_max, age_max)
+        overlap = end - start + 1
+        longest = np.maximum(lesson_max - lesson_min + 1, age_max - age_min + 1)
+        valid = (age_min != 0) & (lesson_min != 0) & (start <= end)
+        np.divide(overlap, longest, out=scores[4], where=valid)
+
+        # 6. Duration ratio of shorter to longer
+        duration = np.array([first_value(l.duration) for l in lessons], dtype=np.float64)[:, None]
+        durations = take(self.duration)[None, :]
+        np.divide(np.minimum(durations, duration), np.maximum(durations, duration),
+                  out=scores[5], where=(duration != 0) & (durations != 0))
+
+        # 7. Shared domain
+        domain_sets = [set(lesson.belongsToDomain or []) for lesson in lessons]
+        shared = self._query_matrix('domain', domain_sets) @ take(self.features['domain']).T
+        scores[6] = (shared > 0).astype(np.float64)
+
+        return scores
+
+    def pair_dimension_scores(self, rows_a: np.ndarray, rows_b: np.ndarray) -> np.ndarray:
+        """
+        Score P lesson pairs (rows_a[p], rows_b[p]) of the corpus on every
+        dimension, straight from the encoded arrays. Returns a
+        (len(DIMENSIONS), P) array equal to batch_dimension_scores entries.
+        """
+        rows_a, rows_b = np.asarray(rows_a, dtype=np.intp), np.asarray(rows_b, dtype=np.intp)
+        scores = np.zeros((len(DIMENSIONS), len(rows_a)), dtype=np.float64)
+
+        # 1-4. Jaccard over set dimensions
+        for d, (dim, prop) in enumerate(SET_DIMENSIONS):
+            features = self.features[dim]
+            inter = np.einsum('ij,ij->i', features[rows_a], features[rows_b])
+            sizes_a, sizes_b = self.sizes[dim][rows_a], self.sizes[dim][rows_b]
+            np.divide(inter, sizes_a + sizes_b - inter, out=scores[d], where=(sizes_a > 0) & (sizes_b > 0))
+
+        # 5. Age range overlap relative to the longest range
+        min_a, max_a = self.age_min[rows_a], self.age_max[rows_a]
+        min_b, max_b = self.age_min[rows_b], self.age_max[rows_b]
+        start, end = np.maximum(min_a, min_b), np.minimum(max_a, max_b)
+        longest = np.maximum(max_b - min_b + 1, max_a - min_a + 1)
+        np.divide(end - start + 1, longest, out=scores[4], where=(min_a != 0) & (min_b != 0) & (start <= end))
+
+        # 6. Duration ratio of shorter to longer
+        duration_a, duration_b = self.duration[rows_a], self.duration[rows_b]
+        np.divide(np.minimum(duration_a, duration_b), np.maximum(duration_a, duration_b),
+                  out=scores[5], where=(duration_a != 0) & (duration_b != 0))
+
+        # 7. Shared domain
+        features = self.features['domain']
+        scores[6] = (np.einsum('ij,ij->i', features[rows_a], features[rows_b]) > 0).astype(np.float64)
+
+        return scores
+
+    def weighted_scores(self, dimension_scores: np.ndarray, weights: Dict[str, float]) -> np.ndarray:
+        """
+        Combine per-dimension scores into overall similarities, accumulating
+        in the same order as compute_similarity so results are bit-identical
+        Text scores may be stacked after the matrix dimensions
+        """
+        total = np.zeros(dimension_scores.shape[1:], dtype=np.float64)
+        for d, dim in enumerate(DIMENSIONS):
+            total += weights[dim] * dimension_scores[d]
+        if len(dimension_scores) > len(DIMENSIONS):
+            total += weights.get(TEXT_DIMENSION, 0.0) * dimension_scores[len(DIMENSIONS)]
+        return total
+
+    def score(self, lesson, weights: Dict[str, float]) -> np.ndarray:
+        """Overall similarity between a lesson and every lesson of the corpus"""
+        return self.weighted_scores(self.dimension_scores(lesson), weights)
+
+
+def top_k_rows(scores: np.ndarray, rows: np.ndarray, k: int) -> np.ndarray:
+    """
+    Select the k best rows by score without sorting all of them
+    Rows come back best first; ties go to the earlier row, like a stable sort
+    """
+    if k <= 0:
+        return rows[:0]
+
+    if len(rows) > k:
+        values = scores[rows]
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        above = rows[values > kth]
+        ties = rows[values == kth][:k - len(above)]
+        rows = np.concatenate([above, ties])
+
+    return rows[np.lexsort((rows, -scores[rows]))]
@@ -0,0 +1,159 @@
+"""
+Neighbor Graph for Peace Pedagogy Lessons
+Keeps the nearest neighbours of every indexed lesson for "more like this" lookups
+"""
+
+import numpy as np
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from lesson_matrix import LessonMatrix, top_k_rows
+
+
+# Neighbours kept per lesson; a corpus of up to NEIGHBORS + 1 lessons keeps every pair
+NEIGHBORS = 50
+
+# Upper bound on lesson x lesson cells scored at once
+BLOCK_CELLS = 4_000_000
+
+
+class NeighborGraph:
+    """
+    Truncated k-nearest-neighbour graph over a LessonMatrix
+
+    Row i of `neighbors`/`scores` holds the (at most k) other lessons most
+    similar to lesson i, best first with ties in corpus order: exactly the
+    head of the ranking a full scan returns. While the corpus has at most
+    k + 1 lessons this is the whole N x N score matrix.
+
+    Similarity is symmetric, so adding or changing a lesson scores one row
+    against the corpus and patches the same values, as a column, into the
+    other lists. A list is rescored only when a changed lesson drops out of
+    it, since its next best neighbour is then unknown.
+    """
+
+    def __init__(self, matrix: LessonMatrix, weights: Dict[str, float], k: int = NEIGHBORS, build: bool = True):
+        self.matrix = matrix
+        self.weights = dict(weights)
+        self.k = k
+
+        n = len(matrix) if build else 0
+        self.neighbors = np.full((n, k), -1, dtype=np.intp)
+        self.scores = np.full((n, k), -np.inf)
+        self.counts = np.zeros(n, dtype=np.intp)
+        if build:
+            for row, row_scores in self.score_rows(range(n)):
+                self._set(row, row_scores)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def score_rows(self, rows: Iterable[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (row, similarity of that lesson to every lesson), scoring in blocks"""
+        rows = list(rows)
+        block = max(1, BLOCK_CELLS // max(len(self.matrix), 1))
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            lessons = [self.matrix.lessons[row] for row in chunk]
+            scores = self.matrix.weighted_scores(self.matrix.batch_dimension_scores(lessons), self.weights)
+            yield from zip(chunk, scores)
+
+    def lookup(self, row: int, top_k: int, min_similarity: float = 0.0) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        The top_k neighbours of a lesson scoring at least min_similarity, as
+        (rows, scores), or None when the truncated list is too short to tell
+        """
+        count = self.counts[row]
+        if top_k > count and count < len(self) - 1:
+            return None
+        scores = self.scores[row, :count]
+        keep = min(max(top_k, 0), int(np.count_nonzero(scores >= min_similarity)))
+        return self.neighbors[row, :keep], scores[:keep]
+
+    def updated(self, matrix: LessonMatrix, rows: Iterable[int]) -> 'NeighborGraph':
+        """
+        Return the graph of a matrix made from self.matrix by updated(...)
+        and/or extended(...), where `rows` are the changed rows (appended rows
+        are always included). This graph is left untouched.
+        """
+        n = len(self)
+        graph = NeighborGraph(matrix, self.weights, self.k, build=False)
+        added = len(matrix) - n
+        graph.neighbors = np.vstack([self.neighbors, np.full((added, self.k), -1, dtype=np.intp)])
+        graph.scores = np.vstack([self.scores, np.full((added, self.k), -np.inf)])
+        graph.counts = np.concatenate([self.counts, np.zeros(added, dtype=np.intp)])
+
+        changed = sorted(set(rows) | set(range(n, len(matrix))))
+        stale = set()
+        for row, row_scores in graph.score_rows(changed):
+            stale |= graph._patch_column(row, row_scores)
+            stale.discard(row)  # Exact after _set, unless a later changed row drops out of it
+            graph._set(row, row_scores)
+
+        for row, row_scores in graph.score_rows(sorted(stale)):
+            graph._set(row, row_scores)
+        return graph
+
+    def _set(self, row: int, row_scores: np.ndarray):
+        """Replace the list of a row by the best of a full score vector"""
+        others = np.flatnonzero(np.arange(len(row_scores)) != row)
+        best = top_k_rows(row_scores, others, self.k)
+        self.neighbors[row] = -1
+        self.scores[row] = -np.inf
+        self.neighbors[row, :len(best)] = best
+        self.scores[row, :len(best)] = row_scores[best]
+        self.counts[row] = len(best)
+
+    def _patch_column(self, row: int, row_scores: np.ndarray) -> set:
+        """
+        Move `row` to its new place in every other list
+        Returns the rows whose list can no longer be completed without rescoring
+        """
+        stale = set()
+        full = self.counts == self.k
+        contains = (self.neighbors == row).any(axis=1)
+        contains[row] = False
+
+        for i in np.flatnonzero(contains):
+            self._remove(i, row)
+            if not full[i]:
+                self._insert(i, row, row_scores[i])
+            elif self.counts[i] and self._before(row_scores[i], row, i, self.counts[i] - 1):
+                self._insert(i, row, row_scores[i])
+            else:
+                stale.add(int(i))
+
+        # Lists not holding the row: insert where it beats the last neighbour
+        last_score = np.where(full, self.scores[:, -1], -np.inf)
+        last_row = np.where(full, self.neighbors[:, -1], -1)
+        beats = (row_scores > last_score) | ((row_scores == last_score) & (row < last_row))
+        beats &= ~contains
+        beats[row] = False
+        for i in np.flatnonzero(beats):
+            self._insert(i, row, row_scores[i])
+        return stale
+
+    def _before(self, score: float, row: int, i: int, j: int) -> bool:
+        """True if (score, row) ranks before the j-th neighbour of row i"""
+        return score > self.scores[i, j] or (score == self.scores[i, j] and row < self.neighbors[i, j])
+
+    def _remove(self, i: int, row: int):
+        count = self.counts[i]
+        j = int(np.flatnonzero(self.neighbors[i, :count] == row)[0])
+        self.neighbors[i, j:count - 1] = self.neighbors[i, j + 1:count].copy()
+        self.scores[i, j:count - 1] = self.scores[i, j + 1:count].copy()
+        self.neighbors[i, count - 1] = -1
+        self.scores[i, count - 1] = -np.inf
+        self.counts[i] = count - 1
+
+    def _insert(self, i: int, row: int, score: float):
+        count = self.counts[i]
+        scores, neighbors = self.scores[i, :count], self.neighbors[i, :count]
+        position = int(np.count_nonzero((scores > score) | ((scores == score) & (neighbors < row))))
+        if position >= self.k:
+            return
+        end = min(count + 1, self.k)
+        self.neighbors[i, position + 1:end] = self.neighbors[i, position:end - 1].copy()
+        self.scores[i, position + 1:end] = self.scores[i, position:end - 1].copy()
+        self.neighbors[i, position] = row
+        self.scores[i, position] = score
+        self.counts[i] = end
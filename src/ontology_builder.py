@@ -235,6 +235,11 @@ def create_peace_pedagogy_ontology():
             domain = [Lesson]
             range = [str]
         
+        class contentHash(DataProperty):
+            """Hash of the source record, used to detect changed lessons"""
+            domain = [Lesson]
+            range = [str]
+        
         # ==================== INSTANCES (VOCABULARY) ====================
         
         # Create standard instances for axes
@@ -0,0 +1,57 @@
+"""
+Persistent Ontology Store for Peace Pedagogy Lessons
+Keeps the lesson world in an owlready2 SQLite quadstore instead of RDF/XML
+"""
+
+import os
+from owlready2 import World
+
+
+# File extensions recognized as SQLite quadstores rather than RDF/XML files
+STORE_EXTENSIONS = ('.sqlite3', '.sqlite', '.db')
+
+
+def is_store_path(path: str) -> bool:
+    """True if a path names a SQLite quadstore"""
+    return path.lower().endswith(STORE_EXTENSIONS)
+
+
+def open_store(store_path: str, ontology_path: str = "ontology/peace_pedagogy.owl", exclusive: bool = True):
+    """
+    Open the SQLite quadstore, creating it from the RDF/XML ontology on first use
+
+    Opening an existing store parses nothing: owlready2 reads entities from
+    SQLite on demand, so cold-start time does not grow with the corpus.
+    Readers should pass exclusive=False so that a loader can keep writing.
+
+    Returns (world, onto)
+    """
+    is_new = not os.path.exists(store_path)
+
+    world = World()
+    world.set_backend(filename=store_path, exclusive=exclusive)
+
+    if not is_new:
+        onto = find_lesson_ontology(world)
+        if onto is not None:
+            return world, onto
+
+    # Empty store: import the RDF/XML ontology once and commit it
+    onto = world.get_ontology(os.path.abspath(ontology_path)).load()
+    world.save()
+    return world, onto
+
+
+def find_lesson_ontology(world):
+    """Return the ontology of a world that defines the Lesson class, if any"""
+    for iri in world.graph.ontologies_iris():
+        onto = world.get_ontology(iri)
+        if onto.Lesson is not None:
+            return onto
+    return None
+
+
+def export_rdfxml(onto, output_path: str):
+    """Write the ontology as RDF/XML, e.g. for editing in Protégé"""
+    onto.save(file=output_path, format="rdfxml")
+    print(f"Exported ontology to {output_path}")
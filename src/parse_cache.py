@@ -0,0 +1,133 @@
+"""
+Parse Cache for Peace Pedagogy Pedagogical Sheets
+Remembers extracted text and lesson data per PDF content hash
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed sheets, keyed by PDF content hash
+
+    Layout of the cache directory:
+        index.json          path -> {mtime_ns, size, hash}: skips hashing unchanged files
+        entries/ab/<hash>.json
+                            extracted text and derived lesson dict of one PDF
+
+    Each entry records two fingerprints of the parser that produced it:
+    the extraction fingerprint (how text is read from the PDF) and the
+    detection fingerprint (parser version and keyword tables). When only the
+    detection fingerprint changed, the lesson is re-derived from the cached
+    text without opening the PDF; when the extraction fingerprint changed,
+    the entry is ignored and the PDF is parsed again.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        os.makedirs(os.path.join(cache_dir, 'entries'), exist_ok=True)
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+
+        self.hits = 0
+        self.rederived = 0
+        self.misses = 0
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, 'entries', digest[:2], f"{digest}.json")
+
+    def file_hash(self, pdf_path: str) -> str:
+        """Content hash of a PDF, trusting the index while mtime and size are unchanged"""
+        key = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+        known = self.index.get(key)
+        if known and known['mtime_ns'] == stat.st_mtime_ns and known['size'] == stat.st_size:
+            return known['hash']
+
+        digest = content_hash(pdf_path)
+        self.index[key] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest}
+        return digest
+
+    def _read_entry(self, digest: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_path(digest), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, digest: str, entry: Dict):
+        path = self._entry_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def lookup(self, pdf_path: str, parser) -> Optional[Dict]:
+        """
+        Return the lesson dict of a PDF if its content was parsed before
+        Returns None when the PDF has to be (re-)extracted
+        """
+        digest = self.file_hash(pdf_path)
+        entry = self._read_entry(digest)
+
+        if entry is None or entry['extraction'] != parser.extraction_fingerprint():
+            self.misses += 1
+            return None
+
+        filename = os.path.basename(pdf_path)
+        if entry['detection'] == parser.detection_fingerprint() and entry['filename'] == filename:
+            self.hits += 1
+            lesson_data = dict(entry['lesson'])
+            lesson_data['pdf_path'] = pdf_path
+            return parser.with_content(lesson_data, entry['text'])
+
+        # Keyword tables, parser version or file name changed: re-derive from the cached text
+        self.rederived += 1
+        lesson_data = parser.build_lesson(pdf_path, entry['text'])
+        self.store(pdf_path, entry['text'], lesson_data, parser)
+        return parser.with_content(lesson_data, entry['text'])
+
+    def store(self, pdf_path: str, text: str, lesson_data: Dict, parser):
+        """Remember the extracted text and lesson dict of a PDF"""
+        self._write_entry(self.file_hash(pdf_path), {
+            'filename': os.path.basename(pdf_path),
+            'extraction': parser.extraction_fingerprint(),
+            'detection': parser.detection_fingerprint(),
+            'text': text,
+            'lesson': lesson_data
+        })
+
+    def save(self):
+        """Write the path index to disk"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def clear(self):
+        """Invalidate every entry"""
+        for root, _, files in os.walk(os.path.join(self.cache_dir, 'entries')):
+            for name in files:
+                os.remove(os.path.join(root, name))
+        self.index = {}
+        self.save()
+
+    def summary(self) -> str:
+        return f"{self.hits} cached, {self.rederived} re-derived, {self.misses} parsed"
@@ -6,18 +6,67 @@ Extracts metadata from PDF files and converts to ontology format
 import os
 import re
 import json
+import hashlib
 from pathlib import Path
-import pdfplumber
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from parse_cache import ParseCache
+from keyword_matcher import KeywordMatcher
+from text_extractors import TextExtractor, get_extractor
+from lesson_io import write_lessons
+
+
+# Bump when the way lesson data is derived from text changes
+PARSER_VERSION = 3
+
+# Duration mentions: "durée : 2h" and session lengths like "35 minutes"
+DURATION_PATTERN = re.compile(r'(?:durée|duration)[:\s]*(\d+)[:\s]*(?:h|heures?|hours?)')
+SESSION_PATTERN = re.compile(r'(\d+)[:\s]*(?:minutes|min)')
+
+# Parser used by each worker process of parse_directory
+_worker_parser = None
+
+
+def _init_worker(parser):
+    """Process pool initializer: keep one parser per worker process"""
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_in_worker(pdf_path: str):
+    """Parse one PDF in a worker process; errors are returned, not raised"""
+    try:
+        lesson_data, content = _worker_parser.parse_pdf_uncached(pdf_path)
+        return lesson_data, content, None
+    except Exception as e:
+        return None, None, str(e)
 
 
 class PedagogicalSheetParser:
     """
     Parses pedagogical sheets from PDF files
     Extracts metadata from filename and content
+    An optional ParseCache skips PDFs whose content was already parsed
+    
+    Text comes from a pluggable extraction backend ('pdfplumber' with layout
+    analysis by default, 'pdfminer' raw text mode, 'pypdf') reading at most
+    max_pages pages. With early_stop, reading stops at the first page where
+    the text gathered so far already has a duration and at least one virtue,
+    tool and axis keyword.
+    
+    With keep_content, lesson records also carry the extracted text under
+    'content' (e.g. for the text index); it is never part of the cached record.
     """
     
-    def __init__(self):
+    def __init__(self, cache=None, extractor='pdfplumber', max_pages: Optional[int] = 3,
+                 early_stop: bool = False, keep_content: bool = False):
+        self.cache = cache
+        self.extractor: TextExtractor = get_extractor(extractor) if isinstance(extractor, str) else extractor
+        self.max_pages = max_pages
+        self.early_stop = early_stop
+        self.keep_content = keep_content
+        
         # Domain mappings
         self.domain_map = {
             'SC': 'Sciences',
@@ -69,6 +118,41 @@ class PedagogicalSheetParser:
             'peace_with_others': ['autres', 'others', 'groupe', 'équipe', 'collaboration', 'entraide', 'partage'],
             'peace_with_environment': ['environnement', 'environment', 'nature', 'écologie', 'ecology', 'planète']
         }
+        
+        # Compiled single-pass matcher over the three keyword tables
+        self._matcher = None
+        self._matcher_fingerprint = None
+        self.keyword_matcher()
+    
+    def keyword_matcher(self) -> KeywordMatcher:
+        """
+        Return the compiled matcher over the virtue/tool/axis keyword tables
+        It is keyed on detection_fingerprint(), so it is recompiled when a
+        table is replaced or edited in place
+        """
+        fingerprint = self.detection_fingerprint()
+        if fingerprint != self._matcher_fingerprint:
+            self._matcher = KeywordMatcher({
+                'virtues': self.virtue_keywords,
+                'tools': self.tool_keywords,
+                'axes': self.axes_keywords
+            })
+            self._matcher_fingerprint = fingerprint
+        return self._matcher
+    
+    def extraction_fingerprint(self) -> str:
+        """Identifies how text is extracted from PDFs (part of cache keys)"""
+        fingerprint = f"{self.extractor.name}:pages={self.max_pages}"
+        if self.early_stop:
+            # Where reading stops depends on the keyword tables
+            fingerprint += f":early-stop={self.detection_fingerprint()[:16]}"
+        return fingerprint
+    
+    def detection_fingerprint(self) -> str:
+        """Identifies the parser version and keyword tables (part of cache keys)"""
+        tables = [PARSER_VERSION, self.domain_map, self.subdomain_map,
+                  self.virtue_keywords, self.tool_keywords, self.axes_keywords]
+        return hashlib.sha256(json.dumps(tables, sort_keys=True).encode('utf-8')).hexdigest()
     
     def extract_metadata_from_filename(self, filename: str) -> Dict:
         """
@@ -121,48 +205,45 @@ class PedagogicalSheetParser:
     def extract_content_from_pdf(self, pdf_path: str) -> str:
         """
         Extract text content from PDF
+        Reads the first max_pages pages (usually contain the main info)
         """
+        enough = self.has_enough_evidence if self.early_stop else None
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                # Read first 3 pages (usually contain the main info)
-                for page in pdf.pages[:3]:
-                    text += page.extract_text() or ""
-                return text.lower()
+            return self.extractor.extract(pdf_path, self.max_pages, enough)
         except Exception as e:
             print(f"Error reading {pdf_path}: {e}")
             return ""
     
+    def has_enough_evidence(self, text: str) -> bool:
+        """
+        True once a text mentions a duration and a virtue, a tool and an axis
+        Used to stop reading a PDF early
+        """
+        if not (DURATION_PATTERN.search(text) or SESSION_PATTERN.search(text)):
+            return False
+        found = self.keyword_matcher().match(text)
+        return all(found[kind] for kind in ('virtues', 'tools', 'axes'))
+    
     def detect_virtues(self, text: str) -> List[str]:
         """
         Detect virtues mentioned in the text
         """
-        virtues = []
-        for virtue, keywords in self.virtue_keywords.items():
-            if any(keyword in text for keyword in keywords):
-                virtues.append(virtue)
-        return virtues 
+        found = self.keyword_matcher().match(text)['virtues']
+        return [virtue for virtue in self.virtue_keywords if virtue in found]
     
     def detect_tools(self, text: str) -> List[str]:
         """
         Detect pedagogical tools mentioned in the text
         """
-        tools = []
-        for tool, keywords in self.tool_keywords.items():
-            if any(keyword in text for keyword in keywords):
-                tools.append(tool)
-        return tools
+        found = self.keyword_matcher().match(text)['tools']
+        return [tool for tool in self.tool_keywords if tool in found]
     
     def detect_axes(self, text: str, title: str) -> List[str]:
         """
         Detect peace axes based on content and title
         """
-        axes = []
-        combined_text = (title + " " + text).lower()
-        
-        for axis, keywords in self.axes_keywords.items():
-            if any(keyword in combined_text for keyword in keywords):
-                axes.append(axis)
+        found = self.keyword_matcher().match(title + " " + text)['axes']
+        axes = [axis for axis in self.axes_keywords if axis in found]
         
         # If no axes detected, default based on domain
         if not axes:
@@ -170,18 +251,33 @@ class PedagogicalSheetParser:
         
         return axes
     
+    def detect_elements(self, text: str, title: str):
+        """
+        Detect virtues, tools and axes with a single scan of the text
+        Returns (virtues, tools, axes), the same as the three detect_* methods
+        """
+        matcher = self.keyword_matcher()
+        found = matcher.match(text)
+        found_axes = found['axes'] | matcher.match(title)['axes']
+        
+        virtues = [virtue for virtue in self.virtue_keywords if virtue in found['virtues']]
+        tools = [tool for tool in self.tool_keywords if tool in found['tools']]
+        axes = [axis for axis in self.axes_keywords if axis in found_axes] or ['peace_with_others']
+        
+        return virtues, tools, axes
+    
     def estimate_duration(self, text: str) -> float:
         """
         Estimate lesson duration from content
         Look for patterns like "durée", "duration", time mentions
         """
         # Look for explicit duration
-        duration_match = re.search(r'(?:durée|duration)[:\s]*(\d+)[:\s]*(?:h|heures?|hours?)', text)
+        duration_match = DURATION_PATTERN.search(text)
         if duration_match:
             return float(duration_match.group(1))
         
         # Look for session length
-        session_match = re.search(r'(\d+)[:\s]*(?:minutes|min)', text)
+        session_match = SESSION_PATTERN.search(text)
         if session_match:
             minutes = int(session_match.group(1))
             return minutes / 60.0
@@ -198,22 +294,49 @@ class PedagogicalSheetParser:
         """
         Parse a single PDF file and extract all metadata
         """
+        if self.cache is not None:
+            lesson_data = self.cache.lookup(pdf_path, self)
+            if lesson_data is not None:
+                return lesson_data
+        
+        lesson_data, content = self.parse_pdf_uncached(pdf_path)
+        
+        if self.cache is not None:
+            self.cache.store(pdf_path, content, lesson_data, self)
+        
+        return self.with_content(lesson_data, content)
+    
+    def with_content(self, lesson_data: Dict, content: str) -> Dict:
+        """Attach the extracted text to a lesson record when keep_content is set"""
+        if not self.keep_content:
+            return lesson_data
+        lesson_data = dict(lesson_data)
+        lesson_data['content'] = content
+        return lesson_data
+    
+    def parse_pdf_uncached(self, pdf_path: str):
+        """
+        Parse a single PDF file without the cache
+        Returns (lesson_data, extracted_text)
+        """
+        content = self.extract_content_from_pdf(pdf_path)
+        return self.build_lesson(pdf_path, content), content
+    
+    def build_lesson(self, pdf_path: str, content: str) -> Dict:
+        """
+        Derive lesson data from a PDF's file name and extracted text
+        """
         filename = os.path.basename(pdf_path)
         
         # Extract from filename
         metadata = self.extract_metadata_from_filename(filename)
         
-        # Extract from PDF content
-        content = self.extract_content_from_pdf(pdf_path)
-        
         # Create lesson ID from title
         lesson_id = re.sub(r'[^a-z0-9]+', '_', metadata.get('title', filename).lower())
         lesson_id = lesson_id.strip('_')
         
         # Detect pedagogical elements
-        virtues = self.detect_virtues(content)
-        tools = self.detect_tools(content)
-        axes = self.detect_axes(content, metadata.get('title', ''))
+        virtues, tools, axes = self.detect_elements(content, metadata.get('title', ''))
         
         # Build complete lesson data
         lesson_data = {
@@ -237,80 +360,167 @@ class PedagogicalSheetParser:
         
         return lesson_data
     
-    def parse_directory(self, directory_path: str) -> List[Dict]:
+    def parse_directory(self, directory_path: str, workers: Optional[int] = 1) -> List[Dict]:
         """
         Parse all PDF files in a directory and subdirectories
+        With workers > 1 (or None for one per CPU), files are parsed in a
+        process pool; the output order is the sorted file order either way
+        """
+        return list(self.iter_parse_directory(directory_path, workers=workers))
+    
+    def iter_parse_directory(self, directory_path: str, workers: Optional[int] = 1) -> Iterator[Dict]:
+        """
+        Parse all PDF files in a directory and yield lessons as they are ready
+        Lessons come out in sorted file order: with a process pool, each one is
+        yielded as soon as it and every file before it have been parsed.
+        A file that fails to parse is reported and skipped.
         """
-        lessons = []
         directory = Path(directory_path)
         
         # Find all PDF files
-        pdf_files = list(directory.rglob('*.pdf'))
+        pdf_files = sorted(directory.rglob('*.pdf'))
         
         print(f"Found {len(pdf_files)} PDF files")
         
-        for pdf_file in pdf_files:
-            print(f"Parsing: {pdf_file.name}")
-            try:
-                lesson_data = self.parse_pdf(str(pdf_file))
-                lessons.append(lesson_data)
-            except Exception as e:
-                print(f"Error parsing {pdf_file.name}: {e}")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        
+        try:
+            if workers <= 1 or len(pdf_files) <= 1:
+                for pdf_file in pdf_files:
+                    print(f"Parsing: {pdf_file.name}")
+                    try:
+                        yield self.parse_pdf(str(pdf_file))
+                    except Exception as e:
+                        print(f"Error parsing {pdf_file.name}: {e}")
+            else:
+                yield from self._parse_in_pool(pdf_files, workers)
+        finally:
+            if self.cache is not None:
+                self.cache.save()
+                print(f"Parse cache: {self.cache.summary()}")
+    
+    def _parse_in_pool(self, pdf_files: List[Path], workers: int) -> Iterator[Dict]:
+        """Parse files in a process pool, yielding lessons in file order"""
+        # Cached files are answered here; only the others go to the pool
+        done = {}
+        pending = []
+        for i, pdf_file in enumerate(pdf_files):
+            lesson_data = self.cache.lookup(str(pdf_file), self) if self.cache is not None else None
+            if lesson_data is not None:
+                done[i] = (lesson_data, None, None)
+            else:
+                pending.append(i)
         
-        return lessons
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as pool:
+            futures = {pool.submit(_parse_in_worker, str(pdf_files[i])): i for i in pending}
+            
+            # Reorder buffer: completed results wait for the files before them
+            completed = as_completed(futures)
+            next_index = 0
+            while next_index < len(pdf_files):
+                if next_index not in done:
+                    future = next(completed)
+                    done[futures[future]] = future.result()
+                    continue
+                
+                lesson_data, content, error = done.pop(next_index)
+                pdf_file = pdf_files[next_index]
+                next_index += 1
+                if error is not None:
+                    print(f"Error parsing {pdf_file.name}: {error}")
+                    continue
+                if content is not None and self.cache is not None:
+                    self.cache.store(str(pdf_file), content, lesson_data, self)
+                print(f"Parsing: {pdf_file.name}")
+                yield lesson_data if content is None else self.with_content(lesson_data, content)
     
-    def save_to_json(self, lessons: List[Dict], output_path: str):
+    def save_to_json(self, lessons: Iterable[Dict], output_path: str) -> int:
         """
-        Save parsed lessons to JSON file
+        Save parsed lessons to a JSON (or .jsonl JSON Lines) file
+        Lessons are written as they come, so an iterator such as
+        iter_parse_directory() is never held in memory as a whole
         """
-        data = {'lessons': lessons}
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        print(f"Saved {len(lessons)} lessons to {output_path}")
+        count = write_lessons(output_path, lessons)
+        print(f"Saved {count} lessons to {output_path}")
+        return count
 
 
-def main():
+def main(workers: Optional[int] = 1, cache_dir: Optional[str] = "data/parse_cache", clear_cache: bool = False,
+         extractor: str = 'pdfplumber', max_pages: Optional[int] = 3, early_stop: bool = False,
+         output_path: str = "data/pedagogical_sheets.json") -> Dict[str, int]:
     """
     Parse all pedagogical sheets and create JSON data
+    Sheets whose content is already in the parse cache are not re-extracted.
+    Lessons are written to output_path (.json or .jsonl) as they are parsed.
+    Returns the number of lessons per domain
     """
     print("="*80)
     print("PEDAGOGICAL SHEET PARSER")
     print("="*80)
     
-    parser = PedagogicalSheetParser()
+    cache = ParseCache(cache_dir) if cache_dir else None
+    if cache is not None and clear_cache:
+        cache.clear()
     
-    # Parse all PDFs in FICHES PEDAGOGIQUES
+    parser = PedagogicalSheetParser(cache=cache, extractor=extractor, max_pages=max_pages,
+                                    early_stop=early_stop)
+    
+    # Count lessons per domain while they stream to the output file
+    domains = {}
+    
+    def counted(lessons):
+        for lesson in lessons:
+            domain = lesson['domain']
+            domains[domain] = domains.get(domain, 0) + 1
+            yield lesson
+    
+    # Parse all PDFs in FICHES PEDAGOGIQUES and save them as they come
     print("\nParsing PDF files...")
-    lessons = parser.parse_directory("FICHES PEDAGOGIQUES")
+    count = parser.save_to_json(counted(parser.iter_parse_directory("FICHES PEDAGOGIQUES", workers=workers)),
+                                output_path)
     
     print(f"\n{'='*80}")
-    print(f"PARSED {len(lessons)} LESSONS")
+    print(f"PARSED {count} LESSONS")
     print(f"{'='*80}\n")
     
     # Display summary
-    domains = {}
-    for lesson in lessons:
-        domain = lesson['domain']
-        domains[domain] = domains.get(domain, 0) + 1
-    
     print("Lessons by domain:")
-    for domain, count in domains.items():
-        print(f"  {domain}: {count} lessons")
-    
-    # Save to JSON
-    output_path = "data/pedagogical_sheets.json"
-    parser.save_to_json(lessons, output_path)
+    for domain, domain_count in domains.items():
+        print(f"  {domain}: {domain_count} lessons")
     
     print(f"\n{'='*80}")
     print("NEXT STEP: Load into ontology")
     print(f"{'='*80}")
-    print(f"Run: python src/data_loader.py")
+    print(f"Run: python src/data_loader.py --data-file {output_path}")
     
-    return lessons
+    return domains
 
 
 if __name__ == "__main__":
-    lessons = main()
+    import argparse
+    
+    arg_parser = argparse.ArgumentParser(description="Parse pedagogical sheets into JSON")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="parse in a process pool of this size (0 = one per CPU)")
+    arg_parser.add_argument('--cache-dir', default="data/parse_cache",
+                            help="parse cache directory")
+    arg_parser.add_argument('--no-cache', action='store_true', help="re-extract every PDF")
+    arg_parser.add_argument('--clear-cache', action='store_true', help="invalidate every cache entry first")
+    arg_parser.add_argument('--extractor', default='pdfplumber', choices=['pdfplumber', 'pdfminer', 'pypdf'],
+                            help="text extraction backend")
+    arg_parser.add_argument('--max-pages', type=int, default=3, help="pages read per PDF (0 = all)")
+    arg_parser.add_argument('--early-stop', action='store_true',
+                            help="stop reading a PDF once its keywords and duration are found")
+    arg_parser.add_argument('--output', default="data/pedagogical_sheets.json",
+                            help="output file (.json, or .jsonl for JSON Lines)")
+    args = arg_parser.parse_args()
+    
+    domains = main(workers=args.workers or None,
+                   cache_dir=None if args.no_cache else args.cache_dir,
+                   clear_cache=args.clear_cache,
+                   extractor=args.extractor,
+                   max_pages=args.max_pages or None,
+                   early_stop=args.early_stop,
+                   output_path=args.output)
 
@@ -0,0 +1,319 @@
+"""
+Ingestion Pipeline for Peace Pedagogy Lessons
+Streams sheets from a PDF folder into the lesson store and search index
+"""
+
+import time
+import queue
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from owlready2 import get_ontology
+
+from pdf_parser import PedagogicalSheetParser
+from parse_cache import ParseCache
+from data_loader import LessonLoader, COMMIT_EVERY, empty_report, format_report
+from query_engine import LessonQuery
+from lesson_matrix import TEXT_DIMENSION
+from text_index import TextIndex, TEXT_WEIGHT
+from text_store import TextStore
+from ontology_store import open_store, export_rdfxml
+from vocabulary import normalize_term
+
+
+# Capacity of each queue between two stages
+QUEUE_SIZE = 16
+
+# Lessons made searchable at once (fewer if the queue runs dry)
+INDEX_EVERY = 16
+
+# Marks the end of a stream
+_END = object()
+
+
+def normalize_record(lesson_data: Dict) -> Dict:
+    """
+    Clean a parsed lesson record before loading
+    Trims text, normalizes and de-duplicates entity names, and coerces numbers
+    """
+    record = dict(lesson_data)
+    record['title'] = (record.get('title') or 'Untitled').strip()
+    for key in ('axes', 'tools', 'virtues', 'strategies'):
+        record[key] = list(dict.fromkeys(normalize_term(name) for name in record.get(key) or [] if name))
+    for key in ('target_age_min', 'target_age_max', 'group_size_min', 'group_size_max'):
+        record[key] = int(record.get(key) or 0)
+    record['duration'] = float(record.get('duration') or 0.0)
+    return record
+
+
+class IngestionPipeline:
+    """
+    Runs parse -> normalize -> load -> index as concurrent stages
+
+    Parsing and normalizing run in their own threads and hand lessons on
+    through bounded queues, so a slow stage applies back-pressure instead of
+    letting records pile up in memory. The calling thread is the only one
+    writing to the ontology: it upserts each lesson (skipping sheets whose
+    record is unchanged), commits the SQLite store every commit_every writes,
+    and hands small batches of new and updated lessons to the search index of
+    `query`, so the first lessons can be queried while later PDFs are still
+    being parsed. Deletions re-index the corpus once at the end.
+
+    With text=True, the parser keeps the extracted text of each sheet, and a
+    TextIndex over the title and text of every ingested sheet is fitted at
+    the end of the run and handed to the engine (see text_index.py). Sheet
+    text goes to text_store (a temporary TextStore, removed after the run,
+    when none is given) and the index is fitted from it, so only titles are
+    held in memory.
+    """
+
+    def __init__(self, ontology, parser: Optional[PedagogicalSheetParser] = None,
+                 queue_size: int = QUEUE_SIZE, index_every: int = INDEX_EVERY,
+                 commit_every: Optional[int] = None, text: bool = False,
+                 text_store: Optional[TextStore] = None):
+        self.onto = ontology
+        self.parser = parser or PedagogicalSheetParser()
+        if text or text_store is not None:
+            self.parser.keep_content = True
+        self.text_store = text_store
+        self.titles = {} if text else None  # lesson name -> title, of the sheets to index
+        self.text_index = None
+        self.query = LessonQuery(ontology)
+        self.loader = LessonLoader(ontology, vocabulary=self.query.engine.vocabulary)
+        self.queue_size = queue_size
+        self.index_every = index_every
+        self.commit_every = commit_every
+
+        self.parsed = 0
+        self.loaded = 0
+        self.indexed = 0
+        self.first_searchable = None  # Seconds until the first lesson could be queried
+        self.report = empty_report()
+
+    def run(self, sheets_dir: str, workers: Optional[int] = 1,
+            on_indexed: Optional[Callable[[int], None]] = None, delete_missing: bool = False) -> int:
+        """
+        Ingest every PDF under sheets_dir; returns the number of lessons indexed
+        on_indexed(count) is called each time new lessons become searchable.
+        With delete_missing, stored lessons with no sheet in sheets_dir are deleted.
+        """
+        start = time.perf_counter()
+        stop = threading.Event()
+        errors = []
+        parsed = queue.Queue(maxsize=self.queue_size)
+        normalized = queue.Queue(maxsize=self.queue_size)
+
+        def put(q, item):
+            # Give up when the consumer has stopped, instead of blocking forever
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def stage(source: Iterable, target, transform=None):
+            try:
+                for item in source:
+                    if not put(target, transform(item) if transform else item):
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if hasattr(source, 'close'):
+                    source.close()  # Lets the parser save its cache
+                put(target, _END)
+
+        def drain(q):
+            while not stop.is_set():
+                try:
+                    item = q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    return
+                yield item
+
+        threads = [
+            threading.Thread(target=stage, name="parse", daemon=True,
+                             args=(self.parser.iter_parse_directory(sheets_dir, workers=workers), parsed)),
+            threading.Thread(target=stage, name="normalize", daemon=True,
+                             args=(drain(parsed), normalized, normalize_record)),
+        ]
+        for thread in threads:
+            thread.start()
+
+        pending = []
+        seen = set()
+        store = self.text_store
+        if store is None and self.titles is not None:
+            store = TextStore(tempfile.mkdtemp(prefix="text_store-"))
+        try:
+            with self.onto:
+                for record in drain(normalized):
+                    self.parsed += 1
+                    change, lesson = self.loader.upsert_lesson(record)
+                    seen.add(lesson.name)
+                    if store is not None:
+                        store.put(lesson.name, record.get('content', ''))
+                        if self.titles is not None:
+                            self.titles[lesson.name] = record['title']
+                    if change == 'unchanged':
+                        self.report['unchanged'] += 1
+                        continue
+
+                    self.report[change].append(lesson.name)
+                    self.loaded += 1
+                    pending.append(lesson)
+
+                    if self.commit_every and self.loaded % self.commit_every == 0:
+                        self.onto.world.save()
+
+                    # Index a full batch, or whatever is ready when the queue runs dry
+                    if len(pending) >= self.index_every or normalized.empty():
+                        self._index(pending, start, on_indexed)
+                        pending = []
+
+                self._index(pending, start, on_indexed)
+
+                if delete_missing and not errors:
+                    stored = list(self.loader.stored_lessons())
+                    self.report['deleted'] = self.loader.delete_lessons(name for name in stored if name not in seen)
+                    if self.text_store is not None:
+                        for name in self.report['deleted']:
+                            self.text_store.delete(name)
+
+                if self.text_store is not None:
+                    self.text_store.save()
+
+            if self.report['deleted']:
+                self.query.engine.refresh()
+            if self.titles and not errors:
+                self._index_text(store)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if store is not None and store is not self.text_store:
+                store.close()
+                shutil.rmtree(store.store_dir, ignore_errors=True)
+
+        if errors:
+            raise errors[0]
+        return self.indexed
+
+    def _index_text(self, store: TextStore):
+        """Fit the text index over the sheets seen so far and score text with it"""
+        engine = self.query.engine
+        try:
+            self.text_index = TextIndex.from_store(store, self.titles)
+        except ValueError as e:
+            # Raised by the vectorizer when no sheet has a single indexable word
+            if 'empty vocabulary' not in str(e):
+                raise
+            print(f"Text index skipped: the sheets have no indexable words ({e})")
+            return
+        engine.use_text_index(self.text_index, engine.weights.get(TEXT_DIMENSION, TEXT_WEIGHT))
+
+    def _index(self, lessons, start, on_indexed):
+        """Add new lessons to the search index and re-encode updated ones"""
+        if not lessons:
+            return
+        self.query.engine.add_lessons(lessons)
+        self.indexed += len(lessons)
+        if self.first_searchable is None:
+            self.first_searchable = time.perf_counter() - start
+        if on_indexed is not None:
+            on_indexed(self.indexed)
+
+
+def run_pipeline(sheets_dir: str = "FICHES PEDAGOGIQUES",
+                 ontology_path: str = "ontology/peace_pedagogy.owl",
+                 store_path: Optional[str] = None,
+                 export_path: Optional[str] = None,
+                 parser: Optional[PedagogicalSheetParser] = None,
+                 workers: Optional[int] = 1,
+                 delete_missing: bool = False,
+                 text_index_path: Optional[str] = None,
+                 text_store_path: Optional[str] = None) -> IngestionPipeline:
+    """
+    Ingest a folder of PDF sheets in one streaming pass
+
+    With store_path, lessons go into the SQLite quadstore and are committed
+    every COMMIT_EVERY lessons; otherwise the RDF/XML ontology is rewritten
+    once at the end, if anything changed. Returns the pipeline, whose query attribute is ready
+    to search the ingested lessons.
+
+    With text_store_path, the extracted text of every sheet is kept in a
+    TextStore there; with text_index_path, a TextIndex of the sheets' text
+    is written there.
+    """
+    if store_path:
+        world, onto = open_store(store_path, ontology_path)
+    else:
+        onto = get_ontology(ontology_path).load()
+
+    text_store = TextStore(text_store_path) if text_store_path else None
+    pipeline = IngestionPipeline(onto, parser=parser, commit_every=COMMIT_EVERY if store_path else None,
+                                 text=text_index_path is not None, text_store=text_store)
+
+    def report(count):
+        print(f"  {count} lessons searchable")
+
+    try:
+        pipeline.run(sheets_dir, workers=workers, on_indexed=report, delete_missing=delete_missing)
+    finally:
+        if text_store is not None:
+            text_store.close()
+    print(f"Ingested {pipeline.parsed} sheets: {format_report(pipeline.report)}")
+    if pipeline.first_searchable is not None:
+        print(f"First new lesson searchable after {pipeline.first_searchable:.2f}s")
+
+    if store_path:
+        world.save()
+        print(f"Committed lessons to {store_path}")
+    elif pipeline.loaded or pipeline.report['deleted']:
+        onto.save(file=ontology_path, format="rdfxml")
+
+    if export_path:
+        export_rdfxml(onto, export_path)
+
+    if text_store is not None:
+        print(f"Text store: {text_store.summary()}")
+
+    if pipeline.text_index is not None:
+        pipeline.text_index.save(text_index_path)
+        print(f"Wrote the text index of {len(pipeline.text_index)} sheets to {text_index_path}")
+
+    return pipeline
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Parse, load and index pedagogical sheets in one pass")
+    arg_parser.add_argument('--sheets', default="FICHES PEDAGOGIQUES", help="directory of PDF sheets")
+    arg_parser.add_argument('--ontology', default="ontology/peace_pedagogy.owl", help="RDF/XML ontology")
+    arg_parser.add_argument('--store', help="load into this SQLite quadstore instead of the OWL file")
+    arg_parser.add_argument('--export', help="also write an RDF/XML copy")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="parse in a process pool of this size (0 = one per CPU)")
+    arg_parser.add_argument('--cache-dir', default="data/parse_cache", help="parse cache directory")
+    arg_parser.add_argument('--no-cache', action='store_true', help="re-extract every PDF")
+    arg_parser.add_argument('--delete-missing', action='store_true',
+                            help="delete stored lessons whose sheet is no longer in the folder")
+    arg_parser.add_argument('--extractor', default='pdfplumber', choices=['pdfplumber', 'pdfminer', 'pypdf'],
+                            help="text extraction backend")
+    arg_parser.add_argument('--text-index', help="also write a TF-IDF index of the sheets' text to this directory")
+    arg_parser.add_argument('--text-store', help="keep the extracted text of every sheet in this directory")
+    args = arg_parser.parse_args()
+
+    cache = None if args.no_cache else ParseCache(args.cache_dir)
+    sheet_parser = PedagogicalSheetParser(cache=cache, extractor=args.extractor)
+
+    run_pipeline(args.sheets, args.ontology, store_path=args.store, export_path=args.export,
+                 parser=sheet_parser, workers=args.workers or None, delete_missing=args.delete_missing,
+                 text_index_path=args.text_index, text_store_path=args.text_store)
@@ -3,7 +3,6 @@ Query Engine for Peace Pedagogy Lessons
 Takes raw metadata as input and finds similar existing pedagogical sheets
 """
 
-from owlready2 import *
 from typing import Dict, List, Tuple, Optional
 import sys
 import os
@@ -13,18 +12,38 @@ if __name__ == "__main__":
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from similarity_engine import SimilarityEngine
+from engine_registry import EngineRegistry
+from lesson_features import LessonFeatures
+from result_cache import ResultCache, query_key
+
+
+# Queries whose per-dimension scores each LessonQuery keeps for re-ranking
+SCORES_CACHE_SIZE = 16
 
 
 class LessonQuery:
     """
     Represents a query for finding similar pedagogical sheets
-    Takes raw metadata and creates a temporary lesson for comparison
+    Takes raw metadata and builds an in-memory LessonFeatures for comparison,
+    so querying never writes to the ontology
+    
+    With a ResultCache, repeated queries are answered from memory until the
+    engine's corpus version changes (refresh or add_lessons). Queries with
+    per-request weights keep their unweighted per-dimension scores, so the
+    same query under other weights is only re-ranked.
     """
     
-    def __init__(self, ontology):
+    def __init__(self, ontology, compiled=None, cache: Optional[ResultCache] = None):
         self.onto = ontology
-        self.engine = SimilarityEngine(ontology)
-        self._temp_namespace = None
+        self.engine = SimilarityEngine(ontology, compiled=compiled)
+        self.cache = cache
+        self.scores = ResultCache(SCORES_CACHE_SIZE, copy=False)
+    
+    @classmethod
+    def from_index(cls, index_dir: str, cache: Optional[ResultCache] = None) -> 'LessonQuery':
+        """Query a compiled index directory instead of an ontology"""
+        from index_artifact import open_index
+        return cls(None, compiled=open_index(index_dir), cache=cache)
     
     def query_similar_lessons(self, 
                              title: str,
@@ -41,7 +60,8 @@ class LessonQuery:
                              group_size_min: int = None,
                              group_size_max: int = None,
                              top_k: int = 5,
-                             min_similarity: float = 0.0) -> List[Dict]:
+                             min_similarity: float = 0.0,
+                             weights: Optional[Dict[str, float]] = None) -> List[Dict]:
         """
         Query for similar pedagogical sheets based on raw metadata
         
@@ -61,13 +81,14 @@ class LessonQuery:
             group_size_max: Maximum group size
             top_k: Number of results to return
             min_similarity: Minimum similarity threshold
+            weights: Weights overriding the engine's for this query only, e.g.
+                     {'virtues': 0.4}; dimensions left out keep their weight
         
         Returns:
             List of dictionaries containing similar lessons and their metadata
         """
         
-        # Create temporary lesson for comparison
-        temp_lesson = self._create_temp_lesson(
+        metadata = dict(
             title=title,
             description=description,
             domain=domain,
@@ -83,11 +104,24 @@ class LessonQuery:
             group_size_max=group_size_max
         )
         
-        # Find similar lessons
-        similar = self.engine.find_similar(temp_lesson, top_k=top_k, min_similarity=min_similarity)
+        resolved = self.engine.resolve_weights(weights)
+        
+        # Answer repeated queries from the cache
+        if self.cache is not None:
+            version = self.engine.version
+            key = query_key(metadata, top_k, min_similarity, resolved, text=self.engine.text is not None)
+            cached = self.cache.get(key, version)
+            if cached is not None:
+                return cached
         
-        # Clean up temporary lesson
-        self._cleanup_temp_lesson(temp_lesson)
+        # Find similar lessons
+        if weights is not None:
+            # Re-rank the stored dimension scores of this query under the new weights
+            similar = self.engine.rank(self._query_scores(metadata), top_k=top_k,
+                                       min_similarity=min_similarity, weights=resolved)
+        else:
+            query_lesson = self._create_query_features(**metadata)
+            similar = self.engine.find_similar(query_lesson, top_k=top_k, min_similarity=min_similarity)
         
         # Format results
         results = []
@@ -95,78 +129,76 @@ class LessonQuery:
             result = self._format_lesson_result(lesson, score, breakdown)
             results.append(result)
         
+        if self.cache is not None:
+            self.cache.put(key, version, results)
+        
         return results
     
-    def _create_temp_lesson(self, **kwargs) -> object:
-        """Create a temporary lesson instance for querying"""
+    def query_similar_lessons_batch(self,
+                                    queries: List[Dict],
+                                    top_k: int = 5,
+                                    min_similarity: float = 0.0,
+                                    weights: Optional[Dict[str, float]] = None) -> List[List[Dict]]:
+        """
+        Query for similar pedagogical sheets for many lesson descriptions at once
         
-        with self.onto:
-            # Create temporary lesson with unique ID
-            temp_id = f"temp_query_lesson_{id(self)}"
-            temp_lesson = self.onto.Lesson(temp_id)
-            
-            # Set data properties
-            if kwargs.get('title'):
-                temp_lesson.title = [kwargs['title']]
-            if kwargs.get('description'):
-                temp_lesson.description = [kwargs['description']]
-            if kwargs.get('discipline'):
-                temp_lesson.discipline = [kwargs['discipline']]
-            if kwargs.get('duration'):
-                temp_lesson.duration = [float(kwargs['duration'])]
-            if kwargs.get('target_age_min'):
-                temp_lesson.targetAgeMin = [int(kwargs['target_age_min'])]
-            if kwargs.get('target_age_max'):
-                temp_lesson.targetAgeMax = [int(kwargs['target_age_max'])]
-            if kwargs.get('group_size_min'):
-                temp_lesson.groupSizeMin = [int(kwargs['group_size_min'])]
-            if kwargs.get('group_size_max'):
-                temp_lesson.groupSizeMax = [int(kwargs['group_size_max'])]
-            
-            # Link to axes
-            if kwargs.get('axes'):
-                for axis_name in kwargs['axes']:
-                    axis = self.onto.search_one(iri=f"*{axis_name}")
-                    if axis:
-                        temp_lesson.hasAxis.append(axis)
-            
-            # Link to tools
-            if kwargs.get('tools'):
-                for tool_name in kwargs['tools']:
-                    tool = self.onto.search_one(iri=f"*{tool_name}")
-                    if tool:
-                        temp_lesson.usesTool.append(tool)
-            
-            # Link to virtues
-            if kwargs.get('virtues'):
-                for virtue_name in kwargs['virtues']:
-                    virtue = self.onto.search_one(iri=f"*{virtue_name}")
-                    if virtue:
-                        temp_lesson.developsVirtue.append(virtue)
-            
-            # Link to strategies
-            if kwargs.get('strategies'):
-                for strategy_name in kwargs['strategies']:
-                    strategy = self.onto.search_one(iri=f"*{strategy_name}")
-                    if strategy:
-                        temp_lesson.employsStrategy.append(strategy)
-            
-            # Link to domain
-            if kwargs.get('domain'):
-                domain = self.onto.search_one(iri=f"*{kwargs['domain'].lower()}")
-                if domain:
-                    temp_lesson.belongsToDomain = [domain]
-            
-            return temp_lesson
+        Args:
+            queries: List of metadata dictionaries, each taking the same keys as
+                     the keyword arguments of query_similar_lessons (title,
+                     domain, axes, tools, virtues, target_age_min, ...)
+            top_k: Number of results to return per query
+            min_similarity: Minimum similarity threshold
+            weights: Weights overriding the engine's for these queries only
+        
+        Returns:
+            One list of result dictionaries per query, in the same order
+        """
+        
+        # Describe every query lesson in memory
+        query_lessons = [self._create_query_features(**query) for query in queries]
+        
+        # Score all queries against the corpus in one pass
+        batch = self.engine.find_similar_batch(query_lessons, top_k=top_k, min_similarity=min_similarity,
+                                               weights=weights)
+        
+        return [[self._format_lesson_result(lesson, score, breakdown) for lesson, score, breakdown in similar]
+                for similar in batch]
+    
+    def _query_scores(self, metadata: Dict):
+        """Per-dimension scores of a query, kept until the corpus changes"""
+        version = self.engine.version
+        key = query_key(metadata, 0, 0.0, {}, text=self.engine.text is not None)
+        scores = self.scores.get(key, version)
+        if scores is None:
+            scores = self.engine.score_query(self._create_query_features(**metadata))
+            self.scores.put(key, version, scores)
+        return scores
     
-    def _cleanup_temp_lesson(self, temp_lesson):
-        """Remove temporary lesson from ontology"""
-        destroy_entity(temp_lesson)
+    def _create_query_features(self, **kwargs) -> LessonFeatures:
+        """Resolve raw query metadata into a LessonFeatures for scoring"""
+        
+        resolve = self.engine.vocabulary.lookup_all
+        
+        return LessonFeatures(
+            title=kwargs.get('title'),
+            description=kwargs.get('description'),
+            discipline=kwargs.get('discipline'),
+            duration=kwargs.get('duration'),
+            target_age_min=kwargs.get('target_age_min'),
+            target_age_max=kwargs.get('target_age_max'),
+            group_size_min=kwargs.get('group_size_min'),
+            group_size_max=kwargs.get('group_size_max'),
+            axes=resolve(kwargs.get('axes')),
+            tools=resolve(kwargs.get('tools')),
+            virtues=resolve(kwargs.get('virtues')),
+            strategies=resolve(kwargs.get('strategies')),
+            domains=resolve([kwargs['domain']] if kwargs.get('domain') else [])
+        )
     
     def _format_lesson_result(self, lesson, score: float, breakdown: Dict) -> Dict:
         """Format a lesson result into a structured dictionary"""
         
-        return {
+        result = {
             'title': lesson.title[0] if lesson.title else "Untitled",
             'description': lesson.description[0] if lesson.description else "",
             'domain': lesson.belongsToDomain[0].name.replace('peace_pedagogy.', '') if lesson.belongsToDomain else None,
@@ -216,6 +248,35 @@ class LessonQuery:
                 }
             }
         }
+        if 'text' in breakdown:
+            result['similarity_breakdown']['text'] = {
+                'score': breakdown['text']['score'],
+                'contribution': breakdown['text']['score'] * breakdown['text']['weight']
+            }
+        return result
+
+
+# Result cache of each process-wide engine: entries kept, seconds to live
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 600.0
+
+
+def _cached_engine(ontology, **kwargs) -> LessonQuery:
+    """Build a registry engine with its own result cache"""
+    return LessonQuery(ontology, cache=ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL), **kwargs)
+
+
+# Process-wide cache of loaded ontologies and their query engines
+_engines = EngineRegistry(_cached_engine)
+
+
+def get_query_engine(ontology_path: str = "ontology/peace_pedagogy.owl") -> LessonQuery:
+    """
+    Return a ready-to-query LessonQuery for an ontology file
+    The file is parsed once per process and again only when its content changes;
+    the engine's result cache counters are in get_query_engine(path).cache.stats()
+    """
+    return _engines.get(ontology_path)
 
 
 def search_similar_lessons(
@@ -233,6 +294,7 @@ def search_similar_lessons(
     group_size_min: int = None,
     group_size_max: int = None,
     top_k: int = 5,
+    weights: Optional[Dict[str, float]] = None,
     ontology_path: str = "ontology/peace_pedagogy.owl"
 ) -> List[Dict]:
     """
@@ -253,11 +315,8 @@ def search_similar_lessons(
         )
     """
     
-    # Load ontology
-    onto = get_ontology(ontology_path).load()
-    
-    # Create query engine
-    query_engine = LessonQuery(onto)
+    # Reuse the warm engine of this ontology file
+    query_engine = get_query_engine(ontology_path)
     
     # Search for similar lessons
     results = query_engine.query_similar_lessons(
@@ -274,12 +333,38 @@ def search_similar_lessons(
         duration=duration,
         group_size_min=group_size_min,
         group_size_max=group_size_max,
-        top_k=top_k
+        top_k=top_k,
+        weights=weights
     )
     
     return results
 
 
+def search_similar_lessons_batch(
+    queries: List[Dict],
+    top_k: int = 5,
+    min_similarity: float = 0.0,
+    weights: Optional[Dict[str, float]] = None,
+    ontology_path: str = "ontology/peace_pedagogy.owl"
+) -> List[List[Dict]]:
+    """
+    Convenience function to search for similar lessons for many queries at once
+    
+    Example:
+        results = search_similar_lessons_batch([
+            {'title': "Draft 1", 'domain': "Sciences", 'axes': ["peace_with_environment"]},
+            {'title': "Draft 2", 'domain': "Ethics", 'virtues': ["empathy", "patience"]}
+        ], top_k=3)
+    """
+    
+    # Reuse the warm engine of this ontology file
+    query_engine = get_query_engine(ontology_path)
+    
+    # Search for similar lessons, all queries in one pass
+    return query_engine.query_similar_lessons_batch(queries, top_k=top_k, min_similarity=min_similarity,
+                                                    weights=weights)
+
+
 if __name__ == "__main__":
     """
     Example usage: Query with raw metadata to find similar pedagogical sheets
@@ -0,0 +1,42 @@
+"""
+Query Scores for Peace Pedagogy Lessons
+Keeps the unweighted per-dimension scores of a query for re-ranking
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+
+from lesson_matrix import LessonMatrix, top_k_rows
+
+
+class QueryScores:
+    """
+    Unweighted score of one query against every lesson, per dimension
+
+    Holds the (len(DIMENSIONS), N) array of a LessonMatrix snapshot, so the
+    same query can be ranked under many weightings: each ranking is one
+    weighted sum of the seven score vectors, accumulated in the same order
+    as compute_similarity, instead of a new pass over the corpus. With a
+    TextIndex, the text scores are stacked as an eighth row.
+    """
+
+    def __init__(self, matrix: LessonMatrix, target_lesson, text=None):
+        self.matrix = matrix
+        self.target = target_lesson
+        self.target_row = matrix.rows.get(target_lesson)
+        self.dimension_scores = matrix.dimension_scores(target_lesson)
+        if text is not None:
+            self.dimension_scores = np.vstack([self.dimension_scores, text.scores(target_lesson, matrix)])
+
+    def rank(self, weights: Dict[str, float], top_k: int,
+             min_similarity: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the k best rows under the given weights
+        Returns (rows, dimension_scores, scores) like InvertedIndex.search
+        """
+        scores = self.matrix.weighted_scores(self.dimension_scores, weights)
+        keep = scores >= min_similarity
+        if self.target_row is not None:
+            keep[self.target_row] = False  # Skip the target lesson itself
+        best = top_k_rows(scores, np.flatnonzero(keep), top_k)
+        return best, self.dimension_scores[:, best], scores[best]
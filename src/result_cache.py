@@ -0,0 +1,115 @@
+"""
+Result Cache for Peace Pedagogy Queries
+Remembers the results of recent similarity queries in memory
+"""
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from vocabulary import normalize_term
+
+
+# Query arguments holding lists of feature names, compared as sets
+LIST_FIELDS = ['axes', 'tools', 'virtues', 'strategies']
+
+# Query arguments holding a single name, compared after normalization
+NAME_FIELDS = ['domain', 'discipline']
+
+# Numeric query arguments
+NUMBER_FIELDS = ['target_age_min', 'target_age_max', 'duration', 'group_size_min', 'group_size_max']
+
+
+def query_key(query: Dict, top_k: int, min_similarity: float, weights: Dict[str, float],
+              text: bool = False) -> Hashable:
+    """
+    Canonical form of a query: equal keys are guaranteed to give equal results
+    Feature lists are deduplicated and sorted, names normalized, and unset
+    values (None, 0, empty) collapse together as they do when scoring.
+    The title is left out unless text is set: it is only scored by the
+    text dimension, and never returned.
+    """
+    key = []
+    for field in LIST_FIELDS:
+        key.append(tuple(sorted({normalize_term(name) for name in query.get(field) or [] if name})))
+    for field in NAME_FIELDS:
+        key.append(normalize_term(query[field]) if query.get(field) else None)
+    for field in NUMBER_FIELDS:
+        key.append(float(query[field]) if query.get(field) else None)
+    key.append(query.get('description') or None)
+    if text:
+        key.append(query.get('title') or None)
+    key.append(int(top_k))
+    key.append(float(min_similarity))
+    key.append(tuple(sorted(weights.items())))
+    return tuple(key)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results with an optional time to live
+
+    Every entry belongs to a corpus version; asking for another version
+    drops the whole cache, so results never outlive the corpus they were
+    computed on. Results are copied in and out, so callers can modify what
+    they get back; pass copy=False for values that are never modified.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None, copy: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copy = copy
+        self.version = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version):
+        """Return a copy of the cached results, or None on a miss"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1]) if self.copy else entry[1]
+
+    def put(self, key: Hashable, version, results):
+        """Store results computed on the given corpus version"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), copy.deepcopy(results) if self.copy else results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit and miss counters and current size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
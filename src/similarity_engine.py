@@ -3,18 +3,61 @@ Semantic Similarity Engine for Peace Pedagogy Lessons
 Computes multi-dimensional similarity between lessons
 """
 
-from owlready2 import *
+import json
+import heapq
 import numpy as np
 from typing import List, Tuple, Dict
 
+from lesson_matrix import LessonMatrix, DIMENSIONS, TEXT_DIMENSION, top_k_rows
+from inverted_index import InvertedIndex
+from neighbor_graph import NeighborGraph, NEIGHBORS
+from criteria_index import CriteriaIndex
+from lsh_index import LSHIndex, BANDS, ROWS
+from query_scores import QueryScores
+from text_index import TEXT_WEIGHT
+from vocabulary import Vocabulary
+
+
+# Upper bound on query x lesson cells scored at once by find_similar_batch
+BATCH_CELLS = 4_000_000
+
+# Every dimension a breakdown can report, in accumulation order
+SCORED_DIMENSIONS = DIMENSIONS + [TEXT_DIMENSION]
+
 
 class SimilarityEngine:
     """
     Computes semantic similarity between Peace Pedagogy lessons
+    
+    The corpus comes from an ontology, or from a compiled index directory
+    (see from_index) whose arrays are memory-mapped instead of being
+    encoded from owlready2 individuals.
+    
+    With neighbors=k, the k nearest neighbours of every indexed lesson are
+    precomputed (see build_neighbor_graph), so find_similar on an existing
+    lesson reads them instead of scanning the corpus.
+    
+    After build_lsh_index, find_similar switches to approximate retrieval:
+    MinHash LSH candidates reranked with the exact score (see lsh_index.py).
+    
+    use_text_index adds an eighth, optional dimension: the TF-IDF cosine
+    similarity of the lessons' texts (see text_index.py).
     """
     
-    def __init__(self, ontology):
+    def __init__(self, ontology, vectorized=True, compiled=None, neighbors=None):
         self.onto = ontology
+        self.compiled = compiled
+        self.vectorized = vectorized or compiled is not None
+        self.matrix = None
+        self.index = None
+        self.graph = None
+        self.neighbors = neighbors
+        self._criteria = None
+        self.lsh = None
+        self.text = None
+        
+        # Bumped whenever the indexed corpus changes (refresh, add_lessons)
+        self.version = 0
         
         # Weights for different dimensions 
         self.weights = {
@@ -27,6 +70,26 @@ class SimilarityEngine:
             'domain': 0.05
         }
 
+        if compiled is not None:
+            self.vocabulary = compiled.vocabulary
+            self.matrix = compiled.matrix
+            self.index = compiled.index
+            if neighbors:
+                self.build_neighbor_graph(neighbors)
+        else:
+            self.vocabulary = Vocabulary(ontology)
+            if vectorized:
+                self.refresh()
+    
+    @classmethod
+    def from_index(cls, index_dir: str) -> 'SimilarityEngine':
+        """
+        Open an engine over a compiled index directory (see index_artifact.py)
+        Startup maps the arrays without reading them, whatever the corpus size
+        """
+        from index_artifact import open_index
+        return cls(None, compiled=open_index(index_dir))
+
     """
         Supervised learning ( (F1,F2), Similarity_annotation )
 
@@ -34,8 +97,154 @@ class SimilarityEngine:
         Weights : SDL
 
         annotation tasks
+
+        Weights fitting: weight_learning.py (load the result with load_weights)
     """
 
+    def refresh(self):
+        """
+        Encode the current lessons into the matrix and inverted index used by
+        the vectorized mode
+        Call again after lessons are added to or removed from the ontology,
+        or after a compiled index directory has been rebuilt
+        """
+        if self.compiled is not None:
+            from index_artifact import open_index
+            self.compiled = open_index(self.compiled.path)
+            self.vocabulary = self.compiled.vocabulary
+            self.matrix, self.index = self.compiled.matrix, self.compiled.index
+        else:
+            self.matrix = LessonMatrix(self.onto.Lesson.instances())
+            self.index = InvertedIndex(self.matrix)
+        
+        self.graph = None
+        if self.neighbors:
+            self.build_neighbor_graph(self.neighbors)
+        self.version += 1
+
+    def build_neighbor_graph(self, k: int = NEIGHBORS) -> NeighborGraph:
+        """
+        Precompute the k nearest neighbours of every indexed lesson
+        Costs one full N x N scoring pass; add_lessons then keeps the graph
+        up to date one row and column at a time. Changing self.weights
+        makes lookups fall back to the index until the graph is rebuilt.
+        """
+        self.neighbors = k
+        self.graph = NeighborGraph(self.index.matrix, self.weights, k)
+        return self.graph
+
+    def build_lsh_index(self, bands: int = BANDS, rows: int = ROWS) -> LSHIndex:
+        """
+        Make find_similar approximate: only lessons sharing a MinHash LSH
+        bucket with the query are scored. More bands find more of the exact
+        results, more rows per band fewer candidates; compare settings with
+        lsh_index.recall_at_k. Queries sharing no axis/tool/virtue/strategy
+        with the corpus still use the exact search. add_lessons signs only
+        the new and changed lessons, and refresh rebuilds the index;
+        disable_lsh() switches back to exact search.
+        """
+        if not self.vectorized:
+            raise ValueError("Approximate retrieval needs the vectorized mode")
+        self.lsh = LSHIndex(self.index.matrix, bands, rows)
+        self.version += 1
+        return self.lsh
+
+    def disable_lsh(self):
+        """Drop the LSH index: find_similar is exact again, and cached approximate results expire"""
+        if self.lsh is not None:
+            self.lsh = None
+            self.version += 1
+
+    def use_text_index(self, text_index, weight: float = TEXT_WEIGHT) -> Dict[str, float]:
+        """
+        Score the text of lessons too, from a TextIndex (see text_index.py)
+        The text dimension gets the given weight and the other weights are
+        scaled to sum to 1 - weight, keeping their ratios. Lessons missing
+        from the text index (e.g. added later) score 0 on text.
+        """
+        total = sum(self.weights[dim] for dim in DIMENSIONS)
+        scale = (1.0 - weight) / total if total else 0.0
+        self.weights = {dim: self.weights[dim] * scale for dim in DIMENSIONS}
+        self.weights[TEXT_DIMENSION] = float(weight)
+        self.text = text_index
+        self.version += 1
+        return self.weights
+
+    @property
+    def dimensions(self) -> List[str]:
+        """Scored dimensions: DIMENSIONS, plus 'text' with a text index"""
+        return SCORED_DIMENSIONS if self.text is not None else DIMENSIONS
+
+    def resolve_weights(self, weights=None) -> Dict[str, float]:
+        """
+        Weights for one request: overrides for some or all dimensions on top
+        of self.weights, as a dict or as a sequence in self.dimensions order
+        """
+        if weights is None:
+            return self.weights
+        dimensions = self.dimensions
+        if not isinstance(weights, dict):
+            weights = list(weights)
+            if len(weights) != len(dimensions):
+                raise ValueError(f"Expected {len(dimensions)} weights ({', '.join(dimensions)}), got {len(weights)}")
+            weights = dict(zip(dimensions, weights))
+        unknown = set(weights) - set(dimensions)
+        if unknown:
+            raise ValueError(f"Unknown similarity dimensions: {', '.join(sorted(unknown))}")
+        resolved = dict(self.weights)
+        resolved.update((dim, float(weight)) for dim, weight in weights.items())
+        return resolved
+
+    def load_weights(self, path: str) -> Dict[str, float]:
+        """Use the weights of a file written by weight_learning.py"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.weights = self.resolve_weights(data.get('weights', data))
+        return self.weights
+
+    def add_lessons(self, lessons):
+        """
+        Make new or changed lessons searchable without re-encoding the corpus
+        New lessons are appended; lessons that are already indexed (e.g.
+        updated in place) are re-encoded in their row. The new matrix, index
+        and neighbour graph are swapped in at once, so concurrent queries see
+        either the old or the new corpus.
+        """
+        lessons = list(dict.fromkeys(lessons))
+        if not self.vectorized or not lessons:
+            return
+        if self.compiled is not None:
+            raise ValueError("A compiled index is read-only: rebuild it with index_artifact.py")
+
+        index, graph, lsh = self.index, self.graph, self.lsh
+        matrix = base = index.matrix
+        known = [lesson for lesson in lessons if lesson in matrix.rows]
+        added = [lesson for lesson in lessons if lesson not in matrix.rows]
+        rows = [matrix.rows[lesson] for lesson in known]
+        if lsh is not None and lsh.matrix is not base:
+            lsh = LSHIndex(base, lsh.bands, lsh.rows)
+
+        if known:
+            matrix = matrix.updated(known)
+            index = index.updated(matrix, rows)
+            lsh = lsh.updated(matrix, rows) if lsh is not None else None
+        if added:
+            matrix = matrix.extended(added)
+            index = index.extended(matrix)
+            lsh = lsh.extended(matrix) if lsh is not None else None
+
+        if graph is not None:
+            if graph.matrix is base and graph.weights == self.weights:
+                graph = graph.updated(matrix, rows)
+            else:
+                graph = NeighborGraph(matrix, self.weights, graph.k)
+
+        self.graph = graph
+        self.lsh = lsh
+        self.index = index
+        self.matrix = matrix
+        self.version += 1
+
     def jaccard_similarity(self, set1, set2):
         """
         Compute Jaccard similarity between two sets
@@ -102,79 +311,195 @@ class SimilarityEngine:
         
         return 1.0 if domain1 & domain2 else 0.0
     
-    def compute_similarity(self, lesson1, lesson2) -> float:
+    def compute_similarity(self, lesson1, lesson2, weights=None) -> float:
         """
         Compute overall semantic similarity between two lessons
         Returns a score between 0 and 1
         """
+        weights = self.resolve_weights(weights)
         score = 0.0
         
         # 1. Peace Axes similarity (0.25)
         axes1 = set(lesson1.hasAxis) if lesson1.hasAxis else set()
         axes2 = set(lesson2.hasAxis) if lesson2.hasAxis else set()
         axes_sim = self.jaccard_similarity(axes1, axes2)
-        score += self.weights['axes'] * axes_sim
+        score += weights['axes'] * axes_sim
         
         # 2. Tools similarity (0.20)
         tools1 = set(lesson1.usesTool) if lesson1.usesTool else set()
         tools2 = set(lesson2.usesTool) if lesson2.usesTool else set()
         tools_sim = self.jaccard_similarity(tools1, tools2)
-        score += self.weights['tools'] * tools_sim
+        score += weights['tools'] * tools_sim
         
         # 3. Virtues similarity (0.20)
         virtues1 = set(lesson1.developsVirtue) if lesson1.developsVirtue else set()
         virtues2 = set(lesson2.developsVirtue) if lesson2.developsVirtue else set()
         virtues_sim = self.jaccard_similarity(virtues1, virtues2)
-        score += self.weights['virtues'] * virtues_sim
+        score += weights['virtues'] * virtues_sim
         
         # 4. Strategies similarity (0.15)
         strategies1 = set(lesson1.employsStrategy) if lesson1.employsStrategy else set()
         strategies2 = set(lesson2.employsStrategy) if lesson2.employsStrategy else set()
         strategies_sim = self.jaccard_similarity(strategies1, strategies2)
-        score += self.weights['strategies'] * strategies_sim
+        score += weights['strategies'] * strategies_sim
         
         # 5. Age compatibility (0.10)
         age_sim = self.age_similarity(lesson1, lesson2)
-        score += self.weights['age'] * age_sim
+        score += weights['age'] * age_sim
         
         # 6. Duration compatibility (0.05)
         dur_sim = self.duration_similarity(lesson1, lesson2)
-        score += self.weights['duration'] * dur_sim
+        score += weights['duration'] * dur_sim
         
         # 7. Domain similarity (0.05)
         domain_sim = self.domain_similarity(lesson1, lesson2)
-        score += self.weights['domain'] * domain_sim
+        score += weights['domain'] * domain_sim
+        
+        # 8. Text similarity (optional, see use_text_index)
+        if self.text is not None and weights.get(TEXT_DIMENSION):
+            score += weights[TEXT_DIMENSION] * self.text.similarity(lesson1, lesson2)
         
         return score
     
-    def find_similar(self, target_lesson, top_k=5, min_similarity=0.0) -> List[Tuple[object, float, Dict]]:
+    def find_similar(self, target_lesson, top_k=5, min_similarity=0.0, weights=None) -> List[Tuple[object, float, Dict]]:
         """
         Find the k most similar lessons to the target lesson
+        weights overrides self.weights for this call (see resolve_weights)
         Returns list of (lesson, similarity_score, breakdown)
         """
+        weights = self.resolve_weights(weights)
+        if self.vectorized:
+            return self._find_similar_vectorized(target_lesson, top_k, min_similarity, weights)
+
         all_lessons = list(self.onto.Lesson.instances())
-        similarities = []
+        candidates = []
         
-        for lesson in all_lessons:
+        for i, lesson in enumerate(all_lessons):
             if lesson == target_lesson:
                 continue  # Skip the target lesson itself
             
-            sim_score = self.compute_similarity(target_lesson, lesson)
+            sim_score = self.compute_similarity(target_lesson, lesson, weights)
             
             if sim_score >= min_similarity:
-                # Compute breakdown for explainability
-                breakdown = self.get_similarity_breakdown(target_lesson, lesson)
-                similarities.append((lesson, sim_score, breakdown))
+                candidates.append((i, lesson, sim_score))
         
-        # Sort by similarity score (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        # Keep the k best (score descending, corpus order among ties)
+        best = heapq.nsmallest(max(top_k, 0), candidates, key=lambda c: (-c[2], c[0]))
         
-        return similarities[:top_k]
+        # Compute breakdowns for explainability, only for the survivors
+        return [(lesson, sim_score, self.get_similarity_breakdown(target_lesson, lesson, weights=weights))
+                for _, lesson, sim_score in best]
+
+    def _find_similar_vectorized(self, target_lesson, top_k, min_similarity, weights) -> List[Tuple[object, float, Dict]]:
+        """
+        find_similar over the lesson matrix: the inverted index only scores
+        lessons that can still reach min_similarity or the current k-th score
+        """
+        index = self.index  # One snapshot, even if add_lessons swaps it meanwhile
+        target_row = index.matrix.rows.get(target_lesson)  # Skip the target lesson itself
+
+        # The text dimension has no bound in the index: score every lesson then
+        text = self.text if self.text is not None and weights.get(TEXT_DIMENSION) else None
+
+        # An indexed lesson: read its precomputed neighbours when they suffice
+        found = None
+        graph = self.graph
+        if target_row is not None and graph is not None and graph.matrix is index.matrix \
+                and graph.weights == weights and text is None:
+            found = graph.lookup(target_row, top_k, min_similarity)
+
+        lsh = self._lsh_index(index) if found is None and text is None else None
+        if found is not None:
+            rows, scores = found
+            dimension_scores = index.matrix.dimension_scores(target_lesson, rows)
+        elif text is not None:
+            rows, dimension_scores, scores = QueryScores(index.matrix, target_lesson, text).rank(
+                weights, top_k, min_similarity)
+        elif lsh is not None and lsh.signature(target_lesson) is not None:
+            rows, dimension_scores, scores = lsh.search(
+                target_lesson, weights, top_k, min_similarity, exclude=target_row)
+        else:
+            rows, dimension_scores, scores = index.search(
+                target_lesson, weights, top_k, min_similarity, exclude=target_row)
+
+        return self._similarities(target_lesson, index.matrix, rows, dimension_scores, scores, weights)
+    
+    def _similarities(self, target_lesson, matrix, rows, dimension_scores, scores, weights) -> List[Tuple[object, float, Dict]]:
+        """(lesson, score, breakdown) for ranked rows and their dimension scores"""
+        similarities = []
+        for j, i in enumerate(rows):
+            lesson = matrix.lessons[i]
+            breakdown = self.get_similarity_breakdown(
+                target_lesson, lesson, scores=dict(zip(SCORED_DIMENSIONS, dimension_scores[:, j].tolist())),
+                weights=weights)
+            similarities.append((lesson, float(scores[j]), breakdown))
+        return similarities
+    
+    def score_query(self, target_lesson) -> QueryScores:
+        """
+        Score a lesson on every dimension against the whole corpus, unweighted
+        Keep the result to rank() it under several weightings
+        """
+        matrix = self.index.matrix if self.vectorized else LessonMatrix(self.onto.Lesson.instances())
+        return QueryScores(matrix, target_lesson, self.text)
+    
+    def rank(self, query_scores: QueryScores, top_k=5, min_similarity=0.0, weights=None) -> List[Tuple[object, float, Dict]]:
+        """
+        find_similar from the stored scores of score_query(): only the
+        weighted sum is recomputed, so re-ranking under new weights is cheap
+        """
+        weights = self.resolve_weights(weights)
+        rows, dimension_scores, scores = query_scores.rank(weights, top_k, min_similarity)
+        return self._similarities(query_scores.target, query_scores.matrix, rows, dimension_scores, scores, weights)
     
-    def get_similarity_breakdown(self, lesson1, lesson2) -> Dict:
+    def find_similar_batch(self, target_lessons, top_k=5, min_similarity=0.0, weights=None) -> List[List[Tuple[object, float, Dict]]]:
+        """
+        Find the k most similar lessons for many targets at once
+        All targets are scored against the corpus as one Q x N computation
+        (in chunks bounded by BATCH_CELLS); returns one find_similar-style
+        list per target, in the same order
+        """
+        weights = self.resolve_weights(weights)
+        if not self.vectorized:
+            return [self.find_similar(target, top_k, min_similarity, weights) for target in target_lessons]
+
+        matrix = self.matrix  # One snapshot, even if add_lessons swaps it meanwhile
+        target_lessons = list(target_lessons)
+        chunk_size = max(1, BATCH_CELLS // max(len(matrix), 1))
+        results = []
+
+        for start in range(0, len(target_lessons), chunk_size):
+            chunk = target_lessons[start:start + chunk_size]
+            dimension_scores = matrix.batch_dimension_scores(chunk)
+            if self.text is not None:
+                dimension_scores = np.concatenate([dimension_scores, self.text.batch_scores(chunk, matrix)[None]])
+            scores = matrix.weighted_scores(dimension_scores, weights)
+
+            for q, target_lesson in enumerate(chunk):
+                keep = scores[q] >= min_similarity
+                target_row = matrix.rows.get(target_lesson)
+                if target_row is not None:
+                    keep[target_row] = False  # Skip the target lesson itself
+
+                similarities = []
+                for i in top_k_rows(scores[q], np.flatnonzero(keep), top_k):
+                    lesson = matrix.lessons[i]
+                    breakdown = self.get_similarity_breakdown(
+                        target_lesson, lesson, scores=dict(zip(SCORED_DIMENSIONS, dimension_scores[:, q, i].tolist())),
+                        weights=weights)
+                    similarities.append((lesson, float(scores[q, i]), breakdown))
+                results.append(similarities)
+
+        return results
+    
+    def get_similarity_breakdown(self, lesson1, lesson2, scores=None, weights=None) -> Dict:
         """
         Get detailed breakdown of similarity components
+        Per-dimension scores already computed by the caller can be passed in
+        so that only the shared elements are recomputed
         """
+        weights = self.resolve_weights(weights)
+        
         axes1 = set(lesson1.hasAxis) if lesson1.hasAxis else set()
         axes2 = set(lesson2.hasAxis) if lesson2.hasAxis else set()
         
@@ -187,40 +512,58 @@ class SimilarityEngine:
         strategies1 = set(lesson1.employsStrategy) if lesson1.employsStrategy else set()
         strategies2 = set(lesson2.employsStrategy) if lesson2.employsStrategy else set()
         
-        return {
+        if scores is None:
+            scores = {
+                'axes': self.jaccard_similarity(axes1, axes2),
+                'tools': self.jaccard_similarity(tools1, tools2),
+                'virtues': self.jaccard_similarity(virtues1, virtues2),
+                'strategies': self.jaccard_similarity(strategies1, strategies2),
+                'age': self.age_similarity(lesson1, lesson2),
+                'duration': self.duration_similarity(lesson1, lesson2),
+                'domain': self.domain_similarity(lesson1, lesson2)
+            }
+        
+        breakdown = {
             'axes': {
-                'score': self.jaccard_similarity(axes1, axes2),
+                'score': scores['axes'],
                 'shared': [str(x) for x in (axes1 & axes2)],
-                'weight': self.weights['axes']
+                'weight': weights['axes']
             },
             'tools': {
-                'score': self.jaccard_similarity(tools1, tools2),
+                'score': scores['tools'],
                 'shared': [str(x) for x in (tools1 & tools2)],
-                'weight': self.weights['tools']
+                'weight': weights['tools']
             },
             'virtues': {
-                'score': self.jaccard_similarity(virtues1, virtues2),
+                'score': scores['virtues'],
                 'shared': [str(x) for x in (virtues1 & virtues2)],
-                'weight': self.weights['virtues']
+                'weight': weights['virtues']
             },
             'strategies': {
-                'score': self.jaccard_similarity(strategies1, strategies2),
+                'score': scores['strategies'],
                 'shared': [str(x) for x in (strategies1 & strategies2)],
-                'weight': self.weights['strategies']
+                'weight': weights['strategies']
             },
             'age': {
-                'score': self.age_similarity(lesson1, lesson2),
-                'weight': self.weights['age']
+                'score': scores['age'],
+                'weight': weights['age']
             },
             'duration': {
-                'score': self.duration_similarity(lesson1, lesson2),
-                'weight': self.weights['duration']
+                'score': scores['duration'],
+                'weight': weights['duration']
             },
             'domain': {
-                'score': self.domain_similarity(lesson1, lesson2),
-                'weight': self.weights['domain']
+                'score': scores['domain'],
+                'weight': weights['domain']
             }
         }
+        if self.text is not None:
+            text_score = scores.get(TEXT_DIMENSION)
+            breakdown[TEXT_DIMENSION] = {
+                'score': self.text.similarity(lesson1, lesson2) if text_score is None else text_score,
+                'weight': weights.get(TEXT_DIMENSION, 0.0)
+            }
+        return breakdown
     
     def search_by_criteria(self, axes=None, tools=None, virtues=None, 
                           strategies=None, domain=None, 
@@ -228,50 +571,85 @@ class SimilarityEngine:
                           min_similarity=0.0) -> List[object]:
         """
         Search for lessons matching specific criteria
+        A lesson matches when it has any of the given values in each filtered
+        dimension and its age range overlaps [age_min, age_max]. Values are
+        names ("peace_with_environment"), with or without the ontology prefix.
+        A domain may be a Domain class ("Sciences"), matching lessons whose
+        domain is of that class; a domain matching no lesson matches nothing
         """
-        matching_lessons = []
-        all_lessons = list(self.onto.Lesson.instances())
+        lessons, _ = self.search_with_facets(axes, tools, virtues, strategies, domain, age_min, age_max)
+        return lessons
+    
+    def search_with_facets(self, axes=None, tools=None, virtues=None,
+                           strategies=None, domain=None,
+                           age_min=None, age_max=None) -> Tuple[List[object], Dict[str, Dict[str, int]]]:
+        """
+        search_by_criteria, also counting the matching lessons per value
+        Returns (lessons, facets) where facets maps each dimension (axes,
+        tools, virtues, strategies, domain) to {value name: count}
+        """
+        criteria_index = self._criteria_index()
         
-        for lesson in all_lessons:
-            match = True
-            
-            # Check axes
-            if axes:
-                lesson_axes = set([str(a) for a in lesson.hasAxis]) if lesson.hasAxis else set()
-                if not any(axis in lesson_axes for axis in axes):
-                    match = False
-            
-            # Check tools
-            if tools:
-                lesson_tools = set([str(t) for t in lesson.usesTool]) if lesson.usesTool else set()
-                if not any(tool in lesson_tools for tool in tools):
-                    match = False
-            
-            # Check virtues
-            if virtues:
-                lesson_virtues = set([str(v) for v in lesson.developsVirtue]) if lesson.developsVirtue else set()
-                if not any(virtue in lesson_virtues for virtue in virtues):
-                    match = False
-            
-            # Check age range
-            if age_min is not None and age_max is not None:
-                lesson_age_min = lesson.targetAgeMin[0] if lesson.targetAgeMin else 0
-                lesson_age_max = lesson.targetAgeMax[0] if lesson.targetAgeMax else 0
-                
-                # Check if there's overlap
-                if lesson_age_max < age_min or lesson_age_min > age_max:
-                    match = False
-            
-            if match:
-                matching_lessons.append(lesson)
+        def resolve(names):
+            if isinstance(names, str):
+                names = [names]
+            return [self.vocabulary.lookup(str(name).rsplit('.', 1)[-1]) for name in names or []]
         
-        return matching_lessons
-
+        def resolve_domains(names):
+            # Domains are usually classes (Sciences, Arts): any lesson domain of the class matches
+            if isinstance(names, str):
+                names = [names]
+            entities = []
+            for name in names or []:
+                name = str(name).rsplit('.', 1)[-1]
+                domain_class = self.vocabulary.domain_class(name)
+                if domain_class is not None:
+                    entities.extend(e for e in criteria_index.matrix.vocab['domain'] if isinstance(e, domain_class))
+                    entities.append(None)  # Keeps a class without lessons from lifting the filter
+                else:
+                    entities.append(self.vocabulary.lookup(name))  # None if unknown: matches nothing
+            return entities
+        
+        criteria = {
+            'axes': resolve(axes),
+            'tools': resolve(tools),
+            'virtues': resolve(virtues),
+            'strategies': resolve(strategies),
+            'domain': resolve_domains(domain)
+        }
+        mask = criteria_index.mask(criteria, age_min, age_max)
+        
+        lessons = [criteria_index.matrix.lessons[i] for i in np.flatnonzero(mask)]
+        return lessons, criteria_index.facets(mask)
+    
+    def _lsh_index(self, index) -> LSHIndex:
+        """
+        LSH index of the given corpus snapshot, or None in exact mode
+        add_lessons keeps it in step; it is only rebuilt after a refresh
+        """
+        lsh = self.lsh
+        if lsh is not None and lsh.matrix is not index.matrix:
+            if index is not self.index:
+                return None  # A snapshot replaced meanwhile: search it exactly
+            lsh = self.lsh = LSHIndex(index.matrix, lsh.bands, lsh.rows)
+        return lsh
+    
+    def _criteria_index(self) -> CriteriaIndex:
+        """Bitmap index of the current corpus, rebuilt when the corpus changed"""
+        if not self.vectorized:
+            return CriteriaIndex(LessonMatrix(self.onto.Lesson.instances()))
+        
+        index, criteria_index = self.index, self._criteria
+        if criteria_index is None or criteria_index.matrix is not index.matrix:
+            criteria_index = self._criteria = CriteriaIndex(index.matrix)
+        return criteria_index
 
 def main():
     """
     Example usage of the similarity engine
     """
+    from owlready2 import get_ontology
+    
     # Load ontology
     onto = get_ontology("ontology/peace_pedagogy.owl").load()
     
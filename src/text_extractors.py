@@ -0,0 +1,107 @@
+"""
+Text Extraction Backends for Pedagogical Sheet PDFs
+Interchangeable page-by-page text extractors with a page budget
+"""
+
+import io
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, Optional
+
+import pdfplumber
+from pdfminer.converter import TextConverter
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+class TextExtractor(ABC):
+    """
+    Base class of the extraction backends
+
+    Subclasses yield the text of each page; extract() concatenates pages up
+    to the page budget and stops early once the enough() callback is
+    satisfied by the (lowercased) text read so far.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def iter_pages(self, pdf_path: str, max_pages: Optional[int]) -> Iterator[str]:
+        """Yield the text of each page, up to max_pages pages (None = all)"""
+
+    def extract(self, pdf_path: str, max_pages: Optional[int] = 3,
+                enough: Optional[Callable[[str], bool]] = None) -> str:
+        """Return the lowercased text of the first max_pages pages (None = all)"""
+        text = ""
+        for page_text in self.iter_pages(pdf_path, max_pages):
+            text += page_text
+            if enough is not None and enough(text.lower()):
+                break
+        return text.lower()
+
+
+class PdfplumberExtractor(TextExtractor):
+    """Full layout analysis: best reading order, slowest"""
+
+    name = "pdfplumber"
+
+    def iter_pages(self, pdf_path, max_pages):
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages[:max_pages]:
+                yield page.extract_text() or ""
+
+
+class PdfminerTextExtractor(TextExtractor):
+    """pdfminer in raw text mode: no layout analysis, characters in content-stream order"""
+
+    name = "pdfminer"
+
+    def iter_pages(self, pdf_path, max_pages):
+        output = io.StringIO()
+        resources = PDFResourceManager(caching=True)
+        device = TextConverter(resources, output, laparams=None)
+        interpreter = PDFPageInterpreter(resources, device)
+        try:
+            with open(pdf_path, 'rb') as f:
+                for page in PDFPage.get_pages(f, maxpages=max_pages or 0):
+                    start = output.tell()
+                    interpreter.process_page(page)
+                    yield output.getvalue()[start:]
+        finally:
+            device.close()
+
+
+class PypdfExtractor(TextExtractor):
+    """pypdf text extraction (optional dependency)"""
+
+    name = "pypdf"
+
+    def iter_pages(self, pdf_path, max_pages):
+        reader = pypdf.PdfReader(pdf_path)
+        for page in reader.pages[:max_pages]:
+            yield page.extract_text() or ""
+
+
+EXTRACTORS: Dict[str, type] = {
+    'pdfplumber': PdfplumberExtractor,
+    'pdfminer': PdfminerTextExtractor,
+    'pypdf': PypdfExtractor,
+}
+
+
+def available_extractors():
+    """Names of the backends whose dependencies are installed"""
+    return [name for name in EXTRACTORS if name != 'pypdf' or pypdf is not None]
+
+
+def get_extractor(name: str) -> TextExtractor:
+    """Instantiate an extraction backend by name"""
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor '{name}' (choose from {', '.join(EXTRACTORS)})")
+    if name not in available_extractors():
+        raise ValueError(f"Extractor '{name}' needs the {name} package: pip install {name}")
+    return EXTRACTORS[name]()
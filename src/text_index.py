@@ -0,0 +1,160 @@
+"""
+Text Index for Peace Pedagogy Lessons
+TF-IDF vectors of sheet text for the optional text similarity dimension
+"""
+
+import os
+import re
+import json
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+from keyword_matcher import fold_accents
+from lesson_matrix import LessonMatrix
+
+
+# Default weight of the text dimension; the other weights are scaled to keep a total of 1
+TEXT_WEIGHT = 0.15
+
+# Elided articles and pronouns: "l'école" -> "école", "qu'on" -> "on"
+ELISION = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’]")
+
+# A token of folded text: letters and digits, at least two characters
+TOKEN = re.compile(r"[a-z0-9]{2,}")
+
+# French function words, accent-folded, plus the English ones of generated descriptions
+STOP_WORDS = frozenset("""
+    ai aie as au aux avait avec avons ayant ce ceci cela celle celles celui ces cet cette chez
+    comme dans de des donc dont du elle elles en entre est et etaient etait etant ete etre eu
+    eux fait faire il ils je la le les leur leurs lors lui ma mais me meme mes moi mon ne ni
+    nos notre nous on ont ou par pas peu peut plus pour qu que quel quelle quelles quels qui
+    sa sans se ses si son sont sous sur ta te tes toi ton tous tout toute toutes tres tu un une
+    vers vos votre vous
+    an and for from in of on or the to with lesson
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded content words of a French text"""
+    text = ELISION.sub(' ', fold_accents(text))
+    return [token for token in TOKEN.findall(text) if token not in STOP_WORDS]
+
+
+def lesson_document(lesson) -> str:
+    """Text of a lesson that is not in the index: its title and description"""
+    return " ".join(str(value) for prop in ('title', 'description') for value in getattr(lesson, prop, None) or [])
+
+
+class TextIndex:
+    """
+    L2-normalized TF-IDF vectors of lesson texts, one sparse row per lesson
+
+    Lessons are keyed by individual name. Cosine similarity is a dot product
+    of rows, so a query is scored against the whole corpus with one sparse
+    matrix-vector product. A lesson of the index is represented by its
+    stored row (title and extracted sheet text); any other lesson by its
+    title and description. scikit-learn is only needed by this module.
+    """
+
+    def __init__(self, documents: Dict[str, str], vectorizer=None, vectors=None):
+        self.names = list(documents)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+        if vectorizer is None:
+            vectorizer = make_vectorizer()
+            vectors = vectorizer.fit_transform(documents.values()) if documents else None
+        self.vectorizer = vectorizer
+        self.vectors = vectors.tocsr() if vectors is not None else None
+        self._aligned = None
+
+    @classmethod
+    def from_store(cls, store, titles: Dict[str, str]) -> 'TextIndex':
+        """
+        Fit over the titles of lessons and their texts in a TextStore
+        Texts are read one at a time while fitting, never all at once
+        """
+        names = [name for name in titles if name in store]
+        vectorizer = make_vectorizer()
+        vectors = vectorizer.fit_transform(f"{titles[name]}\n{store.get(name)}" for name in names) if names else None
+        return cls(dict.fromkeys(names, ""), vectorizer, vectors)
+
+    def __len__(self):
+        return len(self.names)
+
+    def vector(self, lesson):
+        """(1, V) TF-IDF row of a lesson"""
+        row = self.rows.get(getattr(lesson, 'name', None))
+        if row is not None:
+            return self.vectors[row]
+        return self.vectorizer.transform([lesson_document(lesson)])
+
+    def similarity(self, lesson1, lesson2) -> float:
+        """Cosine similarity of the texts of two lessons"""
+        if not self.names:
+            return 0.0
+        return float(self.vector(lesson1).multiply(self.vector(lesson2)).sum())
+
+    def matrix_rows(self, matrix: LessonMatrix) -> np.ndarray:
+        """Row of every matrix lesson in the index, -1 for lessons without text"""
+        aligned = self._aligned
+        if aligned is None or aligned[0] is not matrix:
+            rows = np.array([self.rows.get(getattr(lesson, 'name', None), -1) for lesson in matrix.lessons],
+                            dtype=np.intp)
+            aligned = self._aligned = (matrix, rows)
+        return aligned[1]
+
+    def scores(self, lesson, matrix: LessonMatrix) -> np.ndarray:
+        """Text similarity of a lesson with every lesson of the matrix"""
+        return self.batch_scores([lesson], matrix)[0]
+
+    def batch_scores(self, lessons: Iterable, matrix: LessonMatrix) -> np.ndarray:
+        """(Q, N) text similarities of several lessons with every lesson of the matrix"""
+        lessons = list(lessons)
+        scores = np.zeros((len(lessons), len(matrix)), dtype=np.float64)
+        if not self.names:
+            return scores
+
+        from scipy.sparse import vstack
+        queries = vstack([self.vector(lesson) for lesson in lessons])
+        similarities = (queries @ self.vectors.T).toarray()  # (Q, len(self))
+        rows = self.matrix_rows(matrix)
+        known = rows >= 0
+        scores[:, known] = similarities[:, rows[known]]
+        return scores
+
+    def save(self, index_dir: str):
+        """Write the vectors (.npz), vocabulary and IDF weights to a directory"""
+        from scipy.sparse import save_npz
+
+        os.makedirs(index_dir, exist_ok=True)
+        if self.vectors is not None:
+            save_npz(os.path.join(index_dir, 'vectors.npz'), self.vectors)
+        fitted = self.vectors is not None
+        with open(os.path.join(index_dir, 'text_index.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'names': self.names,
+                'vocabulary': {term: int(column) for term, column in self.vectorizer.vocabulary_.items()}
+                if fitted else {},
+                'idf': self.vectorizer.idf_.tolist() if fitted else []
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir: str) -> 'TextIndex':
+        """Open a directory written by save()"""
+        from scipy.sparse import load_npz
+
+        with open(os.path.join(index_dir, 'text_index.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        vectorizer = make_vectorizer(data['vocabulary'] or None)
+        vectors = None
+        if data['names']:
+            vectorizer.idf_ = np.array(data['idf'], dtype=np.float64)
+            vectors = load_npz(os.path.join(index_dir, 'vectors.npz'))
+        return cls(dict.fromkeys(data['names'], ""), vectorizer, vectors)
+
+
+def make_vectorizer(vocabulary: Optional[Dict[str, int]] = None):
+    """TF-IDF vectorizer with the French tokenizer and sublinear term frequencies"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None,
+                           sublinear_tf=True, vocabulary=vocabulary, dtype=np.float64)
+
@@ -0,0 +1,215 @@
+"""
+Text Store for Peace Pedagogy Sheets
+Keeps the extracted text of every sheet, compressed, for random access by lesson
+"""
+
+import os
+import glob
+import json
+import zlib
+import hashlib
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Version of the on-disk layout, checked when a store is opened
+FORMAT_VERSION = 1
+
+# A new shard is started once the current one reaches this size
+SHARD_BYTES = 64 << 20
+
+# zlib compression level of the records
+COMPRESSION = 6
+
+INDEX = 'index.json'
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of a text's UTF-8 encoding"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TextStore:
+    """
+    Append-only store of sheet texts, keyed by lesson id and content hash
+
+    Layout of the store directory:
+        index.json          lesson id -> content hash, and content hash ->
+                            [shard, offset, length] of its record
+        shard-00000.bin     zlib-compressed records laid end to end
+
+    A text is stored once per content hash, however many lessons share it,
+    and putting a lesson's unchanged text again writes nothing. Reading a
+    text is one seek, one read and one decompression. Records are only
+    appended: a changed or deleted text leaves its old record behind until
+    compact() rewrites the store, and records written after the last save()
+    are ignored when the store is reopened.
+    """
+
+    def __init__(self, store_dir: str, shard_bytes: int = SHARD_BYTES):
+        self.store_dir = store_dir
+        self.shard_bytes = shard_bytes
+        self.index_path = os.path.join(store_dir, INDEX)
+        os.makedirs(store_dir, exist_ok=True)
+
+        self.lessons: Dict[str, str] = {}
+        self.records: Dict[str, list] = {}
+        self.shard = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index['format'] != FORMAT_VERSION:
+                raise ValueError(f"{store_dir} has text store format {index['format']}, expected {FORMAT_VERSION}")
+            self.lessons, self.records, self.shard = index['lessons'], index['records'], index['shard']
+
+        self._readers = {}
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lessons)
+
+    def __contains__(self, lesson_id):
+        return lesson_id in self.lessons
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.store_dir, f"shard-{shard:05d}.bin")
+
+    def _shard_files(self) -> Dict[int, str]:
+        """Shard number -> path of every shard file in the store directory"""
+        paths = glob.glob(os.path.join(self.store_dir, "shard-*.bin"))
+        return {int(os.path.basename(path)[6:-4]): path for path in paths}
+
+    def hash_of(self, lesson_id: str) -> Optional[str]:
+        """Content hash of a lesson's stored text"""
+        return self.lessons.get(lesson_id)
+
+    def put(self, lesson_id: str, text: str) -> str:
+        """Store the text of a lesson; returns its content hash"""
+        digest = text_hash(text)
+        with self._lock:
+            if digest not in self.records:
+                self.records[digest] = self._append(zlib.compress(text.encode('utf-8'), COMPRESSION))
+            self.lessons[lesson_id] = digest
+        return digest
+
+    def _append(self, data: bytes) -> list:
+        """Write a record at the end of the current shard; returns [shard, offset, length]"""
+        if self._writer is None:
+            self._writer = open(self._shard_path(self.shard), 'ab')
+        offset = self._writer.tell()
+        if offset and offset + len(data) > self.shard_bytes:
+            self._writer.close()
+            self.shard += 1
+            self._writer = open(self._shard_path(self.shard), 'ab')
+            offset = self._writer.tell()
+        self._writer.write(data)
+        return [self.shard, offset, len(data)]
+
+    def get(self, lesson_id: str) -> Optional[str]:
+        """Text of a lesson, or None if it has none"""
+        digest = self.lessons.get(lesson_id)
+        return None if digest is None else self.get_by_hash(digest)
+
+    def get_by_hash(self, digest: str) -> Optional[str]:
+        """Text with the given content hash, or None"""
+        with self._lock:
+            record = self.records.get(digest)
+            if record is None:
+                return None
+            data = self._read(record)
+        return zlib.decompress(data).decode('utf-8')
+
+    def _read(self, record: list) -> bytes:
+        """Compressed bytes of a record; the caller holds the lock"""
+        shard, offset, length = record
+        if self._writer is not None and shard == self.shard:
+            self._writer.flush()
+        reader = self._readers.get(shard)
+        if reader is None:
+            reader = self._readers[shard] = open(self._shard_path(shard), 'rb')
+        reader.seek(offset)
+        return reader.read(length)
+
+    def delete(self, lesson_id: str) -> bool:
+        """Forget a lesson's text; returns whether it had one"""
+        with self._lock:
+            return self.lessons.pop(lesson_id, None) is not None
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """(lesson id, text) of every stored lesson, in storage order"""
+        lessons = sorted(self.lessons.items(), key=lambda item: self.records[item[1]][:2])
+        for lesson_id, digest in lessons:
+            yield lesson_id, self.get_by_hash(digest)
+
+    def save(self):
+        """Flush the shards and write the index; records put since are not visible before this"""
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT_VERSION, 'shard': self.shard,
+                       'lessons': self.lessons, 'records': self.records}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def compact(self) -> int:
+        """
+        Rewrite the records of stored lessons into fresh shards and remove the
+        old ones, reclaiming the records of changed and deleted texts. The new
+        shards are numbered after every shard file on disk, including shards
+        left unindexed by a crash, and the index is replaced before any old
+        shard is removed, so the store stays readable if this is interrupted.
+        Returns the number of bytes reclaimed
+        """
+        with self._lock:
+            live = sorted(set(self.lessons.values()), key=lambda digest: self.records[digest][:2])
+            old_shards = self._shard_files()
+            before = sum(os.path.getsize(path) for path in old_shards.values())
+
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self.shard = max(old_shards, default=self.shard) + 1
+            records = {}
+            for digest in live:
+                data = self._read(self.records[digest])
+                records[digest] = self._append(data)
+            self.records = records
+            self._save()
+
+            for shard, reader in list(self._readers.items()):
+                reader.close()
+                del self._readers[shard]
+            referenced = {shard for shard, offset, length in self.records.values()}
+            for shard, path in old_shards.items():
+                if shard not in referenced:
+                    os.remove(path)
+        after = sum(length for shard, offset, length in self.records.values())
+        return before - after
+
+    def close(self):
+        """Save the index and close every file"""
+        self.save()
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def summary(self) -> str:
+        """Lessons, distinct texts and compressed size, for logs"""
+        size = sum(length for shard, offset, length in self.records.values())
+        return f"{len(self.lessons)} lessons, {len(self.records)} texts, {size / 1024:.0f} KiB compressed"
@@ -0,0 +1,90 @@
+"""
+Vocabulary Registry for Peace Pedagogy Ontologies
+Maps normalized names to axis/tool/virtue/strategy/domain entities
+"""
+
+from typing import Dict, List, Optional
+
+
+# Ontology classes whose individuals make up the lesson vocabulary
+VOCABULARY_CLASSES = ['PeaceAxis', 'Tool', 'Virtue', 'Strategy', 'Domain']
+
+
+def normalize_term(name: str) -> str:
+    """Normalize a user-facing name to the form used as dictionary key"""
+    return name.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+class Vocabulary:
+    """
+    Name -> entity registry built once per ontology load
+
+    Replaces wildcard IRI searches (onto.search_one(iri="*name")) with O(1)
+    dictionary lookups. Every entity gets a stable integer ID: IDs follow
+    IRI order at build time and entities added later are appended.
+    """
+
+    def __init__(self, ontology):
+        self.onto = ontology
+        self.refresh()
+
+    @classmethod
+    def from_entities(cls, entities) -> 'Vocabulary':
+        """Build a registry from entity objects directly, without an ontology"""
+        vocabulary = cls.__new__(cls)
+        vocabulary.onto = None
+        vocabulary.by_name, vocabulary.ids, vocabulary.entities = {}, {}, []
+        for entity in entities:
+            vocabulary.add(entity)
+        return vocabulary
+
+    def refresh(self):
+        """Rebuild the registry from the individuals currently in the ontology"""
+        classes = tuple(cls for cls in (getattr(self.onto, name, None) for name in VOCABULARY_CLASSES) if cls)
+
+        self.by_name: Dict[str, object] = {}
+        self.ids: Dict[object, int] = {}
+        self.entities: List[object] = []
+
+        entities = [entity for entity in self.onto.individuals() if classes and isinstance(entity, classes)]
+        for entity in sorted(entities, key=lambda e: e.iri):
+            self.add(entity)
+
+    def add(self, entity) -> int:
+        """Register an entity (e.g. one created while loading) and return its ID"""
+        if entity in self.ids:
+            return self.ids[entity]
+
+        self.ids[entity] = len(self.entities)
+        self.entities.append(entity)
+        self.by_name.setdefault(normalize_term(entity.name), entity)
+        return self.ids[entity]
+
+    def lookup(self, name: str) -> Optional[object]:
+        """Return the entity for a name, or None if it is not in the vocabulary"""
+        if not name:
+            return None
+        return self.by_name.get(normalize_term(name))
+
+    def lookup_all(self, names) -> List[object]:
+        """Resolve a list of names, silently dropping unknown ones"""
+        entities = []
+        for name in names or []:
+            entity = self.lookup(name)
+            if entity is not None:
+                entities.append(entity)
+        return entities
+
+    def domain_class(self, name: str) -> Optional[object]:
+        """Domain class of the ontology (Sciences, Arts, ...) with the given name, or None"""
+        domain = getattr(self.onto, 'Domain', None) if self.onto is not None and name else None
+        if domain is None:
+            return None
+        key = normalize_term(name)
+        return next((cls for cls in domain.descendants() if normalize_term(cls.name) == key), None)
+
+    def __contains__(self, name: str) -> bool:
+        return self.lookup(name) is not None
+
+    def __len__(self):
+        return len(self.entities)
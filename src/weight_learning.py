@@ -0,0 +1,191 @@
+"""
+Weight Learning for Peace Pedagogy Lessons
+Fits the similarity weights to annotated ((F1, F2), similarity) lesson pairs
+"""
+
+import csv
+import json
+import itertools
+import numpy as np
+from typing import Dict, Iterable, Iterator, Tuple
+
+from lesson_matrix import LessonMatrix, DIMENSIONS
+from lesson_io import is_jsonl_path
+
+
+# Pairs scored at once when building the pair matrix
+PAIR_BLOCK = 100_000
+
+# Negative weights down to this are rounding noise of a feasible solution
+TOLERANCE = 1e-10
+
+
+def iter_pairs(path: str) -> Iterator[Tuple[str, str, float]]:
+    """
+    Yield (lesson id, lesson id, similarity) from an annotated pairs file
+
+    .csv files have a lesson1,lesson2,similarity header; .jsonl files hold
+    one {"lesson1": ..., "lesson2": ..., "similarity": ...} object per line,
+    and other files a JSON array of them (or {"pairs": [...]}).
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield row['lesson1'], row['lesson2'], float(row['similarity'])
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if is_jsonl_path(path):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = json.load(f)
+            if isinstance(records, dict):
+                records = records['pairs']
+        for record in records:
+            yield record['lesson1'], record['lesson2'], float(record['similarity'])
+
+
+def pair_matrix(matrix: LessonMatrix, pairs: Iterable[Tuple[str, str, float]]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Score every annotated pair on the seven dimensions
+    Lessons are matched by individual name or by record id. Returns
+    (X, y, skipped): X is the (P, len(DIMENSIONS)) score matrix, y the
+    annotations, and skipped the number of pairs naming unknown lessons.
+    """
+    from data_loader import lesson_name
+
+    rows = {lesson.name: i for i, lesson in enumerate(matrix.lessons)}
+
+    def row_of(lesson_id):
+        row = rows.get(lesson_id)
+        return rows.get(lesson_name(lesson_id)) if row is None else row
+
+    rows_a, rows_b, targets = [], [], []
+    skipped = 0
+    for id_a, id_b, similarity in pairs:
+        row_a, row_b = row_of(id_a), row_of(id_b)
+        if row_a is None or row_b is None:
+            skipped += 1
+            continue
+        rows_a.append(row_a)
+        rows_b.append(row_b)
+        targets.append(similarity)
+
+    rows_a, rows_b = np.array(rows_a, dtype=np.intp), np.array(rows_b, dtype=np.intp)
+    X = np.empty((len(targets), len(DIMENSIONS)), dtype=np.float64)
+    for start in range(0, len(targets), PAIR_BLOCK):
+        end = start + PAIR_BLOCK
+        X[start:end] = matrix.pair_dimension_scores(rows_a[start:end], rows_b[start:end]).T
+    return X, np.array(targets, dtype=np.float64), skipped
+
+
+def fit_weights(X: np.ndarray, y: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """
+    Least-squares weights w >= 0 for X w ~ y, summing to 1 with normalize
+
+    Only the 7 x 7 Gram matrix reaches the solver, so once it is built the
+    fit costs the same for any number of pairs. The constrained problem is
+    solved exactly: every support set of dimensions (at most 2^7 - 1) is
+    solved as a small linear system and the best feasible one is kept,
+    preferring fewer dimensions on ties. Dimensions scoring 0 on every pair
+    cannot be fitted and get weight 0.
+    """
+    gram = X.T @ X
+    moment = X.T @ y
+    active = np.flatnonzero(np.any(X != 0, axis=0))
+    if len(active) == 0:
+        raise ValueError("No annotated pair scores above 0 on any dimension")
+
+    # Without the sum constraint, all-zero weights are feasible (loss 0)
+    best, best_loss = (None, 0.0) if normalize else (np.zeros(len(DIMENSIONS)), 0.0)
+    for size in range(1, len(active) + 1):
+        for support in itertools.combinations(active, size):
+            support = list(support)
+            g, b = gram[np.ix_(support, support)], moment[support]
+            if normalize:
+                # KKT system of min w'Gw - 2b'w subject to sum(w) = 1
+                kkt = np.ones((size + 1, size + 1))
+                kkt[:size, :size] = g
+                kkt[size, size] = 0.0
+                solution = np.linalg.lstsq(kkt, np.append(b, 1.0), rcond=None)[0][:size]
+            else:
+                solution = np.linalg.lstsq(g, b, rcond=None)[0]
+            if (solution < -TOLERANCE).any():
+                continue
+
+            weights = np.zeros(len(DIMENSIONS))
+            weights[support] = np.maximum(solution, 0.0)
+            loss = weights @ gram @ weights - 2 * moment @ weights
+            if best is None or loss < best_loss - TOLERANCE * max(1.0, abs(best_loss)):
+                best, best_loss = weights, loss
+
+    return best
+
+
+def rmse(X: np.ndarray, y: np.ndarray, weights: np.ndarray) -> float:
+    """Root mean squared error of the weighted scores against the annotations"""
+    return float(np.sqrt(np.mean((X @ weights - y) ** 2))) if len(y) else 0.0
+
+
+def learn_weights(matrix: LessonMatrix, pairs_path: str, normalize: bool = True,
+                  baseline: Dict[str, float] = None) -> Dict:
+    """
+    Fit weights to the pairs of an annotated file
+    Returns {'weights': {dimension: weight}, 'pairs', 'skipped', 'rmse'},
+    plus 'baseline_rmse' when baseline weights are given for comparison
+    """
+    X, y, skipped = pair_matrix(matrix, iter_pairs(pairs_path))
+    if len(y) == 0:
+        raise ValueError(f"No pair of {pairs_path} names two known lessons")
+
+    weights = fit_weights(X, y, normalize)
+    result = {
+        'weights': dict(zip(DIMENSIONS, weights.tolist())),
+        'pairs': len(y),
+        'skipped': skipped,
+        'rmse': rmse(X, y, weights)
+    }
+    if baseline is not None:
+        result['baseline_rmse'] = rmse(X, y, np.array([baseline[dim] for dim in DIMENSIONS]))
+    return result
+
+
+def save_weights(result: Dict, path: str):
+    """Write learned weights where SimilarityEngine.load_weights reads them"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from owlready2 import World
+    from ontology_store import is_store_path, open_store
+    from similarity_engine import SimilarityEngine
+
+    arg_parser = argparse.ArgumentParser(description="Fit similarity weights to annotated lesson pairs")
+    arg_parser.add_argument('--pairs', required=True,
+                            help="annotated pairs (.csv with lesson1,lesson2,similarity, .jsonl or .json)")
+    arg_parser.add_argument('--ontology', default="ontology/peace_pedagogy.owl",
+                            help="RDF/XML ontology or SQLite store (.sqlite3) holding the lessons")
+    arg_parser.add_argument('--output', default="data/weights.json", help="weights file to write")
+    arg_parser.add_argument('--no-normalize', action='store_true',
+                            help="only require weights >= 0, not summing to 1")
+    args = arg_parser.parse_args()
+
+    if is_store_path(args.ontology):
+        world, onto = open_store(args.ontology, exclusive=False)
+    else:
+        onto = World().get_ontology(args.ontology).load()
+
+    start = time.perf_counter()
+    result = learn_weights(LessonMatrix(onto.Lesson.instances()), args.pairs,
+                           normalize=not args.no_normalize, baseline=SimilarityEngine(onto, vectorized=False).weights)
+    save_weights(result, args.output)
+
+    print(f"Fitted {result['pairs']} pairs ({result['skipped']} skipped) in {time.perf_counter() - start:.2f}s")
+    for dim, weight in result['weights'].items():
+        print(f"  {dim:<12} {weight:.4f}")
+    print(f"RMSE {result['rmse']:.4f} (default weights: {result['baseline_rmse']:.4f})")
+    print(f"Weights written to {args.output}")
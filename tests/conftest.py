@@ -0,0 +1,10 @@
+"""
+Pytest configuration: make the modules in src/ importable by name,
+the same way the scripts in src/ import each other
+"""
+
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
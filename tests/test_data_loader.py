@@ -0,0 +1,41 @@
+"""
+Checks for loading lessons into the ontology
+"""
+
+import os
+from owlready2 import World
+
+from data_loader import LessonLoader
+
+ONTOLOGY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "ontology", "peace_pedagogy.owl")
+
+
+def record(lesson_id, **fields):
+    data = {'id': lesson_id, 'title': lesson_id.title(), 'domain': 'Sciences', 'axes': ['peace_with_self'],
+            'tools': ['cevq'], 'virtues': ['empathy'], 'strategies': ['experiential_learning'],
+            'target_age_min': 8, 'target_age_max': 12, 'duration': 1.0}
+    data.update(fields)
+    return data
+
+
+def test_upsert_applies_only_the_delta():
+    """Upserts insert new ids, overwrite changed records and skip identical ones"""
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    loader = LessonLoader(onto)
+    stored = len(loader.stored_lessons())
+
+    report = loader.upsert([record('alpha'), record('beta')])
+    assert (report['inserted'], report['updated'], report['unchanged']) == (['alpha', 'beta'], [], 0)
+
+    report = loader.upsert([record('alpha'), record('beta', virtues=['compassion', 'gratitude'])])
+    assert (report['inserted'], report['updated'], report['unchanged']) == ([], ['beta'], 1)
+
+    # Updated values replace the old ones instead of being appended
+    beta = onto.search_one(iri="*beta")
+    assert sorted(v.name for v in beta.developsVirtue) == ['compassion', 'gratitude']
+
+    report = loader.upsert([record('alpha')], delete_missing=True)
+    assert report['unchanged'] == 1
+    assert 'beta' in report['deleted'] and len(report['deleted']) == stored + 1
+    assert [lesson.name for lesson in onto.Lesson.instances()] == ['alpha']
@@ -0,0 +1,58 @@
+"""
+Checks for streaming lesson files
+"""
+
+import os
+import json
+
+import pytest
+
+from lesson_io import iter_lessons, write_lessons
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "data", "pedagogical_sheets.json")
+
+
+def test_reads_existing_json_incrementally():
+    """The pretty-printed sheets file streams back record by record, whatever the chunk size"""
+    with open(DATA_PATH, 'r', encoding='utf-8') as f:
+        expected = json.load(f)['lessons']
+
+    for chunk_size in (1, 100, 1 << 16):
+        assert list(iter_lessons(DATA_PATH, chunk_size=chunk_size)) == expected
+
+
+def test_writer_round_trips(tmp_path):
+    """JSON output matches json.dump(indent=2); JSON Lines holds one record per line"""
+    with open(DATA_PATH, 'r', encoding='utf-8') as f:
+        lessons = json.load(f)['lessons']
+
+    json_path = str(tmp_path / "lessons.json")
+    assert write_lessons(json_path, iter(lessons)) == len(lessons)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        assert f.read() == json.dumps({'lessons': lessons}, indent=2, ensure_ascii=False)
+
+    jsonl_path = str(tmp_path / "lessons.jsonl")
+    write_lessons(jsonl_path, lessons)
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == len(lessons)
+    assert list(iter_lessons(jsonl_path)) == lessons
+
+    empty_path = str(tmp_path / "empty.json")
+    write_lessons(empty_path, [])
+    assert list(iter_lessons(empty_path)) == []
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    """An error while writing leaves the existing file untouched and no temporary file behind"""
+    path = tmp_path / "lessons.json"
+    write_lessons(str(path), [{'id': 'kept'}])
+
+    def failing():
+        yield {'id': 'lost'}
+        raise RuntimeError("parse failed")
+
+    with pytest.raises(RuntimeError):
+        write_lessons(str(path), failing())
+    assert list(iter_lessons(str(path))) == [{'id': 'kept'}]
+    assert os.listdir(tmp_path) == ["lessons.json"]
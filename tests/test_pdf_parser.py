@@ -0,0 +1,77 @@
+"""
+Checks for the pedagogical sheet parser
+"""
+
+import os
+import glob
+import shutil
+
+from pdf_parser import PedagogicalSheetParser
+from parse_cache import ParseCache
+from keyword_matcher import KeywordMatcher
+
+SHEETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FICHES PEDAGOGIQUES")
+
+
+def sample_sheet(tmp_path):
+    """Copy one real sheet into a temporary directory"""
+    source = sorted(glob.glob(os.path.join(SHEETS_DIR, "Sciences", "*.pdf")))[0]
+    target = tmp_path / "sheets" / os.path.basename(source)
+    target.parent.mkdir()
+    shutil.copy(source, target)
+    return str(target)
+
+
+def test_parse_cache_skips_unchanged_sheets(tmp_path):
+    """Unchanged sheets come from the cache; new keyword tables re-derive from cached text"""
+    pdf_path = sample_sheet(tmp_path)
+    cache = ParseCache(str(tmp_path / "cache"))
+    parser = PedagogicalSheetParser(cache=cache)
+
+    first = parser.parse_directory(str(tmp_path / "sheets"))
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cache = ParseCache(str(tmp_path / "cache"))
+    parser = PedagogicalSheetParser(cache=cache)
+    parser.extract_content_from_pdf = None  # The PDF must not be opened again
+    assert parser.parse_directory(str(tmp_path / "sheets")) == first
+    assert cache.hits == 1
+
+    parser.virtue_keywords = {'curiosity': ['a']}
+    lesson = parser.parse_pdf(pdf_path)
+    assert cache.rederived == 1
+    assert lesson['virtues'] == ['curiosity']
+    assert lesson['pdf_path'] == pdf_path
+
+
+def test_keyword_matcher_matches_word_starts():
+    """Keywords match accent-folded word starts and phrases, not the inside of words"""
+    matcher = KeywordMatcher({
+        'tools': {'art': ['art'], 'dialogue': ['dialog']},
+        'virtues': {'mindfulness': ['pleine conscience'], 'curiosity': ['éveil']},
+    })
+    hits = matcher.match("Le PARTAGE en Pleine\n  conscience ; pleine conscience, EVEIL et dialogues")
+    assert hits == {'tools': {'dialogue'}, 'virtues': {'mindfulness', 'curiosity'}}
+    assert matcher.match("art-thérapie")['tools'] == {'art'}
+
+
+def test_keyword_matcher_follows_table_edits():
+    """Editing a keyword table in place recompiles the matcher"""
+    parser = PedagogicalSheetParser()
+    assert 'curiosity' not in parser.keyword_matcher().match("une question")['virtues']
+    parser.virtue_keywords['curiosity'] = ['question']
+    assert 'curiosity' in parser.keyword_matcher().match("une question")['virtues']
+
+
+def test_pdfminer_backend_detects_same_fields(tmp_path):
+    """The raw-text backend finds the same fields; early stop changes the cache key"""
+    pdf_path = sample_sheet(tmp_path)
+    reference = PedagogicalSheetParser().parse_pdf(pdf_path)
+    fast = PedagogicalSheetParser(extractor='pdfminer').parse_pdf(pdf_path)
+    for field in ('axes', 'tools', 'virtues', 'duration'):
+        assert fast[field] == reference[field]
+
+    early = PedagogicalSheetParser(extractor='pdfminer', early_stop=True)
+    assert early.extraction_fingerprint() != PedagogicalSheetParser(extractor='pdfminer').extraction_fingerprint()
+    assert len(early.extract_content_from_pdf(pdf_path)) <= len(
+        PedagogicalSheetParser(extractor='pdfminer').extract_content_from_pdf(pdf_path))
@@ -0,0 +1,125 @@
+"""
+Checks for the streaming ingestion pipeline
+"""
+
+import os
+import glob
+import shutil
+from owlready2 import World
+
+from pdf_parser import PedagogicalSheetParser
+from data_loader import LessonLoader
+from pipeline import IngestionPipeline, normalize_record
+from query_engine import LessonQuery
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONTOLOGY_PATH = os.path.join(ROOT, "ontology", "peace_pedagogy.owl")
+SHEETS_DIR = os.path.join(ROOT, "FICHES PEDAGOGIQUES")
+
+QUERY = {
+    'title': "Protecting Local Wildlife",
+    'domain': "Sciences",
+    'axes': ["peace_with_environment"],
+    'virtues': ["responsibility", "gratitude"],
+    'target_age_min': 8,
+    'target_age_max': 12,
+}
+
+
+def test_pipeline_indexes_lessons_as_they_arrive(tmp_path):
+    """Lessons become searchable in batches and rank as after a full rebuild"""
+    sheets = tmp_path / "sheets"
+    sheets.mkdir()
+    for source in sorted(glob.glob(os.path.join(SHEETS_DIR, "Ethique", "*.pdf")))[:3]:
+        shutil.copy(source, sheets)
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    LessonLoader(onto).delete_lessons([lesson.name for lesson in onto.Lesson.instances()])
+    parser = PedagogicalSheetParser(extractor='pdfminer')
+    pipeline = IngestionPipeline(onto, parser=parser, index_every=1)
+
+    counts = []
+    assert pipeline.run(str(sheets), on_indexed=counts.append) == 3
+    assert counts == [1, 2, 3]
+    assert pipeline.first_searchable is not None
+
+    # A second run over the same sheets writes nothing
+    rerun = IngestionPipeline(onto, parser=parser)
+    assert rerun.run(str(sheets)) == 0
+    assert rerun.report['unchanged'] == 3
+
+    rebuilt = LessonQuery(onto)
+    assert len(pipeline.query.engine.matrix) == len(rebuilt.engine.matrix)
+    incremental = pipeline.query.query_similar_lessons(**QUERY, top_k=5)
+    expected = rebuilt.query_similar_lessons(**QUERY, top_k=5)
+    assert [(r['title'], r['similarity_score']) for r in incremental] == \
+           [(r['title'], r['similarity_score']) for r in expected]
+
+
+def test_pipeline_builds_text_index(tmp_path):
+    """Sheet text is indexed at the end of a run, even for unchanged lessons"""
+    from text_index import TextIndex
+
+    sheets = tmp_path / "sheets"
+    sheets.mkdir()
+    for source in sorted(glob.glob(os.path.join(SHEETS_DIR, "Ethique", "*.pdf")))[:3]:
+        shutil.copy(source, sheets)
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    pipeline = IngestionPipeline(onto, parser=PedagogicalSheetParser(extractor='pdfminer'), text=True)
+    pipeline.run(str(sheets))
+    assert len(pipeline.text_index) == 3
+    assert sorted(pipeline.titles) == sorted(pipeline.text_index.names)
+
+    rerun = IngestionPipeline(onto, parser=PedagogicalSheetParser(extractor='pdfminer'), text=True)
+    assert rerun.run(str(sheets)) == 0
+    assert len(rerun.text_index) == 3
+
+    # An indexed sheet is closest to itself on text
+    engine = pipeline.query.engine
+    name = pipeline.text_index.names[0]
+    lesson = next(lesson for lesson in engine.matrix.lessons if lesson.name == name)
+    scores = pipeline.text_index.scores(lesson, engine.matrix)
+    assert abs(scores[engine.matrix.rows[lesson]] - 1.0) < 1e-9
+
+    pipeline.text_index.save(str(tmp_path / "text_index"))
+    loaded = TextIndex.load(str(tmp_path / "text_index"))
+    assert loaded.names == pipeline.text_index.names
+    assert (abs(loaded.scores(lesson, engine.matrix) - scores) < 1e-12).all()
+
+    results = pipeline.query.query_similar_lessons(**QUERY, top_k=3)
+    assert all('text' in result['similarity_breakdown'] for result in results)
+
+    # With a text store, the sheet text goes to disk and the index is fitted from it
+    from text_store import TextStore
+    with TextStore(str(tmp_path / "text_store")) as store:
+        stored = IngestionPipeline(onto, parser=PedagogicalSheetParser(extractor='pdfminer'), text=True,
+                                   text_store=store)
+        stored.run(str(sheets))
+        assert len(store) == 3
+        assert all(len(store.get(name)) > 200 for name in pipeline.titles)
+    assert stored.text_index.names == pipeline.text_index.names
+    assert (abs(stored.text_index.vectors - pipeline.text_index.vectors) > 1e-12).nnz == 0
+
+
+
+def test_pipeline_skips_text_without_words(tmp_path):
+    """Sheets holding only stop words leave the text dimension off instead of failing"""
+    from text_store import TextStore
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    pipeline = IngestionPipeline(onto, text=True)
+    pipeline.titles = {'empty_sheet': "Le"}
+    with TextStore(str(tmp_path / "text_store")) as store:
+        store.put('empty_sheet', "de la et")
+        pipeline._index_text(store)
+    assert pipeline.text_index is None
+    assert 'text' not in pipeline.query.engine.weights
+
+
+def test_normalize_record_cleans_names():
+    record = normalize_record({'title': ' Sharing ', 'virtues': ['Gratitude', 'gratitude', ''],
+                               'duration': '1.5', 'target_age_min': None})
+    assert record['title'] == "Sharing"
+    assert record['virtues'] == ['gratitude']
+    assert record['duration'] == 1.5 and record['target_age_min'] == 0
@@ -0,0 +1,186 @@
+"""
+Checks for the metadata query API of the query engine
+"""
+
+import os
+from owlready2 import get_ontology
+
+from query_engine import LessonQuery
+
+ONTOLOGY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "ontology", "peace_pedagogy.owl")
+
+QUERIES = [
+    {
+        'title': "Protecting Local Wildlife",
+        'domain': "Sciences",
+        'axes': ["peace_with_environment"],
+        'tools': ["project_based_learning"],
+        'virtues': ["responsibility", "compassion"],
+        'target_age_min': 8,
+        'target_age_max': 12,
+        'duration': 2.0
+    },
+    {
+        'title': "Understanding Our Emotions",
+        'domain': "Ethics",
+        'axes': ["peace_with_self", "peace_with_others"],
+        'tools': ["cevq", "meditation"],
+        'virtues': ["empathy", "patience"],
+        'target_age_min': 7,
+        'target_age_max': 10,
+        'duration': 1.5
+    },
+    {
+        'title': "Creating Together",
+        'domain': "Arts",
+        'axes': ["peace_with_others"],
+        'tools': ["artistic_expression", "project_based_learning"],
+        'virtues': ["benevolence", "patience"],
+        'target_age_min': 9,
+        'target_age_max': 13
+    }
+]
+
+
+def summary(results):
+    return [(r['title'], r['similarity_score'], r['similarity_breakdown']['axes']['score']) for r in results]
+
+
+def test_batch_matches_single_queries():
+    """A batch returns the same results as one query at a time"""
+    onto = get_ontology(ONTOLOGY_PATH).load()
+    query = LessonQuery(onto)
+
+    batch = query.query_similar_lessons_batch(QUERIES, top_k=4)
+
+    assert len(batch) == len(QUERIES)
+    for metadata, results in zip(QUERIES, batch):
+        assert summary(results) == summary(query.query_similar_lessons(**metadata, top_k=4))
+
+
+def test_registry_reloads_only_changed_files(tmp_path):
+    """A touched file keeps its engine, a modified file gets a new one"""
+    import shutil
+    from engine_registry import EngineRegistry
+
+    path = tmp_path / "onto.owl"
+    shutil.copy(ONTOLOGY_PATH, path)
+    registry = EngineRegistry(LessonQuery)
+
+    engine = registry.get(str(path))
+    assert registry.get(str(path)) is engine
+
+    os.utime(path, ns=(0, 0))
+    assert registry.get(str(path)) is engine
+    assert registry.loads == 1
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("\n")
+    reloaded = registry.get(str(path))
+    assert reloaded is not engine
+    assert registry.loads == 2
+    assert len(reloaded.engine.matrix) == len(engine.engine.matrix)
+
+
+def test_queries_leave_ontology_untouched_and_run_concurrently():
+    """Queries create no individuals and give the same answers from many threads"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    onto = get_ontology(ONTOLOGY_PATH).load()
+    query = LessonQuery(onto)
+    individuals = set(onto.individuals())
+
+    expected = [summary(query.query_similar_lessons(**metadata, top_k=3)) for metadata in QUERIES]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        actual = list(pool.map(lambda metadata: summary(query.query_similar_lessons(**metadata, top_k=3)),
+                               QUERIES * 20))
+
+    assert actual == expected * 20
+    assert set(onto.individuals()) == individuals
+
+
+def test_vocabulary_resolves_feature_names():
+    """Vocabulary lookups find the same entities as the wildcard IRI search"""
+    from vocabulary import Vocabulary
+
+    onto = get_ontology(ONTOLOGY_PATH).load()
+    vocabulary = Vocabulary(onto)
+
+    assert len(vocabulary) > 0
+    for entity in vocabulary.entities:
+        assert vocabulary.lookup(entity.name) is onto.search_one(iri=f"*{entity.name}")
+        assert vocabulary.entities[vocabulary.ids[entity]] is entity
+    assert vocabulary.lookup("Peace With Others") is onto.search_one(iri="*peace_with_others")
+    assert vocabulary.lookup("not_a_feature") is None
+
+
+def test_compiled_index_queries_without_owlready2(tmp_path):
+    """Querying a compiled index in a fresh interpreter never imports owlready2"""
+    import sys
+    import subprocess
+    from index_artifact import build_index
+
+    build_index(get_ontology(ONTOLOGY_PATH).load(), str(tmp_path / "index"))
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    code = (f"import sys; sys.path.insert(0, {src!r})\n"
+            "from query_engine import search_similar_lessons\n"
+            f"results = search_similar_lessons(title='Q', axes=['peace_with_others'], ontology_path={str(tmp_path / 'index')!r})\n"
+            "assert results\n"
+            "print('owlready2' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    assert output.strip() == "False"
+
+
+def test_result_cache_hits_equivalent_queries_until_corpus_changes():
+    """Reordered or renamed features hit the cache; a corpus change invalidates it"""
+    from result_cache import ResultCache
+
+    onto = get_ontology(ONTOLOGY_PATH).load()
+    query = LessonQuery(onto, cache=ResultCache(maxsize=2))
+    uncached = LessonQuery(onto)
+    metadata = QUERIES[1]
+
+    first = query.query_similar_lessons(**metadata, top_k=3)
+    reordered = dict(metadata, title="Other title", axes=["Peace With Others", "peace_with_self"])
+    second = query.query_similar_lessons(**reordered, top_k=3)
+    assert second == first == uncached.query_similar_lessons(**metadata, top_k=3)
+    assert (query.cache.hits, query.cache.misses) == (1, 1)
+
+    second[0]['title'] = "changed"
+    assert query.query_similar_lessons(**metadata, top_k=3) == first
+
+    query.query_similar_lessons(**metadata, top_k=4)
+    query.engine.weights = dict(query.engine.weights, axes=0.5)
+    query.query_similar_lessons(**metadata, top_k=3)
+    assert query.cache.misses == 3
+    assert len(query.cache) == 2
+
+    query.engine.refresh()
+    query.query_similar_lessons(**metadata, top_k=3)
+    assert query.cache.misses == 4
+    assert len(query.cache) == 1
+
+
+def test_weight_overrides_rerank_stored_scores():
+    """Per-request weights give the results of an engine built with those weights"""
+    import pytest
+
+    onto = get_ontology(ONTOLOGY_PATH).load()
+    query = LessonQuery(onto)
+    tuned = LessonQuery(onto)
+
+    for override in [{'virtues': 0.6, 'tools': 0.0}, {'age': 0.5}, [0.1, 0.1, 0.1, 0.1, 0.3, 0.2, 0.1]]:
+        tuned.engine.weights = query.engine.resolve_weights(override)
+        for metadata in QUERIES:
+            expected = tuned.query_similar_lessons(**metadata, top_k=4)
+            assert summary(query.query_similar_lessons(**metadata, top_k=4, weights=override)) == summary(expected)
+            batch = query.query_similar_lessons_batch([metadata], top_k=4, weights=override)[0]
+            assert summary(batch) == summary(expected)
+
+    # Each query was scored once, then only re-ranked
+    assert (query.scores.misses, query.scores.hits) == (len(QUERIES), 2 * len(QUERIES))
+    assert query.engine.weights['virtues'] == 0.20
+
+    with pytest.raises(ValueError):
+        query.query_similar_lessons(title="Q", weights={'colour': 1.0})
@@ -0,0 +1,347 @@
+"""
+Checks that the vectorized similarity engine matches the scalar reference
+"""
+
+import os
+from owlready2 import get_ontology
+
+from similarity_engine import SimilarityEngine
+
+ONTOLOGY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "ontology", "peace_pedagogy.owl")
+
+
+def load_ontology():
+    return get_ontology(ONTOLOGY_PATH).load()
+
+
+def test_matrix_scores_match_compute_similarity():
+    """Every vectorized score equals the pairwise compute_similarity exactly"""
+    onto = load_ontology()
+    engine = SimilarityEngine(onto)
+    lessons = engine.matrix.lessons
+
+    for target in lessons:
+        scores = engine.matrix.score(target, engine.weights)
+        for i, lesson in enumerate(lessons):
+            assert scores[i] == engine.compute_similarity(target, lesson)
+
+
+def test_find_similar_matches_scalar_mode():
+    """Both modes return the same lessons, scores and order"""
+    onto = load_ontology()
+    vectorized = SimilarityEngine(onto)
+    scalar = SimilarityEngine(onto, vectorized=False)
+
+    for target in list(onto.Lesson.instances()):
+        for top_k, min_similarity in [(5, 0.0), (3, 0.4), (100, 0.0), (1, 0.2), (5, 0.6), (2, 0.15)]:
+            expected = scalar.find_similar(target, top_k=top_k, min_similarity=min_similarity)
+            actual = vectorized.find_similar(target, top_k=top_k, min_similarity=min_similarity)
+            assert [(l, s) for l, s, _ in actual] == [(l, s) for l, s, _ in expected]
+
+
+def test_breakdowns_match_scalar_mode():
+    """Breakdowns built from the matrix columns equal the recomputed ones"""
+    onto = load_ontology()
+    vectorized = SimilarityEngine(onto)
+    scalar = SimilarityEngine(onto, vectorized=False)
+
+    for target in list(onto.Lesson.instances()):
+        for lesson, _, breakdown in vectorized.find_similar(target, top_k=3):
+            expected = scalar.get_similarity_breakdown(target, lesson)
+            for dim, component in breakdown.items():
+                assert component['score'] == expected[dim]['score']
+                assert sorted(component.get('shared', [])) == sorted(expected[dim].get('shared', []))
+
+
+def test_top_k_rows_breaks_ties_by_row():
+    import numpy as np
+    from lesson_matrix import top_k_rows
+
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.5, 0.9])
+    rows = np.arange(len(scores))
+    assert top_k_rows(scores, rows, 3).tolist() == [1, 5, 0]
+    assert top_k_rows(scores, rows, 4).tolist() == [1, 5, 0, 2]
+    assert top_k_rows(scores, rows, 10).tolist() == [1, 5, 0, 2, 4, 3]
+    assert top_k_rows(scores, rows, 0).tolist() == []
+
+
+def test_inverted_index_skips_unreachable_lessons():
+    """A threshold above every bound leaves nothing to score"""
+    onto = load_ontology()
+    engine = SimilarityEngine(onto)
+    target = engine.matrix.lessons[0]
+
+    candidates = engine.index.candidates(target)
+    bounds = engine.index.upper_bounds(target, candidates, engine.weights)
+    exact = engine.matrix.score(target, engine.weights)[candidates]
+    assert (bounds >= exact).all()
+
+    rows, _, _ = engine.index.search(target, engine.weights, 5, min_similarity=bounds.max() + 1e-9)
+    assert len(rows) == 0
+
+
+def test_compiled_index_matches_ontology(tmp_path):
+    """An engine over a memory-mapped index returns the same results as one over the ontology"""
+    from index_artifact import build_index
+    from query_engine import LessonQuery
+
+    onto = load_ontology()
+    manifest = build_index(onto, str(tmp_path / "index"))
+    assert manifest['lessons'] == len(list(onto.Lesson.instances()))
+
+    compiled = SimilarityEngine.from_index(str(tmp_path / "index"))
+    engine = SimilarityEngine(onto)
+    assert compiled.matrix.features['axes'].dtype == engine.matrix.features['axes'].dtype
+
+    def summary(results):
+        return [(str(l.title), s, sorted(b['axes']['shared']), b['domain']['score']) for l, s, b in results]
+
+    for target in engine.matrix.lessons:
+        row = engine.matrix.rows[target]
+        expected = engine.find_similar(target, top_k=5)
+        assert summary(compiled.find_similar(compiled.matrix.lessons[row], top_k=5)) == summary(expected)
+
+    query = LessonQuery(onto)
+    compiled_query = LessonQuery.from_index(str(tmp_path / "index"))
+    metadata = {'title': "Q", 'domain': "Sciences", 'axes': ["peace_with_environment"],
+                'virtues': ["responsibility"], 'target_age_min': 8, 'target_age_max': 12}
+    expected = query.query_similar_lessons(**metadata)
+    actual = compiled_query.query_similar_lessons(**metadata)
+    assert [(r['title'], r['axes'], r['similarity_score']) for r in actual] == \
+           [(r['title'], r['axes'], r['similarity_score']) for r in expected]
+
+
+
+def test_index_rebuild_swaps_versions(tmp_path):
+    """Rebuilds repoint the index symlink at a new version and keep only the previous one"""
+    import os
+    from owlready2 import World
+    from index_artifact import build_index, open_index
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()  # Lessons are edited below
+    path = str(tmp_path / "index")
+    os.makedirs(path)
+    open(os.path.join(path, "stale"), 'w').close()  # directory of the earlier layout
+
+    first = build_index(onto, path)
+    assert os.path.islink(path) and open_index(path).manifest == first
+    assert build_index(onto, path) == first and len(os.listdir(tmp_path)) == 2
+
+    lessons = list(onto.Lesson.instances())
+    versions = []
+    for lesson in lessons[:3]:
+        lesson.duration = [99.0]
+        versions.append(os.path.realpath(path))
+        manifest = build_index(onto, path)
+        assert manifest['digest'] != first['digest'] and open_index(path).manifest == manifest
+    assert sorted(os.listdir(tmp_path)) == sorted(["index", os.path.basename(versions[-1]),
+                                                   os.path.basename(os.path.realpath(path))])
+
+
+def test_neighbor_graph_matches_search_and_updates_incrementally():
+    """Graph lookups equal index searches, and updated graphs equal rebuilt ones"""
+    from owlready2 import World
+    from neighbor_graph import NeighborGraph
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    engine = SimilarityEngine(onto, neighbors=3)
+    reference = SimilarityEngine(onto)
+
+    def check():
+        fresh = NeighborGraph(engine.matrix, engine.weights, engine.graph.k)
+        assert (engine.graph.neighbors == fresh.neighbors).all()
+        assert (engine.graph.scores == fresh.scores).all()
+        for target in engine.matrix.lessons:
+            for top_k, min_similarity in [(3, 0.0), (2, 0.4), (5, 0.0)]:
+                expected = reference.find_similar(target, top_k=top_k, min_similarity=min_similarity)
+                actual = engine.find_similar(target, top_k=top_k, min_similarity=min_similarity)
+                assert [(l, s) for l, s, _ in actual] == [(l, s) for l, s, _ in expected]
+
+    check()
+
+    # Change two lessons in place and add a copy of a third one
+    lessons = engine.matrix.lessons
+    lessons[0].hasAxis = list(lessons[5].hasAxis)
+    lessons[0].developsVirtue = list(lessons[5].developsVirtue)
+    lessons[1].usesTool = []
+    with onto:
+        copy = onto.Lesson("neighbor_graph_copy")
+    for prop in ['hasAxis', 'usesTool', 'developsVirtue', 'employsStrategy', 'belongsToDomain',
+                 'targetAgeMin', 'targetAgeMax', 'duration']:
+        setattr(copy, prop, list(getattr(lessons[7], prop)))
+
+    engine.add_lessons([lessons[0], lessons[1], copy])
+    reference.refresh()
+    assert len(engine.matrix) == len(reference.matrix)
+    check()
+
+
+def test_search_by_criteria_matches_brute_force():
+    """Bitmap filters and facet counts equal a plain loop over the lessons"""
+    onto = load_ontology()
+    engine = SimilarityEngine(onto)
+    lessons = list(onto.Lesson.instances())
+
+    def names(values):
+        return {value.name for value in values or []}
+
+    cases = [
+        dict(axes=["peace_with_environment"]),
+        dict(axes=["peace_pedagogy.peace_with_others"], virtues=["empathy", "gratitude"]),
+        dict(tools=["project_based_learning"], strategies=["experiential_learning"]),
+        dict(age_min=8, age_max=12),
+        dict(age_max=6),
+        dict(virtues=["not_a_virtue"]),
+        dict(),
+    ]
+    for case in cases:
+        expected = []
+        for lesson in lessons:
+            age_min = lesson.targetAgeMin[0] if lesson.targetAgeMin else 0
+            age_max = lesson.targetAgeMax[0] if lesson.targetAgeMax else 0
+            match = all(not case.get(field) or names(getattr(lesson, prop)) & {v.split('.')[-1] for v in case[field]}
+                        for field, prop in [('axes', 'hasAxis'), ('tools', 'usesTool'), ('virtues', 'developsVirtue'),
+                                            ('strategies', 'employsStrategy')])
+            if 'age_min' in case and age_max < case['age_min']:
+                match = False
+            if 'age_max' in case and (age_min == 0 or age_min > case['age_max']):
+                match = False
+            if match:
+                expected.append(lesson)
+
+        matching, facets = engine.search_with_facets(**case)
+        assert matching == expected == engine.search_by_criteria(**case)
+        for dim, prop in [('axes', 'hasAxis'), ('tools', 'usesTool'), ('virtues', 'developsVirtue')]:
+            counts = {}
+            for lesson in expected:
+                for name in names(getattr(lesson, prop)):
+                    counts[name] = counts.get(name, 0) + 1
+            assert facets[dim] == counts
+
+
+def test_lsh_search_reranks_candidates_exactly():
+    """Approximate results carry exact scores, and identical lessons always collide"""
+    from owlready2 import World
+    from lsh_index import LSHIndex, recall_at_k
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    engine = SimilarityEngine(onto)
+    exact = SimilarityEngine(onto)
+    lessons = engine.matrix.lessons
+
+    # One hash per band: any lesson sharing a value is a candidate with high probability
+    assert recall_at_k(exact, LSHIndex(exact.matrix, bands=64, rows=1), lessons)['recall'] == 1.0
+
+    engine.build_lsh_index(bands=8, rows=8)
+    for target in lessons:
+        candidates = set(engine.lsh.candidates(target).tolist())
+        for lesson, score, _ in engine.find_similar(target, top_k=5):
+            assert engine.matrix.rows[lesson] in candidates
+            assert abs(score - exact.compute_similarity(target, lesson)) < 1e-12
+
+    # The index follows add_lessons, and a copy shares every bucket with its original
+    with onto:
+        copy = onto.Lesson("lsh_copy")
+    for prop in ['hasAxis', 'usesTool', 'developsVirtue', 'employsStrategy', 'belongsToDomain',
+                 'targetAgeMin', 'targetAgeMax', 'duration']:
+        setattr(copy, prop, list(getattr(lessons[3], prop)))
+    engine.add_lessons([copy])
+    assert engine.find_similar(lessons[3], top_k=1)[0][0] is copy
+    assert engine.lsh.matrix is engine.matrix
+
+    # Signing only new and changed rows gives the buckets of a rebuilt index
+    with onto:
+        lessons[0].developsVirtue = [onto.Virtue("lsh_new_virtue")]
+        lessons[1].hasAxis, lessons[1].usesTool, lessons[1].developsVirtue, lessons[1].employsStrategy = [], [], [], []
+    engine.add_lessons([lessons[0], lessons[1], copy])
+    rebuilt = LSHIndex(engine.matrix, bands=8, rows=8)
+
+    def buckets(lsh):
+        return [sorted(zip(keys.tolist(), rows.tolist())) for keys, rows in zip(lsh.sorted_keys, lsh.order)]
+    assert len(engine.lsh) == len(rebuilt) == len(engine.matrix) - 1
+    assert buckets(engine.lsh) == buckets(rebuilt)
+    assert (engine.lsh.candidates(copy) == rebuilt.candidates(copy)).all()
+
+    # Switching back to exact search changes the version that keys cached results
+    version = engine.version
+    engine.disable_lsh()
+    assert engine.lsh is None and engine.version > version
+
+
+def test_text_dimension_matches_pairwise_scores():
+    """Vectorized text scores agree with compute_similarity in every search path"""
+    from owlready2 import World
+    from lesson_features import LessonFeatures
+    from text_index import TextIndex, tokenize
+
+    assert tokenize("L'éducation à la paix, qu'on apprenne l'Écologie") == ['education', 'paix', 'apprenne', 'ecologie']
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    engine = SimilarityEngine(onto, neighbors=3)
+    scalar = SimilarityEngine(onto, vectorized=False)
+    lessons = engine.matrix.lessons
+    topics = ["méditation et émotions", "la nature et l'écologie du jardin", "coopération en équipe"]
+    text = TextIndex({lesson.name: f"{lesson.title[0]} {topics[i % 3]}" for i, lesson in enumerate(lessons[:-2])})
+
+    weights = engine.use_text_index(text, weight=0.3)
+    scalar.use_text_index(text, weight=0.3)
+    assert abs(sum(weights.values()) - 1.0) < 1e-12 and weights['text'] == 0.3
+
+    query = LessonFeatures(title="Séance de méditation", description="apprendre à gérer ses émotions")
+    for target in [query, lessons[0], lessons[-1]]:
+        expected = [(l, s) for l, s, _ in scalar.find_similar(target, top_k=5)]
+        for similar in [engine.find_similar(target, top_k=5),
+                        engine.find_similar_batch([target], top_k=5)[0],
+                        engine.rank(engine.score_query(target), top_k=5)]:
+            assert [l for l, _, _ in similar] == [l for l, _ in expected]
+            for (lesson, score, breakdown), (_, reference) in zip(similar, expected):
+                assert abs(score - reference) < 1e-12
+                assert abs(breakdown['text']['score'] - text.similarity(target, lesson)) < 1e-12
+
+    # Lessons missing from the text index score 0 on text
+    assert text.scores(query, engine.matrix)[engine.matrix.rows[lessons[-1]]] == 0.0
+
+
+def test_search_by_criteria_resolves_domain_classes():
+    """Loaded lessons carry their Domain class; domain names filter through the classes"""
+    import json
+    from owlready2 import World
+    from data_loader import LessonLoader
+
+    onto = World().get_ontology(ONTOLOGY_PATH).load()
+    engine = SimilarityEngine(onto)
+    lessons = engine.matrix.lessons
+
+    # The shipped lessons carry the domain of their record
+    data_path = os.path.join(os.path.dirname(os.path.dirname(ONTOLOGY_PATH)), "data", "pedagogical_sheets.json")
+    with open(data_path, 'r', encoding='utf-8') as f:
+        records = json.load(f)['lessons']
+    sciences = [lesson for lesson in lessons if [domain.name for domain in lesson.belongsToDomain] == ['sciences']]
+    assert len(sciences) == sum(record['domain'] == "Sciences" for record in records) > 0
+    assert engine.search_by_criteria(domain="Sciences") == sciences
+    assert engine.search_by_criteria(domain="peace_pedagogy.Sciences") == sciences
+    assert set(engine.search_by_criteria(virtues=["empathy"], domain="Sciences")) <= set(sciences)
+    assert engine.search_by_criteria(domain="Nonexistent") == []
+    assert engine.search_by_criteria(domain=["Sciences", "Nonexistent"]) == sciences
+
+    # Any individual of a Domain class matches its class name
+    with onto:
+        custom = onto.Arts("arts_workshop")
+    lessons[0].belongsToDomain = [custom]
+    engine.vocabulary.refresh()
+    engine.refresh()
+    arts = engine.search_by_criteria(domain="Arts")
+    assert lessons[0] in arts and all(isinstance(lesson.belongsToDomain[0], onto.Arts) for lesson in arts)
+    assert engine.search_by_criteria(domain="arts_workshop") == [lessons[0]]
+    _, facets = engine.search_with_facets(domain="Arts")
+    assert facets['domain'] == {'arts': len(arts) - 1, 'arts_workshop': 1}
+
+    # The loader resolves domain names to the individual of their class
+    fresh = World().get_ontology(ONTOLOGY_PATH).load()
+    loader = LessonLoader(fresh)
+    with fresh:
+        lesson = loader.create_lesson({'id': "new lesson", 'title': "New", 'domain': "Languages"})
+        unknown = loader.create_lesson({'id': "other lesson", 'title': "Other", 'domain': "Unknown"})
+    assert lesson.belongsToDomain == [fresh.languages] and isinstance(fresh.languages, fresh.Languages)
+    assert unknown.belongsToDomain == []
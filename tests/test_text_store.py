@@ -0,0 +1,96 @@
+"""
+Checks for the compressed sheet text store
+"""
+
+import os
+
+from text_store import TextStore, text_hash
+
+
+def test_text_store_round_trips_and_deduplicates(tmp_path):
+    """Texts come back unchanged, identical texts are stored once, and shards roll over"""
+    store_dir = str(tmp_path / "texts")
+    texts = {f"lesson_{i}": f"Séance {i % 4} : l'écologie du jardin. " + " ".join(str(j * j * (i % 4 + 7)) for j in range(40))
+             for i in range(12)}
+
+    with TextStore(store_dir, shard_bytes=200) as store:
+        for lesson_id, text in texts.items():
+            assert store.put(lesson_id, text) == text_hash(text)
+        assert len(store) == 12 and len(store.records) == 4
+        assert store.get("lesson_5") == texts["lesson_5"]
+
+        # Unchanged text writes nothing; a changed one gets a new record
+        size = sum(os.path.getsize(os.path.join(store_dir, name)) for name in os.listdir(store_dir))
+        store.put("lesson_0", texts["lesson_0"])
+        assert sum(os.path.getsize(os.path.join(store_dir, name)) for name in os.listdir(store_dir)) == size
+        texts["lesson_0"] = "Nouvelle version"
+        store.put("lesson_0", texts["lesson_0"])
+        assert store.delete("lesson_11") and not store.delete("lesson_11")
+        del texts["lesson_11"]
+
+    assert len([name for name in os.listdir(store_dir) if name.startswith("shard-")]) > 1
+
+    reopened = TextStore(store_dir)
+    assert dict(reopened.items()) == texts
+    assert reopened.hash_of("lesson_3") == text_hash(texts["lesson_3"])
+    assert reopened.get("lesson_11") is None and "lesson_11" not in reopened
+
+    # Records put after the last save are not part of the reopened store
+    reopened.put("unsaved", "brouillon")
+    assert reopened.get("unsaved") == "brouillon"  # The record is on disk, the index is not
+    assert "unsaved" not in TextStore(store_dir)
+    reopened.close()
+    assert TextStore(store_dir).get("unsaved") == "brouillon"
+
+
+def test_text_store_compacts_live_records(tmp_path):
+    """Compaction drops the records of changed and deleted texts and keeps every stored one"""
+    store_dir = str(tmp_path / "texts")
+    texts = {f"lesson_{i}": f"Séance {i} : " + " ".join(str(j * j * (i + 7)) for j in range(60)) for i in range(8)}
+
+    def shards():
+        return sorted(name for name in os.listdir(store_dir) if name.startswith("shard-"))
+
+    with TextStore(store_dir, shard_bytes=300) as store:
+        for lesson_id, text in texts.items():
+            store.put(lesson_id, text)
+        for i in range(4):
+            store.put(f"lesson_{i}", "Nouvelle version")
+            texts[f"lesson_{i}"] = "Nouvelle version"
+        store.delete("lesson_7")
+        del texts["lesson_7"]
+        store.save()
+        old_shards = shards()
+
+        assert store.compact() > 0
+        assert len(store.records) == 4
+        assert not set(shards()) & set(old_shards)
+        assert dict(store.items()) == texts
+
+        # The compacted store keeps taking new texts
+        store.put("lesson_8", "Encore une")
+        texts["lesson_8"] = "Encore une"
+
+    reopened = TextStore(store_dir)
+    assert dict(reopened.items()) == texts
+    assert sum(os.path.getsize(os.path.join(store_dir, name)) for name in shards()) == \
+        sum(length for shard, offset, length in reopened.records.values())
+    reopened.close()
+
+
+def test_text_store_compaction_skips_unindexed_shards(tmp_path):
+    """A shard left on disk by a crash after the last save() is not reused by compaction"""
+    store_dir = str(tmp_path / "texts")
+    texts = {"a": "paix", "b": "joie"}
+    store = TextStore(store_dir, shard_bytes=30)
+    for lesson_id, text in texts.items():
+        store.put(lesson_id, text)
+    store.save()
+    store.put("c", "gratitude")  # Rolls over to shard 1
+    assert store.get("c") == "gratitude"  # Flushes shard 1 to disk; the index is not written
+
+    reopened = TextStore(store_dir, shard_bytes=30)
+    reopened.compact()
+    assert dict(reopened.items()) == texts
+    reopened.close()
+    assert dict(TextStore(store_dir).items()) == texts
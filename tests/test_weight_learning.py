@@ -0,0 +1,67 @@
+"""
+Checks for fitting similarity weights to annotated lesson pairs
+"""
+
+import os
+import json
+import numpy as np
+from owlready2 import get_ontology
+
+from similarity_engine import SimilarityEngine
+from lesson_matrix import DIMENSIONS
+from weight_learning import pair_matrix, fit_weights, learn_weights, save_weights
+
+ONTOLOGY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "ontology", "peace_pedagogy.owl")
+
+
+def test_pair_scores_match_engine():
+    """Pair matrix rows equal the engine's per-dimension scores"""
+    engine = SimilarityEngine(get_ontology(ONTOLOGY_PATH).load())
+    lessons = engine.matrix.lessons
+    pairs = [(a, b) for a in lessons[:5] for b in lessons]
+
+    X, y, skipped = pair_matrix(engine.matrix, [(a.name, b.name, 0.5) for a, b in pairs] +
+                                [("unknown", lessons[0].name, 1.0)])
+    assert skipped == 1 and len(y) == len(pairs)
+    for p, (a, b) in enumerate(pairs):
+        breakdown = engine.get_similarity_breakdown(a, b)
+        assert X[p].tolist() == [breakdown[dim]['score'] for dim in DIMENSIONS]
+
+
+def test_fit_recovers_weights(tmp_path):
+    """Annotations made with known weights give those weights back"""
+    onto = get_ontology(ONTOLOGY_PATH).load()
+    engine = SimilarityEngine(onto)
+    lessons = engine.matrix.lessons
+    true_weights = {'axes': 0.1, 'tools': 0.3, 'virtues': 0.0, 'strategies': 0.2,
+                    'age': 0.25, 'duration': 0.15, 'domain': 0.0}
+
+    path = tmp_path / "pairs.jsonl"
+    with open(path, 'w', encoding='utf-8') as f:
+        for a in lessons:
+            for b in lessons:
+                f.write(json.dumps({'lesson1': a.name, 'lesson2': b.name,
+                                    'similarity': engine.compute_similarity(a, b, true_weights)}) + "\n")
+
+    result = learn_weights(engine.matrix, str(path), baseline=engine.weights)
+    assert result['pairs'] == len(lessons) ** 2
+    assert result['rmse'] < 1e-9 < result['baseline_rmse']
+    for dim in DIMENSIONS:
+        assert abs(result['weights'][dim] - true_weights[dim]) < 1e-9
+
+    save_weights(result, str(tmp_path / "weights.json"))
+    engine.load_weights(str(tmp_path / "weights.json"))
+    assert engine.weights == result['weights']
+
+
+def test_fit_respects_constraints():
+    """Weights stay non-negative, and sum to 1 when normalized"""
+    rng = np.random.default_rng(0)
+    X = rng.random((1000, len(DIMENSIONS)))
+    y = X @ np.array([0.5, -0.2, 0.3, 0.0, 0.4, 0.1, 0.0]) + rng.normal(0, 0.01, 1000)
+
+    for normalize in (True, False):
+        weights = fit_weights(X, y, normalize)
+        assert (weights >= 0).all() and weights[1] == 0
+        assert abs(weights.sum() - 1) < 1e-9 or not normalize